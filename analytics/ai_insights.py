@@ -1,7 +1,8 @@
 # analytics/ai_insights.py
-import json
 import streamlit as st
 from database import mongo_manager
+from analytics.context_builder import FinanceContextBuilder
+from analytics.llm_gateway import get_gateway
 
 try:
     import google.generativeai as genai
@@ -13,6 +14,7 @@ class AIInsights:
     def __init__(self):
         self.finance_model = "gemini-2.5-flash"
         self.general_model = "gemini-2.5-flash"
+        self.context_builder = FinanceContextBuilder()
 
     def set_api_key(self, user_id: str, api_key: str):
         """Store API key in DB and session"""
@@ -32,50 +34,36 @@ class AIInsights:
         # Fallback to DB
         return mongo_manager.get_gemini_api_key(user_id)
 
-    def analyze_finance(self, user_id: str, prompt: str):
-        """Analyze user finances using Gemini"""
-        if genai is None:
-            return None, "GenAI SDK not installed."
-
-        api_key = self._get_api_key(user_id)
-        if not api_key:
-            return None, "⚠️ No Gemini API key found. Please add it in Settings."
-
-        # Configure Gemini
-        try:
-            genai.configure(api_key=api_key)
-        except Exception as e:
-            return None, f"Error configuring Gemini API: {e}"
-
-        # Gather user financial data
-        expenses = mongo_manager.list_expenses(user_id)
-        income = mongo_manager.list_income(user_id)
-        budgets = mongo_manager.list_budgets(user_id)
-
-        # Build structured user data
-        user_data = {
-            "expenses": expenses,
-            "income": income,
-            "budgets": budgets
-        }
+    def _finance_prompt(self, user_id: str, prompt: str) -> str:
+        # Compact, token-budgeted summary of the user's full history
+        user_context = self.context_builder.build(user_id)
 
         # Finance-specific prompt
-        full_prompt = f"""
+        return f"""
 You are a financial assistant. Analyze the user's financial data and provide concise,
 friendly, actionable insights. Highlight categories over budget and suggest actions.
 
-User data:
-{json.dumps(user_data, default=str)}
+User financial summary:
+{user_context}
 
 User question/prompt: {prompt}
 
 Return your answer in clear bullet points or numbered list.
 """
 
+    def analyze_finance(self, user_id: str, prompt: str):
+        """Analyze user finances using Gemini"""
+        if genai is None:
+            return None, "GenAI SDK not installed."
+
+        api_key = self._get_api_key(user_id)
+        if not api_key:
+            return None, "⚠️ No Gemini API key found. Please add it in Settings."
+
+        full_prompt = self._finance_prompt(user_id, prompt)
+
         try:
-            model = genai.GenerativeModel(self.finance_model)
-            response = model.generate_content(full_prompt)
-            return response.text, None
+            return get_gateway().generate(api_key, self.finance_model, full_prompt), None
         except Exception as e:
             return None, f"Error generating insights: {e}"
 
@@ -88,12 +76,6 @@ Return your answer in clear bullet points or numbered list.
         if not api_key:
             return None, "⚠️ No Gemini API key found. Please add it in Settings."
 
-        # Configure Gemini
-        try:
-            genai.configure(api_key=api_key)
-        except Exception as e:
-            return None, f"Error configuring Gemini API: {e}"
-
         full_prompt = f"""
 Answer the following question clearly and concisely. Provide useful information in readable text.
 
@@ -101,12 +83,29 @@ Question: {question}
 """
 
         try:
-            model = genai.GenerativeModel(self.general_model)
-            response = model.generate_content(full_prompt)
-            return response.text, None
+            return get_gateway().generate(api_key, self.general_model, full_prompt), None
         except Exception as e:
             return None, f"Error generating response: {e}"
 
+    def stream_finance(self, user_id: str, prompt: str, timeout: float = 60.0, cancel_event=None):
+        """
+        Streaming variant of analyze_finance for st.write_stream.
+        Returns (generator, error); the generator yields text chunks as they arrive.
+        """
+        api_key = self._get_api_key(user_id)
+        if not api_key:
+            return None, "⚠️ No Gemini API key found. Please add it in Settings."
+
+        full_prompt = self._finance_prompt(user_id, prompt)
+
+        def _chunks():
+            try:
+                yield from get_gateway().stream(api_key, self.finance_model, full_prompt, timeout=timeout, cancel_event=cancel_event)
+            except Exception as e:
+                yield f"\n\n⚠️ Error generating insights: {e}"
+
+        return _chunks(), None
+
     # --- ADDED FOR BACKWARD COMPATIBILITY ---
     def analyze(self, user_id: str, prompt: str):
         """
@@ -114,3 +113,7 @@ Question: {question}
         Defaults to finance analysis.
         """
         return self.analyze_finance(user_id, prompt)
+
+    def stream_analyze(self, user_id: str, prompt: str, timeout: float = 60.0, cancel_event=None):
+        """Streaming counterpart of analyze()."""
+        return self.stream_finance(user_id, prompt, timeout=timeout, cancel_event=cancel_event)
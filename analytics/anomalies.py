@@ -0,0 +1,132 @@
+# analytics/anomalies.py
+# Vectorized detection of unusual spends and likely double-entered expenses.
+# - anomalies: rolling z-score of each expense against the previous N
+#   expenses in the same category
+# - duplicates: expenses are blocked by (currency, amount in cents), so only
+#   neighbours inside a block and date window are compared (no O(n^2) scan),
+#   then confirmed by note similarity
+# Rows come from the shared frame cache (analytics/frame_cache.py), so its
+# LRU/TTL policy and write listener also cover these results: findings are
+# cached per user and recomputed (vectorized) only when the cached rows
+# change, and the cache is capped at FRAME_CACHE_MAX_USERS.
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config.settings import settings
+from analytics import frame_cache
+
+Z_WINDOW = 30            # previous expenses per category used for mean/std
+Z_MIN_PERIODS = 5
+Z_THRESHOLD = 3.0
+DUP_WINDOW_DAYS = 3
+DUP_MAX_NEIGHBOURS = 5   # neighbours compared inside a block
+DUP_NOTE_SIMILARITY = 0.6
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _note_similarity(a, b) -> float:
+    ta = set(TOKEN_RE.findall(str(a or "").lower()))
+    tb = set(TOKEN_RE.findall(str(b or "").lower()))
+    if not ta and not tb:
+        return 1.0  # two empty notes: amount + date decide
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def to_frame(expenses: pd.DataFrame) -> pd.DataFrame:
+    """A frame_cache expense frame with plain labels, oldest first"""
+    df = expenses[["id", "amount", "category", "note", "date", "currency"]].copy()
+    df["category"] = df["category"].astype(object).fillna("Other")
+    df["currency"] = df["currency"].astype(object).fillna("")
+    df["note"] = df["note"].fillna("")
+    return df.reset_index(drop=True)
+
+
+def category_zscores(df: pd.DataFrame, window: int = Z_WINDOW, min_periods: int = Z_MIN_PERIODS) -> pd.Series:
+    """z-score of each amount vs. the preceding `window` expenses of its category."""
+    if df.empty:
+        return pd.Series(dtype=float)
+    prev = df.groupby("category", sort=False)["amount"].shift()
+    rolling = prev.groupby(df["category"], sort=False).rolling(window, min_periods=min_periods)
+    mean = rolling.mean().reset_index(level=0, drop=True).reindex(df.index)
+    std = rolling.std(ddof=0).reset_index(level=0, drop=True).reindex(df.index)
+    z = (df["amount"] - mean) / std.replace(0, np.nan)
+    return z
+
+
+def find_anomalies(df: pd.DataFrame, threshold: float = Z_THRESHOLD) -> list:
+    z = category_zscores(df)
+    hits = df.loc[z > threshold].assign(z=z[z > threshold])
+    return [
+        {"type": "anomaly", "id": r.id, "category": r.category, "amount": r.amount, "date": r.date, "note": r.note, "z": round(float(r.z), 2)}
+        for r in hits.itertuples()
+    ]
+
+
+def find_duplicates(df: pd.DataFrame, window_days: int = DUP_WINDOW_DAYS, max_neighbours: int = DUP_MAX_NEIGHBOURS) -> list:
+    if len(df) < 2:
+        return []
+    cents = (df["amount"] * 100).round().astype(np.int64)
+    block = df.assign(cents=cents).groupby(["currency", "cents"], sort=False).ngroup()
+    order = np.lexsort((df["date"].values, block.values))
+    b = block.values[order]
+    d = df["date"].values[order]
+    window = np.timedelta64(window_days, "D")
+
+    pairs = []
+    for k in range(1, max_neighbours + 1):
+        same = b[:-k] == b[k:]
+        close = (d[k:] - d[:-k]) <= window
+        idx = np.nonzero(same & close)[0]
+        if idx.size == 0 and not same.any():
+            break
+        pairs.extend(zip(order[idx], order[idx + k]))
+
+    out = []
+    notes = df["note"].values
+    for i, j in pairs:
+        sim = _note_similarity(notes[i], notes[j])
+        if sim >= DUP_NOTE_SIMILARITY:
+            out.append({
+                "type": "duplicate",
+                "id": df.at[j, "id"],
+                "duplicate_of": df.at[i, "id"],
+                "amount": float(df.at[j, "amount"]),
+                "category": df.at[j, "category"],
+                "date": df.at[j, "date"],
+                "note": notes[j],
+                "similarity": round(sim, 2),
+            })
+    return out
+
+
+_findings = OrderedDict()  # user_id -> (frame cache version, findings)
+_findings_lock = threading.Lock()
+
+
+def get_findings(user_id: str, limit: int = None) -> list:
+    """Duplicates first, then anomalies by z-score; newest state for the user."""
+    uid = str(user_id)
+    version, expenses = frame_cache.get(uid).versioned_frame("expenses")
+    with _findings_lock:
+        hit = _findings.get(uid)
+        if hit and hit[0] == version:
+            _findings.move_to_end(uid)
+            findings = hit[1]
+        else:
+            findings = None
+    if findings is None:
+        df = to_frame(expenses)
+        findings = sorted(find_anomalies(df) + find_duplicates(df), key=lambda f: (f["type"] != "duplicate", -f.get("z", 0)))
+        with _findings_lock:
+            _findings[uid] = (version, findings)
+            _findings.move_to_end(uid)
+            while len(_findings) > settings.FRAME_CACHE_MAX_USERS:
+                _findings.popitem(last=False)
+    return findings[:limit] if limit else list(findings)
@@ -0,0 +1,133 @@
+# analytics/context_builder.py
+import time
+import datetime
+import threading
+
+from config import settings
+from database import mongo_manager
+
+# Rough chars-per-token ratio for Gemini-style tokenizers
+CHARS_PER_TOKEN = 4
+
+# Progressively smaller section sizes tried until the context fits the budget
+_SIZE_STEPS = [
+    {"months": 24, "categories": 15, "merchants": 10, "outliers": 5},
+    {"months": 12, "categories": 10, "merchants": 5, "outliers": 3},
+    {"months": 6, "categories": 6, "merchants": 3, "outliers": 2},
+    {"months": 3, "categories": 4, "merchants": 0, "outliers": 0},
+]
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _fmt(x):
+    try:
+        return f"{float(x):,.2f}"
+    except Exception:
+        return str(x)
+
+
+class FinanceContextBuilder:
+    """
+    Summarizes a user's full financial history into compact aggregates
+    (totals, budget status, monthly trend, top merchants, outliers) sized to
+    fit a token budget. Results are cached per user until their data changes
+    in this process, the month rolls over ("this month" budget status) or
+    AI_CONTEXT_TTL_SECONDS pass (writes made by other processes).
+    """
+
+    def __init__(self, token_budget: int = None):
+        self.token_budget = token_budget or settings.AI_CONTEXT_TOKEN_BUDGET
+
+    def build(self, user_id: str) -> str:
+        uid = str(user_id)
+        version = (mongo_manager.get_data_version(uid), datetime.date.today().strftime("%Y-%m"))
+        key = (uid, self.token_budget)
+        cached = _cache.get(key)
+        if cached and cached[0] == version and time.monotonic() - cached[1] < settings.AI_CONTEXT_TTL_SECONDS:
+            return cached[2]
+
+        data = self._gather(uid)
+        text = self._render_within_budget(data)
+        with _cache_lock:
+            _cache[key] = (version, time.monotonic(), text)
+        return text
+
+    def _gather(self, user_id: str) -> dict:
+        largest = _SIZE_STEPS[0]
+        today = datetime.date.today()
+        month_start = datetime.datetime(today.year, today.month, 1)
+        return {
+            "categories": mongo_manager.get_expense_summary(user_id),
+            "expense_months": mongo_manager.get_monthly_totals(user_id, "expenses", largest["months"]),
+            "income_months": mongo_manager.get_monthly_totals(user_id, "income", largest["months"]),
+            "income_sources": mongo_manager.get_income_summary(user_id),
+            "budgets": mongo_manager.list_budgets(user_id),
+            "month_spent": mongo_manager.get_category_totals_between(user_id, month_start),
+            "merchants": mongo_manager.get_top_merchants(user_id, largest["merchants"]),
+            "outliers": mongo_manager.get_category_outliers(user_id, limit=largest["outliers"]),
+        }
+
+    def _render_within_budget(self, data: dict) -> str:
+        text = ""
+        for sizes in _SIZE_STEPS:
+            text = self._render(data, sizes)
+            if estimate_tokens(text) <= self.token_budget:
+                return text
+        # Still too long: hard-truncate the smallest rendering
+        return text[: self.token_budget * CHARS_PER_TOKEN]
+
+    def _render(self, data: dict, sizes: dict) -> str:
+        lines = []
+
+        total_exp = sum(c.get("total", 0) for c in data["categories"])
+        count_exp = sum(c.get("count", 0) for c in data["categories"])
+        total_inc = sum(s.get("total", 0) for s in data["income_sources"])
+        lines.append("OVERVIEW (all-time)")
+        lines.append(f"income={_fmt(total_inc)} expenses={_fmt(total_exp)} ({count_exp} txns) balance={_fmt(total_inc - total_exp)}")
+
+        if data["budgets"]:
+            lines.append("BUDGETS (this month: spent/limit)")
+            for b in data["budgets"]:
+                cat = b.get("category")
+                limit = float(b.get("monthly_limit", 0) or 0)
+                spent = data["month_spent"].get(cat, 0.0)
+                flag = " OVER" if limit and spent > limit else ""
+                lines.append(f"- {cat}: {_fmt(spent)}/{_fmt(limit)}{flag}")
+
+        if data["categories"]:
+            lines.append("SPEND BY CATEGORY (total, txns)")
+            for c in data["categories"][: sizes["categories"]]:
+                lines.append(f"- {c.get('_id')}: {_fmt(c.get('total'))}, {c.get('count', 0)}")
+
+        if data["expense_months"] or data["income_months"]:
+            lines.append("MONTHLY (month: income/expenses)")
+            inc = {m["_id"]: m["total"] for m in data["income_months"]}
+            exp = {m["_id"]: m["total"] for m in data["expense_months"]}
+            months = sorted(set(inc) | set(exp), reverse=True)[: sizes["months"]]
+            for m in months:
+                lines.append(f"- {m}: {_fmt(inc.get(m, 0))}/{_fmt(exp.get(m, 0))}")
+
+        if data["income_sources"]:
+            lines.append("INCOME BY SOURCE")
+            for s in data["income_sources"]:
+                lines.append(f"- {s.get('_id')}: {_fmt(s.get('total'))}")
+
+        if sizes["merchants"] and data["merchants"]:
+            lines.append("TOP MERCHANTS/NOTES (total, txns)")
+            for m in data["merchants"][: sizes["merchants"]]:
+                lines.append(f"- {m.get('_id')}: {_fmt(m.get('total'))}, {m.get('count', 0)}")
+
+        if sizes["outliers"] and data["outliers"]:
+            lines.append("UNUSUALLY LARGE EXPENSES")
+            for o in data["outliers"][: sizes["outliers"]]:
+                d = o.get("date")
+                d = d.strftime("%Y-%m-%d") if hasattr(d, "strftime") else str(d or "")[:10]
+                lines.append(f"- {d} {o.get('category')}: {_fmt(o.get('amount'))} {o.get('currency', '')} {o.get('note', '')}".rstrip())
+
+        return "\n".join(lines)
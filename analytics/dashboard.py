@@ -1,15 +1,24 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime
+from datetime import datetime, timedelta
 from database import mongo_manager
+from database import async_mongo_manager
+from auth import session
 from ui.components import render_metrics
 from features.currency_converter import CurrencyConverter
+from analytics import anomalies
+from analytics import forecast
+from analytics import duckdb_engine
+from analytics import frame_cache
+from utils import money
+
+DASHBOARD_OPTIONS = ["Monthly Dashboard", "Today Dashboard", "Year Dashboard", "Life Dashboard (All-time)"]
 
 
 def render_dashboard(db, user_id: str, currency: CurrencyConverter, user_name: str = None):
     # --- USER DETAILS ---
-    user = mongo_manager.get_user(user_id)
+    user = session.get_profile(user_id)
     user_name = user_name or (user.get("name") if user else "User")
 
     st.header(f"📊 Welcome, {user_name}!")
@@ -17,22 +26,30 @@ def render_dashboard(db, user_id: str, currency: CurrencyConverter, user_name: s
     # --- COMPREHENSIVE OVERVIEW METRICS ---
     col1, col2, col3, col4 = st.columns(4)
     
-    # Fetch bills
-    all_bills = mongo_manager.list_bill_reminders(user_id)
-    due_bills = [b for b in all_bills if not b.get("is_paid", False)]
-    total_due = sum(b.get("amount", 0) for b in due_bills)
+    # Fetch everything the page needs concurrently ("paid" bills count this month only)
+    month_start = datetime.today().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    snapshot = duckdb_engine.enabled()
+    data = async_mongo_manager.fetch_all(
+        bill_summary=("get_bill_summary", user_id, {"paid_since": month_start}),
+        next_bills=("list_upcoming_bills", user_id, {"limit": 1}),
+        debts=("list_debts", user_id),
+        goals=("list_financial_goals", user_id),
+        budgets=("list_budgets", user_id),
+    )
+    bill_summary = data["bill_summary"]
+    total_due = bill_summary["due_total"]
     
-    # Fetch debts
-    debts = mongo_manager.list_debts(user_id)
+    # Debts
+    debts = data["debts"]
     total_debt = sum(d.get("remaining_amount", 0) for d in debts)
     
-    # Fetch goals
-    goals = mongo_manager.list_financial_goals(user_id)
+    # Goals
+    goals = data["goals"]
     total_goal_progress = sum(g.get("current_amount", 0) for g in goals)
     total_goal_target = sum(g.get("target_amount", 0) for g in goals)
     
     with col1:
-        st.metric("💰 Bills Due", f"₹{total_due:,.2f}", f"{len(due_bills)} bills")
+        st.metric("💰 Bills Due", f"₹{total_due:,.2f}", f"{bill_summary['due_count']} bills")
     with col2:
         st.metric("💳 Total Debt", f"₹{total_debt:,.2f}", f"{len(debts)} debts")
     with col3:
@@ -40,74 +57,116 @@ def render_dashboard(db, user_id: str, currency: CurrencyConverter, user_name: s
         st.metric("🎯 Goals Progress", f"{goal_progress:.1f}%", f"₹{total_goal_progress:,.2f} saved")
     with col4:
         # Get this month's data
-        expenses = mongo_manager.list_expenses(user_id, limit=1000)
-        incs = mongo_manager.list_income(user_id, limit=1000)
-        
-        exp_df = pd.DataFrame(expenses) if expenses else pd.DataFrame()
-        inc_df = pd.DataFrame(incs) if incs else pd.DataFrame()
-        
-        if not exp_df.empty and not inc_df.empty:
-            exp_df["date"] = pd.to_datetime(exp_df["date"], errors="coerce")
-            inc_df["date"] = pd.to_datetime(inc_df["date"], errors="coerce")
-            month_start = datetime.today().replace(day=1)
-            month_exp = exp_df[exp_df["date"] >= month_start]["amount"].sum()
-            month_inc = inc_df[inc_df["date"] >= month_start]["amount"].sum()
-            savings = month_inc - month_exp
+        savings = None
+        if snapshot:
+            month = duckdb_engine.totals(user_id, start=month_start)
+            if month["count"]:
+                savings = month["income"] - month["expense"]
+        else:
+            # Columnar per-user cache: dates are already datetime64, no reparsing
+            exp_df = frame_cache.expenses(user_id)
+            inc_df = frame_cache.income(user_id)
+
+            if not exp_df.empty and not inc_df.empty:
+                month_exp = money.frame_total(exp_df[exp_df["date"] >= month_start])
+                month_inc = money.frame_total(inc_df[inc_df["date"] >= month_start])
+                savings = month_inc - month_exp
+        if savings is not None:
             st.metric("📊 This Month", f"₹{savings:,.2f}", f"Balance")
         else:
             st.metric("📊 This Month", f"₹0.00", "No data yet")
     
+    # --- MONTH-END FORECAST ---
+    fc = forecast.get_forecast(user_id, goals=goals)
+    if not fc["categories"].empty:
+        totals = " + ".join(f"{c or '₹'} {t:,.2f}" for c, t in fc["projected_totals"].items())
+        with st.expander(f"🔮 Projected month-end spend: {totals}"):
+            budgets = {b.get("category"): float(b.get("monthly_limit", 0) or 0) for b in data["budgets"]}
+            proj = fc["categories"].copy()
+            proj["budget"] = proj["category"].map(budgets)
+            st.dataframe(
+                proj[["category", "currency", "spent", "projected", "budget"]].round(2),
+                use_container_width=True,
+                hide_index=True
+            )
+            over = proj[proj["budget"].notna() & (proj["projected"] > proj["budget"])]
+            for r in over.itertuples():
+                st.warning(f"{r.category} is on track to exceed its budget (₹{r.projected:,.2f} vs ₹{r.budget:,.2f})")
+
+    # --- ALERTS: likely duplicates and unusual spends ---
+    findings = anomalies.get_findings(user_id, limit=5)
+    if findings:
+        with st.expander(f"🚨 {len(findings)} item(s) need a look", expanded=True):
+            for f in findings:
+                day = f["date"].strftime("%Y-%m-%d") if pd.notna(f["date"]) else ""
+                if f["type"] == "duplicate":
+                    st.warning(f"Possible duplicate: {f['category']} ₹{f['amount']:,.2f} on {day} ({f['note'] or 'no note'})")
+                else:
+                    st.warning(f"Unusual spend: {f['category']} ₹{f['amount']:,.2f} on {day} is {f['z']:.1f}σ above your usual")
+
     st.divider()
     st.markdown("#### Select the dashboard view 👇")
 
+    if snapshot:
+        render_snapshot_sections(user_id, data)
+        return
+
     # --- FETCH DATA ---
-    expenses = mongo_manager.list_expenses(user_id, limit=1000)
-    incomes = mongo_manager.list_income(user_id, limit=1000)
+    exp_df = frame_cache.expenses(user_id)
+    inc_df = frame_cache.income(user_id)
 
-    if not expenses and not incomes:
+    if exp_df.empty and inc_df.empty:
         st.info("No data found yet. Add some income and expenses to get started!")
         return
 
-    # --- Convert to DataFrames ---
-    exp_df = pd.DataFrame(expenses) if expenses else pd.DataFrame(columns=["category", "amount", "date"])
-    inc_df = pd.DataFrame(incomes) if incomes else pd.DataFrame(columns=["source", "amount", "date"])
-
-    if not exp_df.empty:
-        exp_df["amount"] = exp_df["amount"].astype(float)
-        exp_df["date"] = pd.to_datetime(exp_df["date"], errors="coerce")
-    if not inc_df.empty:
-        inc_df["amount"] = inc_df["amount"].astype(float)
-        inc_df["date"] = pd.to_datetime(inc_df["date"], errors="coerce")
-
     # --- DASHBOARD SELECTION ---
-    dashboard_options = ["Monthly Dashboard", "Today Dashboard", "Year Dashboard", "Life Dashboard (All-time)"]
-    selected_dashboard = st.selectbox("Choose Dashboard", dashboard_options, index=0)  # Monthly as default
+    selected_dashboard = st.selectbox("Choose Dashboard", DASHBOARD_OPTIONS, index=0)  # Monthly as default
 
     if selected_dashboard == "Monthly Dashboard":
         month_start = datetime.today().replace(day=1)
         month_exp = exp_df[exp_df["date"] >= month_start] if not exp_df.empty else pd.DataFrame()
         month_inc = inc_df[inc_df["date"] >= month_start] if not inc_df.empty else pd.DataFrame()
-        render_section(month_exp, month_inc, "Month", user_id)
+        render_section(month_exp, month_inc, "Month", user_id, data)
 
     elif selected_dashboard == "Today Dashboard":
         today = datetime.today().date()
         today_exp = exp_df[exp_df["date"].dt.date == today] if not exp_df.empty else pd.DataFrame()
         today_inc = inc_df[inc_df["date"].dt.date == today] if not inc_df.empty else pd.DataFrame()
-        render_section(today_exp, today_inc, "Today", user_id)
+        render_section(today_exp, today_inc, "Today", user_id, data)
 
     elif selected_dashboard == "Year Dashboard":
         year_start = datetime.today().replace(month=1, day=1)
         year_exp = exp_df[exp_df["date"] >= year_start] if not exp_df.empty else pd.DataFrame()
         year_inc = inc_df[inc_df["date"] >= year_start] if not inc_df.empty else pd.DataFrame()
-        render_section(year_exp, year_inc, "Year", user_id)
+        render_section(year_exp, year_inc, "Year", user_id, data)
 
     elif selected_dashboard == "Life Dashboard (All-time)":
-        render_section(exp_df, inc_df, "Life", user_id)
+        render_section(exp_df, inc_df, "Life", user_id, data)
+
+
+def render_snapshot_sections(user_id: str, data: dict):
+    # Same views, aggregated in the DuckDB mirror: one row per category and
+    # period instead of every transaction, over the full history
+    if not duckdb_engine.totals(user_id)["count"]:
+        st.info("No data found yet. Add some income and expenses to get started!")
+        return
+
+    selected_dashboard = st.selectbox("Choose Dashboard", DASHBOARD_OPTIONS, index=0)
+    today = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
+    start, end, grain, label = {
+        "Monthly Dashboard": (today.replace(day=1), None, "month", "Month"),
+        "Today Dashboard": (today, today + timedelta(days=1), "day", "Today"),
+        "Year Dashboard": (today.replace(month=1, day=1), None, "month", "Year"),
+        "Life Dashboard (All-time)": (None, None, "month", "Life"),
+    }[selected_dashboard]
+    exp_df = duckdb_engine.rollup(user_id, "expense", start, end, grain)
+    inc_df = duckdb_engine.rollup(user_id, "income", start, end, grain)
+    render_section(exp_df, inc_df, label, user_id, data)
 
 
-def render_section(exp_df: pd.DataFrame, inc_df: pd.DataFrame, label: str, user_id: str = None):
-    total_exp = exp_df["amount"].sum() if not exp_df.empty else 0.0
-    total_inc = inc_df["amount"].sum() if not inc_df.empty else 0.0
+def render_section(exp_df: pd.DataFrame, inc_df: pd.DataFrame, label: str, user_id: str = None, data: dict = None):
+    total_exp = money.frame_total(exp_df)
+    total_inc = money.frame_total(inc_df)
     balance = total_inc - total_exp
 
     st.subheader(f"🌟 {label} Summary")
@@ -178,20 +237,26 @@ def render_section(exp_df: pd.DataFrame, inc_df: pd.DataFrame, label: str, user_
         
         with col1:
             # Bills Status
-            all_bills = mongo_manager.list_bill_reminders(user_id)
-            due_bills_count = len([b for b in all_bills if not b.get("is_paid", False)])
-            paid_bills_count = len([b for b in all_bills if b.get("is_paid", False)])
+            if data:
+                bill_summary = data["bill_summary"]
+            else:
+                month_start = datetime.today().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+                bill_summary = mongo_manager.get_bill_summary(user_id, paid_since=month_start)
+            due_bills_count = bill_summary["due_count"]
+            paid_bills_count = bill_summary["paid_count"]
             
             if due_bills_count > 0:
                 st.warning(f"⚠️ {due_bills_count} bills pending payment")
+            if bill_summary["overdue_count"] > 0:
+                st.error(f"⏰ {bill_summary['overdue_count']} bills overdue")
             if paid_bills_count > 0:
                 st.success(f"✅ {paid_bills_count} bills paid this month")
-            if len(all_bills) == 0:
+            if bill_summary["total_count"] == 0:
                 st.info("📅 No bill reminders set")
         
         with col2:
             # Goals Progress
-            goals = mongo_manager.list_financial_goals(user_id)
+            goals = data["goals"] if data else mongo_manager.list_financial_goals(user_id)
             if goals:
                 active_goals = len([g for g in goals if not g.get("is_achieved", False)])
                 achieved_goals = len([g for g in goals if g.get("is_achieved", False)])
@@ -213,7 +278,7 @@ def render_section(exp_df: pd.DataFrame, inc_df: pd.DataFrame, label: str, user_
                 st.markdown("[➡️ Go to Bills page](?page=Bills)")
         
         with col4:
-            debts = mongo_manager.list_debts(user_id)
+            debts = data["debts"] if data else mongo_manager.list_debts(user_id)
             total_debt = sum(d.get("remaining_amount", 0) for d in debts)
             if total_debt > 0:
                 st.markdown("### 💳 Debt Status")
@@ -224,13 +289,14 @@ def render_section(exp_df: pd.DataFrame, inc_df: pd.DataFrame, label: str, user_
         
         with col5:
             # Check upcoming due dates
-            if all_bills:
-                upcoming_bills = [b for b in all_bills if not b.get("is_paid", False)]
-                if upcoming_bills:
-                    closest = min(upcoming_bills, key=lambda x: x.get("due_date", ""))
-                    st.markdown("### ⏰ Next Payment")
-                    st.write(f"**{closest.get('title')}**")
-                    st.write(f"₹{closest.get('amount', 0):,.2f}")
+            upcoming_bills = data["next_bills"] if data else mongo_manager.list_upcoming_bills(user_id, limit=1)
+            if upcoming_bills:
+                closest = upcoming_bills[0]
+                st.markdown("### ⏰ Next Payment")
+                st.write(f"**{closest.get('title')}**")
+                st.write(f"₹{closest.get('amount', 0):,.2f}")
+                if isinstance(closest.get("due_date"), datetime):
+                    st.caption(f"Due {closest['due_date']:%Y-%m-%d}")
     
     # --- UPCOMING FINANCIAL SUMMARY (All-time Dashboard) ---
     if label == "Life" and user_id:
@@ -241,16 +307,18 @@ def render_section(exp_df: pd.DataFrame, inc_df: pd.DataFrame, label: str, user_
         
         with summary_col1:
             # Net Worth Calculation
-            all_incomes = mongo_manager.list_income(user_id, limit=10000)
-            all_expenses = mongo_manager.list_expenses(user_id, limit=10000)
-            total_income_all = sum(i.get("amount", 0) for i in all_incomes)
-            total_expenses_all = sum(e.get("amount", 0) for e in all_expenses)
+            if duckdb_engine.enabled():
+                life = duckdb_engine.totals(user_id)
+                total_income_all, total_expenses_all = life["income"], life["expense"]
+            else:
+                total_income_all = money.frame_total(frame_cache.income(user_id))
+                total_expenses_all = money.frame_total(frame_cache.expenses(user_id))
             
             # Assets (income - expenses)
             assets = total_income_all - total_expenses_all
             
             # Liabilities (debts)
-            all_debts = mongo_manager.list_debts(user_id)
+            all_debts = data["debts"] if data else mongo_manager.list_debts(user_id)
             liabilities = sum(d.get("remaining_amount", 0) for d in all_debts)
             
             net_worth = assets - liabilities
@@ -263,7 +331,7 @@ def render_section(exp_df: pd.DataFrame, inc_df: pd.DataFrame, label: str, user_
         
         with summary_col2:
             # Financial Goals Overview
-            goals_list = mongo_manager.list_financial_goals(user_id)
+            goals_list = data["goals"] if data else mongo_manager.list_financial_goals(user_id)
             if goals_list:
                 st.markdown("#### 🎯 Your Financial Goals")
                 for goal in goals_list[:3]:  # Show top 3
@@ -0,0 +1,120 @@
+# analytics/debt_simulator.py
+# Vectorized amortization of all of a user's debts at once.
+# Each month: accrue interest, pay every minimum, then pour the rest of a
+# fixed monthly budget (sum of minimums + extra) into debts in strategy
+# order. Freed-up minimums roll over automatically because the budget
+# stays constant. Work per month is a handful of NumPy ops over the debt
+# vector, so hundreds of debts x 360 months simulate in milliseconds.
+import datetime
+
+import numpy as np
+import pandas as pd
+
+STRATEGIES = ("avalanche", "snowball", "custom")
+MAX_MONTHS = 360
+
+
+def payoff_order(balances, rates, strategy: str, custom_order=None) -> np.ndarray:
+    """Indices of debts in the order extra money should go to them."""
+    n = len(balances)
+    if strategy == "avalanche":
+        # Highest rate first, smaller balance breaks ties
+        return np.lexsort((balances, -rates))
+    if strategy == "snowball":
+        # Smallest balance first, higher rate breaks ties
+        return np.lexsort((-rates, balances))
+    if strategy == "custom":
+        order = [i for i in (custom_order or []) if 0 <= i < n]
+        return np.array(order + [i for i in range(n) if i not in order], dtype=np.int64)
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def simulate(balances, annual_rates, min_payments, extra: float = 0.0, strategy: str = "avalanche", custom_order=None, months: int = MAX_MONTHS) -> dict:
+    """
+    balances / annual_rates (percent) / min_payments: one entry per debt.
+    Returns totals, per-debt payoff month (None if not paid off within
+    `months`) and the month x debt balance schedule.
+    """
+    bal = np.asarray(balances, dtype=np.float64).copy()
+    rate = np.asarray(annual_rates, dtype=np.float64) / 100.0 / 12.0
+    mins = np.asarray(min_payments, dtype=np.float64)
+    n = bal.size
+    order = payoff_order(bal, rate, strategy, custom_order)
+    budget = mins.sum() + max(float(extra), 0.0)
+
+    schedule = np.zeros((months + 1, n))
+    schedule[0] = bal
+    payoff_month = np.full(n, -1, dtype=np.int64)
+    payoff_month[bal <= 0] = 0
+    total_interest = 0.0
+    total_paid = 0.0
+    last = 0
+
+    for m in range(1, months + 1):
+        active = bal > 0
+        if not active.any():
+            break
+        interest = np.where(active, bal * rate, 0.0)
+        bal += interest
+        total_interest += interest.sum()
+
+        pay = np.minimum(bal, mins) * active
+        bal -= pay
+        leftover = budget - pay.sum()
+        if leftover > 0:
+            ordered = bal[order]
+            before = np.cumsum(ordered) - ordered
+            alloc = np.clip(leftover - before, 0.0, ordered)
+            bal[order] -= alloc
+            pay[order] += alloc
+        total_paid += pay.sum()
+
+        bal[np.abs(bal) < 1e-6] = 0.0
+        newly_paid = (payoff_month < 0) & (bal <= 0)
+        payoff_month[newly_paid] = m
+        schedule[m] = bal
+        last = m
+
+    schedule = schedule[: last + 1]
+    done = bool((bal <= 0).all())
+    return {
+        "strategy": strategy,
+        "months": last if done else None,
+        "total_interest": float(total_interest),
+        "total_paid": float(total_paid),
+        "payoff_month": [int(p) if p >= 0 else None for p in payoff_month],
+        "schedule": schedule,
+    }
+
+
+def _debt_arrays(debts: list):
+    balances = [float(d.get("remaining_amount", 0) or 0) for d in debts]
+    rates = [float(d.get("interest_rate", 0) or 0) for d in debts]
+    mins = [float(d.get("minimum_payment", 0) or 0) for d in debts]
+    return balances, rates, mins
+
+
+def compare_strategies(debts: list, extra: float = 0.0, custom_order=None, start: datetime.date = None) -> pd.DataFrame:
+    """One row per strategy: months to debt-free, payoff date, interest and total paid."""
+    start = start or datetime.date.today()
+    balances, rates, mins = _debt_arrays(debts)
+    rows = []
+    strategies = STRATEGIES if custom_order else STRATEGIES[:2]
+    for strategy in strategies:
+        res = simulate(balances, rates, mins, extra=extra, strategy=strategy, custom_order=custom_order)
+        months = res["months"]
+        rows.append({
+            "strategy": strategy.capitalize(),
+            "months": months,
+            "debt_free_by": (pd.Timestamp(start) + pd.DateOffset(months=months)).date() if months is not None else None,
+            "total_interest": round(res["total_interest"], 2),
+            "total_paid": round(res["total_paid"], 2),
+        })
+    return pd.DataFrame(rows)
+
+
+def balance_curve(debts: list, extra: float = 0.0, strategy: str = "avalanche", custom_order=None) -> pd.DataFrame:
+    """Total remaining balance per month, for charting."""
+    balances, rates, mins = _debt_arrays(debts)
+    res = simulate(balances, rates, mins, extra=extra, strategy=strategy, custom_order=custom_order)
+    return pd.DataFrame({"month": np.arange(res["schedule"].shape[0]), "remaining": res["schedule"].sum(axis=1)})
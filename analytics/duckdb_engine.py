@@ -0,0 +1,251 @@
+# analytics/duckdb_engine.py
+# Optional local analytics backend (ANALYTICS_ENGINE=duckdb).
+#
+# Expenses and income are mirrored into an embedded DuckDB file
+# (ANALYTICS_DB_PATH). Before a user's query the mirror pulls only the
+# documents created since the newest `created_at` it holds for that user,
+# so Mongo serves a small incremental read instead of the whole history,
+# and the Dashboard/Reports group-bys run vectorized in DuckDB.
+#
+# Deletes made in this process are applied through a write listener. A
+# refresh also compares per-user row counts with Mongo and reloads the
+# user when they differ, which catches deletes made by other processes.
+# DuckDB allows one writer per file: give each service its own path.
+#
+#   python -m analytics.duckdb_engine --rebuild             # reload everything
+#   python -m analytics.duckdb_engine --parquet snapshots/  # year/month Parquet
+import os
+import time
+import argparse
+import datetime
+import threading
+
+import pandas as pd
+
+from config.settings import settings
+from database import mongo_manager
+from utils import money
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+GRAINS = ("day", "month", "year")
+LABELS = {"expense": "category", "income": "source"}
+COLLECTIONS = {"expense": "expenses", "income": "income"}
+
+_con = None
+_lock = threading.RLock()
+_refreshed = {}  # user_id -> (monotonic time, data version)
+
+
+def enabled() -> bool:
+    return duckdb is not None and settings.ANALYTICS_ENGINE == "duckdb"
+
+
+def _connection():
+    global _con
+    if _con is None:
+        with _lock:
+            if _con is None:
+                path = settings.ANALYTICS_DB_PATH
+                if path != ":memory:" and os.path.dirname(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                con = duckdb.connect(path)
+                con.execute("""
+                    CREATE TABLE IF NOT EXISTS transactions (
+                        id VARCHAR PRIMARY KEY,
+                        record_type VARCHAR,
+                        user_id VARCHAR,
+                        date TIMESTAMP,
+                        category VARCHAR,
+                        amount DECIMAL(18, 2),
+                        currency VARCHAR,
+                        note VARCHAR,
+                        created_at TIMESTAMP
+                    )
+                """)
+                _con = con
+    return _con
+
+
+def _frame(record_type: str, docs: list) -> pd.DataFrame:
+    label = LABELS[record_type]
+    return pd.DataFrame({
+        "id": [str(d["_id"]) for d in docs],
+        "record_type": record_type,
+        "user_id": [d.get("user_id") for d in docs],
+        "date": [mongo_manager._timeseries_date(d) for d in docs],
+        "category": [d.get(label) for d in docs],
+        # Exact cents as Decimal, so DECIMAL(18, 2) sums match Mongo's integer totals
+        "amount": [money.from_minor(money.minor_of(d)) for d in docs],
+        "currency": [d.get("currency") for d in docs],
+        "note": [d.get("note") for d in docs],
+        "created_at": [d.get("created_at") for d in docs],
+    })
+
+
+def _upsert(con, df: pd.DataFrame):
+    if df.empty:
+        return
+    con.register("incoming", df)
+    try:
+        con.execute("""
+            INSERT OR REPLACE INTO transactions
+            SELECT id, record_type, user_id, date, category, CAST(amount AS DECIMAL(18, 2)),
+                   currency, note, created_at
+            FROM incoming
+        """)
+    finally:
+        con.unregister("incoming")
+
+
+def _load(con, record_type: str, user_id: str=None, created_since=None, batch_size: int=5000) -> int:
+    loaded = 0
+    docs = []
+    for doc in mongo_manager.iter_transactions(COLLECTIONS[record_type], user_id, batch_size=batch_size, created_since=created_since):
+        docs.append(doc)
+        if len(docs) >= batch_size:
+            _upsert(con, _frame(record_type, docs))
+            loaded += len(docs)
+            docs = []
+    _upsert(con, _frame(record_type, docs))
+    return loaded + len(docs)
+
+
+def refresh(user_id: str, force: bool=False) -> int:
+    """Bring one user's rows up to date; returns the number of rows pulled"""
+    uid = str(user_id)
+    version = mongo_manager.get_data_version(uid)
+    last = _refreshed.get(uid)
+    if not force and last and last[1] == version and time.monotonic() - last[0] < settings.ANALYTICS_REFRESH_SECONDS:
+        return 0
+    con = _connection()
+    pulled = 0
+    with _lock:
+        for record_type in COLLECTIONS:
+            params = [uid, record_type]
+            watermark = con.execute(
+                "SELECT max(created_at) FROM transactions WHERE user_id = ? AND record_type = ?", params
+            ).fetchone()[0]
+            pulled += _load(con, record_type, uid, created_since=watermark)
+            if watermark is None:
+                continue
+            local = con.execute("SELECT count(*) FROM transactions WHERE user_id = ? AND record_type = ?", params).fetchone()[0]
+            remote = mongo_manager.count_expenses(uid) if record_type == "expense" else mongo_manager.count_income(uid)
+            if local != remote:
+                # Rows were deleted by another process: reload this user's history
+                con.execute("DELETE FROM transactions WHERE user_id = ? AND record_type = ?", params)
+                pulled += _load(con, record_type, uid)
+        _refreshed[uid] = (time.monotonic(), version)
+    return pulled
+
+
+def rebuild(batch_size: int=5000) -> int:
+    """Reload every user's transactions from Mongo"""
+    con = _connection()
+    with _lock:
+        con.execute("DELETE FROM transactions")
+        total = sum(_load(con, record_type, batch_size=batch_size) for record_type in COLLECTIONS)
+        _refreshed.clear()
+    return total
+
+
+def _query(sql: str, params: list) -> pd.DataFrame:
+    con = _connection()
+    with _lock:
+        return con.execute(sql, params).df()
+
+
+def _range(user_id: str, record_type: str=None, start=None, end=None):
+    clauses = ["user_id = ?"]
+    params = [str(user_id)]
+    if record_type:
+        clauses.append("record_type = ?")
+        params.append(record_type)
+    if start:
+        clauses.append("date >= ?")
+        params.append(start)
+    if end:
+        clauses.append("date < ?")
+        params.append(end)
+    return " AND ".join(clauses), params
+
+
+# -----------------------------
+# Queries (Dashboard / Reports)
+# -----------------------------
+def rollup(user_id: str, record_type: str, start=None, end=None, grain: str="month") -> pd.DataFrame:
+    """
+    Totals per category (income: source) and `grain` period in [start, end).
+    Columns match the raw-row frames the dashboard charts already use.
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"grain must be one of {GRAINS}")
+    refresh(user_id)
+    where, params = _range(user_id, record_type, start, end)
+    return _query(f"""
+        SELECT category AS {LABELS[record_type]}, date_trunc('{grain}', date) AS date,
+               CAST(sum(amount) AS DOUBLE) AS amount
+        FROM transactions WHERE {where}
+        GROUP BY 1, 2 ORDER BY 2
+    """, params)
+
+
+def totals(user_id: str, start=None, end=None) -> dict:
+    """{"expense": total, "income": total, "count": rows} in [start, end)"""
+    refresh(user_id)
+    where, params = _range(user_id, None, start, end)
+    row = _query(f"""
+        SELECT CAST(coalesce(sum(amount) FILTER (WHERE record_type = 'expense'), 0) AS DOUBLE) AS expense,
+               CAST(coalesce(sum(amount) FILTER (WHERE record_type = 'income'), 0) AS DOUBLE) AS income,
+               count(*) AS count
+        FROM transactions WHERE {where}
+    """, params).iloc[0]
+    return {"expense": float(row["expense"]), "income": float(row["income"]), "count": int(row["count"])}
+
+
+def rows(user_id: str, record_type: str, start=None, end=None) -> pd.DataFrame:
+    """Individual transactions in [start, end), newest first (report tables)"""
+    refresh(user_id)
+    where, params = _range(user_id, record_type, start, end)
+    return _query(f"""
+        SELECT id, date, category AS {LABELS[record_type]}, CAST(amount AS DOUBLE) AS amount, currency, note
+        FROM transactions WHERE {where}
+        ORDER BY date DESC
+    """, params)
+
+
+def export_parquet(out_dir: str):
+    """Write the whole mirror as a year/month-partitioned Parquet snapshot"""
+    con = _connection()
+    with _lock:
+        con.execute(f"""
+            COPY (SELECT *, year(date) AS year, month(date) AS month FROM transactions)
+            TO '{out_dir.replace("'", "''")}' (FORMAT PARQUET, PARTITION_BY (year, month), OVERWRITE_OR_IGNORE)
+        """)
+
+
+@mongo_manager.register_write_listener
+def _on_write(event: str, user_id: str, doc: dict):
+    if _con is None or event not in ("expense_deleted", "income_deleted"):
+        return
+    with _lock:
+        _con.execute("DELETE FROM transactions WHERE id = ?", [str(doc["_id"])])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the DuckDB analytics mirror")
+    parser.add_argument("--rebuild", action="store_true", help="reload every transaction from MongoDB")
+    parser.add_argument("--parquet", help="also write a partitioned Parquet snapshot to this directory")
+    args = parser.parse_args()
+    if duckdb is None:
+        raise SystemExit("duckdb is not installed (pip install duckdb)")
+    if args.rebuild:
+        started = datetime.datetime.now()
+        count = rebuild()
+        print(f"✅ Loaded {count} transactions in {(datetime.datetime.now() - started).total_seconds():.1f}s")
+    if args.parquet:
+        export_parquet(args.parquet)
+        print(f"✅ Parquet snapshot written to {args.parquet}")
@@ -0,0 +1,165 @@
+# analytics/exports.py
+# Columnar export of expenses and income (Apache Arrow / Parquet).
+#
+#   python -m analytics.exports --out exports/                  # every user
+#   python -m analytics.exports --out exports/ --user <user_id>
+#
+# Transactions are streamed from Mongo into Arrow record batches (never the
+# whole history in memory) and written as a Parquet dataset partitioned by
+# year/month (hive style: exports/year=2026/month=9/...). Amounts are
+# decimal128(18, 2) and dates real timestamps, so pandas/DuckDB read them
+# back exactly, unlike the formatted numbers in the CSV report.
+import io
+import os
+import glob
+import uuid
+import argparse
+
+from database import mongo_manager
+from utils import money
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+BATCH_SIZE = 5000
+
+if pa is not None:
+    SCHEMA = pa.schema([
+        ("record_type", pa.dictionary(pa.int8(), pa.string())),
+        ("user_id", pa.string()),
+        ("date", pa.timestamp("ms")),
+        ("year", pa.int16()),
+        ("month", pa.int8()),
+        ("category", pa.dictionary(pa.int32(), pa.string())),  # expense category or income source
+        ("amount", pa.decimal128(18, 2)),
+        ("currency", pa.dictionary(pa.int16(), pa.string())),
+        ("note", pa.string()),
+        ("created_at", pa.timestamp("ms")),
+    ])
+    PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16()), ("month", pa.int8())]), flavor="hive")
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def _require():
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed (pip install pyarrow)")
+
+
+def _batch(record_type: str, docs: list):
+    dates = [mongo_manager._timeseries_date(d) for d in docs]
+    label = "category" if record_type == "expense" else "source"
+    columns = {
+        "record_type": [record_type] * len(docs),
+        "user_id": [d.get("user_id") for d in docs],
+        "date": dates,
+        "year": [d.year for d in dates],
+        "month": [d.month for d in dates],
+        "category": [d.get(label) for d in docs],
+        "amount": [money.from_minor(money.minor_of(d)) for d in docs],
+        "currency": [d.get("currency") for d in docs],
+        "note": [d.get("note") for d in docs],
+        "created_at": [d.get("created_at") for d in docs],
+    }
+    return pa.RecordBatch.from_arrays([pa.array(columns[f.name], type=f.type) for f in SCHEMA], schema=SCHEMA)
+
+
+def record_batches(user_id: str=None, start=None, end=None, batch_size: int=BATCH_SIZE):
+    """Yield Arrow record batches of expenses, then income"""
+    _require()
+    for collection, record_type in (("expenses", "expense"), ("income", "income")):
+        docs = []
+        for doc in mongo_manager.iter_transactions(collection, user_id, start, end, batch_size=batch_size):
+            docs.append(doc)
+            if len(docs) >= batch_size:
+                yield _batch(record_type, docs)
+                docs = []
+        if docs:
+            yield _batch(record_type, docs)
+
+
+def to_table(user_id: str=None, start=None, end=None):
+    _require()
+    return pa.Table.from_batches(list(record_batches(user_id, start, end)), schema=SCHEMA)
+
+
+def parquet_bytes(user_id: str, start=None, end=None) -> bytes:
+    """One user's transactions as a single Parquet file (for downloads)"""
+    _require()
+    buf = io.BytesIO()
+    with pq.ParquetWriter(buf, SCHEMA, compression="zstd") as writer:
+        for batch in record_batches(user_id, start, end):
+            writer.write_batch(batch)
+    return buf.getvalue()
+
+
+def _partition_files(out_dir: str, name: str="*") -> list:
+    return glob.glob(os.path.join(glob.escape(out_dir), "year=*", "month=*", f"{name}-*.parquet"))
+
+
+def write_dataset(out_dir: str, user_id: str=None, start=None, end=None, batch_size: int=BATCH_SIZE) -> int:
+    """
+    Write a year/month-partitioned Parquet dataset under out_dir and return
+    the number of rows. Files are named after the user (or "all"); a
+    re-export replaces every file of its previous export, including
+    partitions that no longer have rows, and leaves other users' alone. An
+    "all" export replaces the per-user files too, and per-user exports are
+    refused next to an "all" export, so no row is counted twice.
+    """
+    _require()
+    name = user_id or "all"
+    if user_id and _partition_files(out_dir, "all"):
+        raise ValueError(f"{out_dir} holds an export of every user; write per-user exports to another directory")
+    stale = _partition_files(out_dir, "*" if user_id is None else name)
+    # New files get a fresh token, so the old ones stay readable until the write succeeds
+    token = uuid.uuid4().hex[:8]
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for batch in record_batches(user_id, start, end, batch_size):
+            rows += batch.num_rows
+            yield batch
+
+    try:
+        ds.write_dataset(
+            counted(), out_dir, schema=SCHEMA, format="parquet",
+            partitioning=PARTITIONING,
+            basename_template=f"{name}-{token}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        )
+    except Exception:
+        stale = [f for f in _partition_files(out_dir, name) if f"-{token}-" in os.path.basename(f)]
+        raise
+    finally:
+        _remove(stale)
+    return rows
+
+
+def _remove(paths: list):
+    for path in paths:
+        os.remove(path)
+        # Drop month=/year= directories left empty, never out_dir itself
+        month_dir = os.path.dirname(path)
+        for d in (month_dir, os.path.dirname(month_dir)):
+            try:
+                os.rmdir(d)
+            except OSError:
+                break
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export transactions to partitioned Parquet")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--user", help="only this user id (default: every user)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    count = write_dataset(args.out, args.user, batch_size=args.batch_size)
+    print(f"✅ Exported {count} transactions to {args.out}")
@@ -0,0 +1,134 @@
+# analytics/forecast.py
+# Forward-looking numbers for the Dashboard and Goals page:
+# - per-category month-end spend: spent so far + EWMA daily spend rate
+#   (last 90 days, zero-filled) x days left in the month
+# - goal completion dates: EWMA of monthly contributions vs. amount left
+# Spend comes from the shared frame cache (analytics/frame_cache.py) in
+# exact minor units, grouped per currency, so a miss runs no queries of its
+# own. Projections are cached per user against the frame cache's version,
+# which changes on every write seen here and on each TTL reload (so writes
+# from the API, the scheduler or other workers show up), and the cache is
+# capped at FRAME_CACHE_MAX_USERS like the frames themselves.
+import datetime
+import calendar
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config.settings import settings
+from database import mongo_manager
+from analytics import frame_cache
+from utils import money
+
+HISTORY_DAYS = 90
+DAILY_SPAN = 30    # EWMA span in days for spend rate
+MONTHLY_SPAN = 3   # EWMA span in months for goal contributions
+
+_categories = OrderedDict()  # user_id -> ((frame cache version, today), categories)
+_categories_lock = threading.Lock()
+
+
+def category_month_end(df: pd.DataFrame, today: datetime.date) -> pd.DataFrame:
+    """
+    df: a frame_cache expense frame (`date`, `category`, `currency`,
+    `amount_minor`). Returns currency, category, spent, daily_rate, projected
+    and projected_minor, one row per (currency, category).
+    """
+    cols = ["currency", "category", "spent", "daily_rate", "projected", "projected_minor"]
+    start = pd.Timestamp(today) - pd.Timedelta(days=HISTORY_DAYS - 1)
+    end = pd.Timestamp(today) + pd.Timedelta(days=1)
+    if not df.empty:
+        df = df[(df["date"] >= start) & (df["date"] < end)]
+    if df.empty:
+        return pd.DataFrame(columns=cols)
+    days = pd.date_range(start, pd.Timestamp(today), freq="D")
+    daily = (
+        df.assign(
+            day=df["date"].dt.normalize(),
+            category=df["category"].astype(object).fillna("Other"),
+            currency=df["currency"].astype(object).fillna(""),
+        )
+        .pivot_table(index="day", columns=["currency", "category"], values="amount_minor", aggfunc="sum")
+        .reindex(days, fill_value=0)
+        .fillna(0)
+        .astype(np.int64)
+    )
+    rate = daily.ewm(span=DAILY_SPAN, adjust=False).mean().iloc[-1]
+    month_start = pd.Timestamp(today.replace(day=1))
+    spent = daily.loc[daily.index >= month_start].sum()
+    days_left = calendar.monthrange(today.year, today.month)[1] - today.day
+    projected = (spent + (rate * days_left).round()).astype(np.int64)
+    out = pd.DataFrame({
+        "spent": spent / money.SCALE,
+        "daily_rate": rate / money.SCALE,
+        "projected": projected / money.SCALE,
+        "projected_minor": projected,
+    })
+    out = out[(out["spent"] > 0) | (out["projected"] > 0)]
+    return out.rename_axis(["currency", "category"]).reset_index().sort_values("projected", ascending=False)[cols]
+
+
+def projected_totals(categories: pd.DataFrame) -> dict:
+    """{currency: projected month-end spend}, summed from the integer projections"""
+    if categories.empty:
+        return {}
+    totals = categories.groupby("currency", sort=True)["projected_minor"].sum()
+    return {currency: money.to_float(minor) for currency, minor in totals.items()}
+
+
+def goal_eta(goal: dict, today: datetime.date):
+    """Projected completion date for a goal, or None if there's no contribution trend."""
+    target = float(goal.get("target_amount", 0) or 0)
+    current = float(goal.get("current_amount", 0) or 0)
+    if current >= target > 0:
+        return today
+    contributions = goal.get("contributions") or []
+    if not contributions:
+        return None
+    c = pd.DataFrame(contributions)
+    c["date"] = pd.to_datetime(c["date"], errors="coerce")
+    monthly = c.set_index("date")["amount"].resample("MS").sum()
+    monthly = monthly.reindex(pd.date_range(monthly.index.min(), pd.Timestamp(today).replace(day=1), freq="MS"), fill_value=0.0)
+    rate = float(monthly.ewm(span=MONTHLY_SPAN, adjust=False).mean().iloc[-1])
+    if rate <= 0:
+        return None
+    months_left = (target - current) / rate
+    return today + datetime.timedelta(days=int(round(months_left * 30.44)))
+
+
+def _month_end(user_id: str, today: datetime.date) -> pd.DataFrame:
+    frames = frame_cache.get(user_id)
+    key = (frames.version, today)
+    with _categories_lock:
+        hit = _categories.get(user_id)
+        if hit and hit[0] == key:
+            _categories.move_to_end(user_id)
+            return hit[1]
+    version, expenses = frames.versioned_frame("expenses")
+    categories = category_month_end(expenses, today)
+    with _categories_lock:
+        _categories[user_id] = ((version, today), categories)
+        _categories.move_to_end(user_id)
+        while len(_categories) > settings.FRAME_CACHE_MAX_USERS:
+            _categories.popitem(last=False)
+    return categories
+
+
+def get_forecast(user_id: str, today: datetime.date = None, goals: list = None) -> dict:
+    """
+    {"categories": DataFrame, "projected_totals": {currency: float},
+    "goal_etas": {goal_id: date|None}}. Pass `goals` when the caller has
+    already listed them to skip that query.
+    """
+    uid = str(user_id)
+    today = today or datetime.date.today()
+    categories = _month_end(uid, today)
+    if goals is None:
+        goals = mongo_manager.list_financial_goals(uid)
+    return {
+        "categories": categories,
+        "projected_totals": projected_totals(categories),
+        "goal_etas": {str(g.get("_id")): goal_eta(g, today) for g in goals},
+    }
@@ -0,0 +1,238 @@
+# analytics/frame_cache.py
+# Per-user columnar cache of expenses and income, shared by every page and
+# session in the process.
+#
+# Rows are held as NumPy columns instead of lists of dicts: dates as int64
+# milliseconds, amounts as int64 cents (utils/money.py) and category/source
+# and currency dictionary-encoded as int32 codes into a per-user string
+# table. Pages get pandas views (expenses()/income()) built straight from
+# those arrays: no ISO strings to reparse and no object columns for
+# repeated labels. Writes in this process append or drop rows through a
+# write listener; entries also expire after FRAME_CACHE_TTL_SECONDS so
+# writes made by other processes show up, and the least recently used
+# users are evicted beyond FRAME_CACHE_MAX_USERS.
+import time
+import itertools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config.settings import settings
+from database import mongo_manager
+from utils import money
+
+LABELS = {"expenses": "category", "income": "source"}
+_generations = itertools.count(1)  # process-unique state stamps
+
+
+class _Dictionary:
+    """Append-only string table; code -1 stands for a missing value"""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def encode(self, items) -> np.ndarray:
+        codes = np.empty(len(items), dtype=np.int32)
+        for i, item in enumerate(items):
+            if item is None or item == "":
+                codes[i] = -1
+                continue
+            code = self._codes.get(item)
+            if code is None:
+                code = self._codes[item] = len(self.values)
+                self.values.append(item)
+            codes[i] = code
+        return codes
+
+    def categorical(self, codes: np.ndarray) -> pd.Categorical:
+        return pd.Categorical.from_codes(codes, categories=pd.Index(self.values, dtype=object)).remove_unused_categories()
+
+
+class TransactionColumns:
+    """One collection's rows for one user, as parallel arrays"""
+
+    def __init__(self, collection: str):
+        self.collection = collection
+        self.label = LABELS[collection]
+        self.labels = _Dictionary()
+        self.currencies = _Dictionary()
+        self.id = np.empty(0, dtype=object)
+        self.date = np.empty(0, dtype=np.int64)
+        self.amount_minor = np.empty(0, dtype=np.int64)
+        self.label_code = np.empty(0, dtype=np.int32)
+        self.currency_code = np.empty(0, dtype=np.int32)
+        self.note = np.empty(0, dtype=object)
+        self.has_receipt = np.empty(0, dtype=bool)
+
+    def __len__(self):
+        return len(self.id)
+
+    def append(self, docs: list):
+        if not docs:
+            return
+        dates = np.array([mongo_manager._timeseries_date(d) for d in docs], dtype="datetime64[ms]")
+        # Arrays are replaced, never mutated, so frames handed out stay valid
+        self.id = np.concatenate([self.id, np.array([str(d["_id"]) for d in docs], dtype=object)])
+        self.date = np.concatenate([self.date, dates.astype(np.int64)])
+        self.amount_minor = np.concatenate([self.amount_minor, np.array([money.minor_of(d) for d in docs], dtype=np.int64)])
+        self.label_code = np.concatenate([self.label_code, self.labels.encode([d.get(self.label) for d in docs])])
+        self.currency_code = np.concatenate([self.currency_code, self.currencies.encode([d.get("currency") for d in docs])])
+        self.note = np.concatenate([self.note, np.array([d.get("note") or "" for d in docs], dtype=object)])
+        self.has_receipt = np.concatenate([self.has_receipt, np.array([bool(d.get("has_receipt")) for d in docs], dtype=bool)])
+
+    def remove(self, row_id: str):
+        keep = self.id != str(row_id)
+        if keep.all():
+            return
+        for name in ("id", "date", "amount_minor", "label_code", "currency_code", "note", "has_receipt"):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def frame(self, start=None, end=None) -> pd.DataFrame:
+        """Rows dated in [start, end), oldest first"""
+        mask = np.ones(len(self.id), dtype=bool)
+        if start is not None:
+            mask &= self.date >= _ms(start)
+        if end is not None:
+            mask &= self.date < _ms(end)
+        order = np.argsort(self.date[mask], kind="stable")
+        pick = np.flatnonzero(mask)[order]
+        minor = self.amount_minor[pick]
+        return pd.DataFrame({
+            "id": self.id[pick],
+            "date": pd.to_datetime(self.date[pick], unit="ms"),
+            "amount": minor / money.SCALE,
+            "amount_minor": minor,
+            self.label: self.labels.categorical(self.label_code[pick]),
+            "currency": self.currencies.categorical(self.currency_code[pick]),
+            "note": self.note[pick],
+            "has_receipt": self.has_receipt[pick],
+        })
+
+
+def _ms(d) -> int:
+    return int(np.datetime64(pd.Timestamp(d).to_datetime64(), "ms").astype(np.int64))
+
+
+class UserFrames:
+    """
+    A user's cached columns. The entry is registered before it loads, so
+    concurrent readers wait for one load instead of each running their own,
+    and writes arriving during the load are queued and replayed after it.
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = str(user_id)
+        self._lock = threading.Lock()
+        self.loaded_at = time.monotonic()
+        self.version = next(_generations)
+        self.columns = {collection: TransactionColumns(collection) for collection in LABELS}
+        self.ready = threading.Event()
+        self.error = None
+        self._pending = []  # ("add" | "remove", collection, doc) while loading
+
+    def load(self):
+        loaded = {c: list(mongo_manager.iter_transactions(c, self.user_id)) for c in LABELS}
+        with self._lock:
+            for collection, docs in loaded.items():
+                self.columns[collection].append(docs)
+            for op, collection, doc in self._pending:
+                cols = self.columns[collection]
+                if op == "remove":
+                    cols.remove(doc["_id"])
+                elif str(doc["_id"]) not in set(cols.id):  # the load may already hold it
+                    cols.append([doc])
+            self._pending = None
+            self.loaded_at = time.monotonic()
+            self.version = next(_generations)
+        self.ready.set()
+
+    def expired(self) -> bool:
+        return self.ready.is_set() and time.monotonic() - self.loaded_at > settings.FRAME_CACHE_TTL_SECONDS
+
+    def add(self, collection: str, doc: dict):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(("add", collection, doc))
+                return
+            self.columns[collection].append([doc])
+            self.version = next(_generations)
+
+    def remove(self, collection: str, row_id):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(("remove", collection, {"_id": row_id}))
+                return
+            self.columns[collection].remove(row_id)
+            self.version = next(_generations)
+
+    def frame(self, collection: str, start=None, end=None) -> pd.DataFrame:
+        with self._lock:
+            return self.columns[collection].frame(start, end)
+
+    def versioned_frame(self, collection: str):
+        """(version, frame): the stamp changes whenever rows are added or removed"""
+        with self._lock:
+            return self.version, self.columns[collection].frame()
+
+
+_users = OrderedDict()
+_users_lock = threading.Lock()
+
+
+def get(user_id: str) -> UserFrames:
+    uid = str(user_id)
+    with _users_lock:
+        frames = _users.get(uid)
+        loader = frames is None or frames.expired()
+        if loader:
+            frames = _users[uid] = UserFrames(uid)
+        _users.move_to_end(uid)
+        while len(_users) > settings.FRAME_CACHE_MAX_USERS:
+            _users.popitem(last=False)
+    if loader:
+        try:
+            frames.load()
+        except Exception as e:
+            with _users_lock:
+                if _users.get(uid) is frames:
+                    del _users[uid]
+            frames.error = e
+            frames.ready.set()
+            raise
+    else:
+        frames.ready.wait()
+        if frames.error is not None:
+            raise frames.error
+    return frames
+
+
+def expenses(user_id: str, start=None, end=None) -> pd.DataFrame:
+    """id, date, amount, amount_minor, category, currency, note, has_receipt"""
+    return get(user_id).frame("expenses", start, end)
+
+
+def income(user_id: str, start=None, end=None) -> pd.DataFrame:
+    """id, date, amount, amount_minor, source, currency, note, has_receipt"""
+    return get(user_id).frame("income", start, end)
+
+
+def invalidate(user_id: str):
+    with _users_lock:
+        _users.pop(str(user_id), None)
+
+
+@mongo_manager.register_write_listener
+def _on_write(event: str, user_id: str, doc: dict):
+    frames = _users.get(user_id)
+    if frames is None:
+        return
+    collection = "expenses" if event.startswith("expense_") else "income" if event.startswith("income_") else None
+    if collection is None:
+        return
+    if event.endswith("_added"):
+        frames.add(collection, doc)
+    elif event.endswith("_deleted"):
+        frames.remove(collection, doc["_id"])
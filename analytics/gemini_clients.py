@@ -0,0 +1,125 @@
+# analytics/gemini_clients.py
+# One configured Gemini client per API key, shared across sessions.
+# genai.configure() is process-global, so calling it per request lets
+# concurrent users with different keys race each other. Instead each key
+# gets its own GenerativeServiceClient, and requests are issued on it
+# directly through the public generativelanguage (glm) API.
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+from config import settings
+
+try:
+    import google.generativeai as genai
+    from google.ai import generativelanguage as glm
+except ImportError:
+    genai = None
+    glm = None
+
+
+def _part(part):
+    """A prompt part (text or PIL image) as a glm.Part"""
+    if isinstance(part, str):
+        return glm.Part(text=part)
+    if hasattr(part, "save"):
+        buf = io.BytesIO()
+        part.save(buf, format="PNG")
+        return glm.Part(inline_data=glm.Blob(mime_type="image/png", data=buf.getvalue()))
+    raise TypeError(f"Unsupported prompt part: {type(part).__name__}")
+
+
+def _text(response) -> str:
+    candidates = list(response.candidates)
+    if not candidates:
+        return ""
+    return "".join(p.text for p in candidates[0].content.parts if p.text)
+
+
+class GeminiModel:
+    """A model name bound to one API key's client."""
+
+    def __init__(self, client, model_name: str):
+        self.client = client
+        self.name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+
+    def _request(self, contents):
+        parts = [contents] if isinstance(contents, str) else list(contents)
+        return glm.GenerateContentRequest(
+            model=self.name,
+            contents=[glm.Content(role="user", parts=[_part(p) for p in parts])],
+        )
+
+    def generate(self, contents) -> str:
+        return _text(self.client.generate_content(self._request(contents)))
+
+    def stream(self, contents):
+        for chunk in self.client.stream_generate_content(self._request(contents)):
+            text = _text(chunk)
+            if text:
+                yield text
+
+
+def _close(entry: dict):
+    # Evicted clients would otherwise keep their gRPC channels open
+    try:
+        entry["client"].transport.close()
+    except Exception as e:
+        logging.warning(f"Closing Gemini client failed: {e}")
+
+
+class GeminiClientRegistry:
+    def __init__(self, max_clients: int = None):
+        self.max_clients = max_clients or settings.GEMINI_MAX_CLIENTS
+        self._entries = OrderedDict()  # api_key -> {"client": ..., "models": {name: GeminiModel}}
+        self._lock = threading.Lock()
+
+    def _entry(self, api_key: str) -> dict:
+        entry = self._entries.get(api_key)
+        if entry is None:
+            client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+            entry = {"client": client, "models": {}}
+            self._entries[api_key] = entry
+            while len(self._entries) > self.max_clients:
+                _close(self._entries.popitem(last=False)[1])
+        else:
+            self._entries.move_to_end(api_key)
+        return entry
+
+    def get_model(self, api_key: str, model_name: str) -> GeminiModel:
+        """GeminiModel bound to the client for `api_key` (created once, then reused)."""
+        if genai is None or glm is None:
+            raise RuntimeError("GenAI SDK not installed.")
+        with self._lock:
+            entry = self._entry(api_key)
+            model = entry["models"].get(model_name)
+            if model is None:
+                model = entry["models"][model_name] = GeminiModel(entry["client"], model_name)
+            return model
+
+    def evict(self, api_key: str):
+        with self._lock:
+            entry = self._entries.pop(api_key, None)
+        if entry is not None:
+            _close(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> GeminiClientRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = GeminiClientRegistry()
+    return _registry
+
+
+def get_model(api_key: str, model_name: str) -> GeminiModel:
+    return get_registry().get_model(api_key, model_name)
@@ -0,0 +1,321 @@
+# analytics/llm_gateway.py
+# Single entry point for Gemini `generate_content` calls:
+# - content-addressed response cache with TTL (identical prompts are answered
+#   once per API key; callers opt in to sharing answers across keys)
+# - coalescing of identical in-flight requests (followers wait for the leader)
+# - per-API-key rate limiting and retry with exponential backoff
+# - streaming with timeout/cancellation
+# - pluggable backend; FakeBackend runs offline for tests
+import time
+import queue
+import random
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from config import settings
+from utils.rate_limit import KeyedRateLimiter
+from analytics.gemini_clients import get_model
+
+try:
+    import google.generativeai as genai
+except ImportError:
+    genai = None
+
+
+class LLMError(Exception):
+    def __init__(self, message: str, code: int = None):
+        super().__init__(message)
+        self.code = code  # HTTP status when the failure came from the API
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+class GeminiBackend:
+    def generate(self, api_key: str, model_name: str, contents) -> str:
+        if genai is None:
+            raise LLMError("GenAI SDK not installed.")
+        return get_model(api_key, model_name).generate(contents)
+
+    def stream(self, api_key: str, model_name: str, contents):
+        if genai is None:
+            raise LLMError("GenAI SDK not installed.")
+        yield from get_model(api_key, model_name).stream(contents)
+
+
+class FakeBackend:
+    """Offline stand-in: returns canned text and records every call."""
+
+    def __init__(self, responses: dict = None, default: str = "OK", delay: float = 0.0, fail_times: int = 0):
+        self.responses = responses or {}
+        self.default = default
+        self.delay = delay
+        self.fail_times = fail_times
+        self.calls = []
+
+    def _text_for(self, contents) -> str:
+        prompt = contents if isinstance(contents, str) else " ".join(c for c in contents if isinstance(c, str))
+        for needle, text in self.responses.items():
+            if needle in prompt:
+                return text
+        return self.default
+
+    def generate(self, api_key: str, model_name: str, contents) -> str:
+        self.calls.append((api_key, model_name, contents))
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise LLMError("Service Unavailable (fake)", code=503)
+        return self._text_for(contents)
+
+    def stream(self, api_key: str, model_name: str, contents):
+        """Yield the canned text word by word, like a streaming model would."""
+        self.calls.append((api_key, model_name, contents))
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise LLMError("Service Unavailable (fake)", code=503)
+        for word in self._text_for(contents).split(" "):
+            if self.delay:
+                time.sleep(self.delay)
+            yield word + " "
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+_RETRYABLE_NAMES = {"ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests"}
+_RETRYABLE_CODES = {429, 500, 503, 504}
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """Transient failures only, by exception type or HTTP status; never by message text"""
+    if type(exc).__name__ in _RETRYABLE_NAMES:
+        return True
+    # google.api_core errors carry `code`, HTTP clients `status_code`
+    for attr in ("code", "status_code"):
+        code = getattr(exc, attr, None)
+        if isinstance(code, int) and code in _RETRYABLE_CODES:
+            return True
+    return False
+
+
+def cache_key(model_name: str, contents, api_key: str = None) -> str:
+    """
+    Hash of the model name and every prompt part (text, bytes or PIL image).
+    With `api_key` the key's fingerprint is mixed in, so a revoked or invalid
+    key is never answered from another call's cache.
+    """
+    h = hashlib.sha256(model_name.encode("utf-8"))
+    if api_key is not None:
+        h.update(b"\x01")
+        h.update(hashlib.sha256(api_key.encode("utf-8")).digest())
+    parts = [contents] if isinstance(contents, (str, bytes)) else list(contents)
+    for part in parts:
+        h.update(b"\x00")
+        if isinstance(part, str):
+            h.update(part.encode("utf-8"))
+        elif isinstance(part, (bytes, bytearray)):
+            h.update(part)
+        elif hasattr(part, "tobytes"):
+            h.update(f"{getattr(part, 'mode', '')}{getattr(part, 'size', '')}".encode("utf-8"))
+            h.update(part.tobytes())
+        else:
+            h.update(repr(part).encode("utf-8"))
+    return h.hexdigest()
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# -----------------------------
+# Gateway
+# -----------------------------
+class LLMGateway:
+    def __init__(self, backend=None, ttl: float = None, max_entries: int = 512, rate_per_minute: float = None, max_retries: int = 3, backoff: float = 1.0):
+        self.backend = backend or GeminiBackend()
+        self.ttl = settings.LLM_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries
+        self.max_retries = max_retries
+        self.backoff = backoff
+        rpm = settings.LLM_RATE_PER_MINUTE if rate_per_minute is None else rate_per_minute
+        if rpm < 0:
+            raise ValueError(f"rate_per_minute must be >= 0 (0 disables limiting), got {rpm}")
+        self.limiter = KeyedRateLimiter(capacity=max(1.0, rpm), rate=rpm / 60.0) if rpm > 0 else None
+        self._cache = OrderedDict()  # key -> (expires_at, text)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "retries": 0}
+
+    def _cache_get(self, key: str):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, text = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return text
+
+    def _cache_put(self, key: str, text: str, ttl: float):
+        self._cache[key] = (time.monotonic() + ttl, text)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _acquire(self, api_key: str):
+        if self.limiter is not None:
+            self.limiter.acquire(api_key)
+
+    def generate(self, api_key: str, model_name: str, contents, use_cache: bool = True, ttl: float = None, shared: bool = False) -> str:
+        """
+        Return the model's text for `contents`; raises LLMError on failure.
+        Answers are cached per API key; `shared=True` is for prompts that are
+        the same for every user (no personal data) and shares them across keys.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        key = cache_key(model_name, contents, None if shared else api_key)
+
+        with self._lock:
+            if use_cache:
+                text = self._cache_get(key)
+                if text is not None:
+                    self.stats["hits"] += 1
+                    return text
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlight()
+                self._inflight[key] = call
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._call_with_retry(api_key, model_name, contents)
+            if use_cache and ttl > 0:
+                with self._lock:
+                    self._cache_put(key, call.result, ttl)
+            return call.result
+        except Exception as e:
+            call.error = e if isinstance(e, LLMError) else LLMError(str(e))
+            raise call.error
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def _call_with_retry(self, api_key: str, model_name: str, contents) -> str:
+        attempt = 0
+        while True:
+            self._acquire(api_key)
+            try:
+                return self.backend.generate(api_key, model_name, contents)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+                logging.warning(f"LLM call failed ({e}); retrying in {delay:.1f}s")
+                self.stats["retries"] += 1
+                attempt += 1
+                time.sleep(delay)
+
+    def stream(self, api_key: str, model_name: str, contents, timeout: float = 60.0, cancel_event: threading.Event = None, use_cache: bool = True, ttl: float = None, shared: bool = False):
+        """
+        Yield response text incrementally. The backend runs in a worker thread so
+        `timeout` (whole response) and `cancel_event` are honoured even while
+        waiting for the first token. Completed responses land in the cache.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        key = cache_key(model_name, contents, None if shared else api_key)
+        if use_cache:
+            with self._lock:
+                text = self._cache_get(key)
+                if text is not None:
+                    self.stats["hits"] += 1
+            if text is not None:
+                yield text
+                return
+
+        self._acquire(api_key)
+        chunks = queue.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def _pump():
+            try:
+                for piece in self.backend.stream(api_key, model_name, contents):
+                    if stop.is_set():
+                        break
+                    chunks.put(piece)
+                chunks.put(done)
+            except Exception as e:
+                chunks.put(e)
+
+        threading.Thread(target=_pump, daemon=True).start()
+        deadline = time.monotonic() + timeout if timeout else None
+        parts = []
+        try:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                wait = 0.25
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise LLMError(f"Response timed out after {timeout:g}s")
+                    wait = min(wait, remaining)
+                try:
+                    item = chunks.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item if isinstance(item, LLMError) else LLMError(str(item))
+                parts.append(item)
+                yield item
+            if use_cache and ttl > 0:
+                with self._lock:
+                    self._cache_put(key, "".join(parts), ttl)
+        finally:
+            # Reached on completion, error, timeout or when the consumer stops early
+            stop.set()
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """Process-wide gateway shared by every session."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+
+def set_gateway(gateway: LLMGateway):
+    """Swap the shared gateway (e.g. LLMGateway(backend=FakeBackend()) in tests)."""
+    global _gateway
+    with _gateway_lock:
+        _gateway = gateway
@@ -14,7 +14,13 @@ from reportlab.lib.utils import ImageReader
 from reportlab.lib.units import inch
 
 from database import mongo_manager
+from database import records
+from auth import session
 from analytics.ai_insights import AIInsights
+from analytics import exports
+from analytics import duckdb_engine
+from analytics import frame_cache
+from utils import money
 
 
 # Helper: converts various date inputs to datetime
@@ -45,7 +51,7 @@ def _create_charts(exp_df: pd.DataFrame, inc_df: pd.DataFrame):
 
     # Chart 1: Expense by Category (pie)
     if not exp_df.empty:
-        by_cat = exp_df.groupby("category")["amount"].sum().sort_values(ascending=False)
+        by_cat = exp_df.groupby("category", observed=True)["amount"].sum().sort_values(ascending=False)
         plt.figure(figsize=(6, 4))
         # show only top 8 categories, aggregate rest as "Other"
         top = by_cat.head(8)
@@ -86,7 +92,7 @@ def _create_charts(exp_df: pd.DataFrame, inc_df: pd.DataFrame):
 
     # Chart 3: Top Categories (bar)
     if not exp_df.empty:
-        by_cat = exp_df.groupby("category")["amount"].sum().sort_values(ascending=False).head(10)
+        by_cat = exp_df.groupby("category", observed=True)["amount"].sum().sort_values(ascending=False).head(10)
         plt.figure(figsize=(8, 3.5))
         by_cat.plot(kind="barh")
         plt.gca().invert_yaxis()
@@ -104,8 +110,8 @@ def _create_charts(exp_df: pd.DataFrame, inc_df: pd.DataFrame):
 
     # Chart 4: Income vs Expense (bar)
     if not exp_df.empty or not inc_df.empty:
-        total_exp = exp_df["amount"].sum() if not exp_df.empty else 0.0
-        total_inc = inc_df["amount"].sum() if not inc_df.empty else 0.0
+        total_exp = money.frame_total(exp_df)
+        total_inc = money.frame_total(inc_df)
         plt.figure(figsize=(6, 3))
         categories = ["Income", "Expense"]
         values = [total_inc, total_exp]
@@ -128,16 +134,15 @@ class Reports:
     def generate_csv(self, user_id: str, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> bytes:
         start_dt = _to_datetime(start)
         end_dt = _to_datetime(end)
-        expenses = mongo_manager.list_expenses(user_id, limit=100000)
-        incomes = mongo_manager.list_income(user_id, limit=100000)
+        expenses = mongo_manager.list_expenses(user_id, limit=100000, secondary=True)
+        incomes = mongo_manager.list_income(user_id, limit=100000, secondary=True)
 
         def _in_range(row_date):
             if not row_date:
                 return False
-            dt = _to_datetime(row_date)
-            if start_dt and dt < start_dt:
+            if start_dt and row_date < start_dt:
                 return False
-            if end_dt and dt > (end_dt + datetime.timedelta(days=1)):
+            if end_dt and row_date > (end_dt + datetime.timedelta(days=1)):
                 return False
             return True
 
@@ -148,62 +153,56 @@ class Reports:
         ])
 
         for r in expenses:
-            rd = r.get("date")
-            if (not start_dt and not end_dt) or _in_range(rd):
+            if (not start_dt and not end_dt) or _in_range(r.date):
                 writer.writerow([
                     "expense",
-                    r.get("date"),
-                    r.get("category", ""),
-                    _fmt(r.get("amount", 0.0)),
-                    r.get("currency", ""),
-                    r.get("note", ""),
-                    r.get("created_at", "")
+                    records.format_date(r.date, records.DATETIME_FORMAT),
+                    r.category,
+                    _fmt(r.amount),
+                    r.currency,
+                    r.note,
+                    records.format_date(r.created_at, records.DATETIME_FORMAT)
                 ])
 
         for r in incomes:
-            rd = r.get("date")
-            if (not start_dt and not end_dt) or _in_range(rd):
+            if (not start_dt and not end_dt) or _in_range(r.date):
                 writer.writerow([
                     "income",
-                    r.get("date"),
-                    r.get("source", ""),
-                    _fmt(r.get("amount", 0.0)),
-                    r.get("currency", ""),
+                    records.format_date(r.date, records.DATETIME_FORMAT),
+                    r.source,
+                    _fmt(r.amount),
+                    r.currency,
                     "",
-                    r.get("created_at", "")
+                    records.format_date(r.created_at, records.DATETIME_FORMAT)
                 ])
 
         return out.getvalue().encode("utf-8")
 
+    def generate_parquet(self, user_id: str, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> bytes:
+        # Typed columns (decimal amounts, timestamps) instead of formatted text
+        start_dt = _to_datetime(start)
+        end_dt = _to_datetime(end)
+        return exports.parquet_bytes(user_id, start_dt, end_dt + datetime.timedelta(days=1) if end_dt else None)
+
     def generate_pdf(self, user_id: str, start: Optional[datetime.date], end: Optional[datetime.date]) -> bytes:
         start_dt = _to_datetime(start)
         end_dt = _to_datetime(end)
-        expenses = mongo_manager.list_expenses(user_id, limit=100000)
-        incomes = mongo_manager.list_income(user_id, limit=100000)
-
-        exp_df = pd.DataFrame(expenses)
-        inc_df = pd.DataFrame(incomes)
-        if not exp_df.empty:
-            exp_df["amount"] = exp_df["amount"].astype(float)
-            exp_df["date"] = pd.to_datetime(exp_df["date"], errors="coerce")
+        end_plus = end_dt + datetime.timedelta(days=1) if end_dt else None
+        if duckdb_engine.enabled():
+            # Date range filtered in the local mirror, not by pulling everything
+            exp_df = duckdb_engine.rows(user_id, "expense", start_dt, end_plus)
+            inc_df = duckdb_engine.rows(user_id, "income", start_dt, end_plus)
         else:
+            exp_df = frame_cache.expenses(user_id, start_dt, end_plus)
+            inc_df = frame_cache.income(user_id, start_dt, end_plus)
+        # Both sources return typed columns already limited to the range
+        if exp_df.empty:
             exp_df = pd.DataFrame(columns=["category", "amount", "date", "note", "currency"])
-        if not inc_df.empty:
-            inc_df["amount"] = inc_df["amount"].astype(float)
-            inc_df["date"] = pd.to_datetime(inc_df["date"], errors="coerce")
-        else:
+        if inc_df.empty:
             inc_df = pd.DataFrame(columns=["source", "amount", "date", "currency"])
 
-        if start_dt:
-            exp_df = exp_df[exp_df["date"] >= start_dt]
-            inc_df = inc_df[inc_df["date"] >= start_dt]
-        if end_dt:
-            end_plus = end_dt + datetime.timedelta(days=1)
-            exp_df = exp_df[exp_df["date"] < end_plus]
-            inc_df = inc_df[inc_df["date"] < end_plus]
-
-        total_exp = exp_df["amount"].sum() if not exp_df.empty else 0.0
-        total_inc = inc_df["amount"].sum() if not inc_df.empty else 0.0
+        total_exp = money.frame_total(exp_df)
+        total_inc = money.frame_total(inc_df)
         balance = total_inc - total_exp
         imgs = _create_charts(exp_df, inc_df)
 
@@ -215,7 +214,7 @@ class Reports:
         section_spacing = 20  # space between sections
 
         # --- COVER PAGE ---
-        user = mongo_manager.get_user_by_id(user_id) or {}
+        user = session.get_profile(user_id) or {}
         name = user.get("name", "User")
 
         c.setFont("Helvetica-Bold", 18)
@@ -3,6 +3,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 from database import mongo_manager
+from analytics.llm_gateway import get_gateway
 
 try:
     import google.generativeai as genai
@@ -17,6 +18,9 @@ INDIAN_STOCKS = [
     "ULTRACEMCO.NS","TECHM.NS"
 ]
 
+# The stock prompt is identical for every user, so share answers for a while
+STOCK_PROMPT_TTL = 15 * 60
+
 def build_stock_prompt(tickers):
     prompt_lines = [
         "You are an experienced equity research analyst focused on Indian NSE stocks.",
@@ -47,11 +51,8 @@ def render_stock_trends_page(user_id: str):
         if genai and api_key:
             with st.spinner("Generating AI suggestions via Gemini..."):
                 try:
-                    genai.configure(api_key=api_key)
-                    model = genai.GenerativeModel("gemini-2.5-flash")
                     prompt = build_stock_prompt(INDIAN_STOCKS)
-                    response = model.generate_content(prompt)
-                    ai_text = getattr(response, "text", None) or str(response)
+                    ai_text = get_gateway().generate(api_key, "gemini-2.5-flash", prompt, ttl=STOCK_PROMPT_TTL, shared=True)
 
                     st.subheader("💡 AI Investment Suggestions (Gemini)")
                     st.write(ai_text)
@@ -0,0 +1,268 @@
+# api/main.py
+# Headless JSON API over the same managers the Streamlit UI uses.
+#
+#   uvicorn api.main:app --host 0.0.0.0 --port 8000 --workers 4
+#
+# Workers keep no per-request state (auth is a bearer token, ETags are
+# hashes of the response body), so the service scales out behind any load
+# balancer independently of the UI. Configure it through the same
+# environment variables as the app (MONGO_URI, SECRET_KEY, ...).
+import json
+import hashlib
+import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from pydantic import BaseModel, Field
+
+from config import settings
+from auth.authenticator import Authenticator
+from auth import session
+from database import mongo_manager
+from features.expense_manager import ExpenseManager
+from features.income_manager import IncomeManager
+from features.budget_manager import BudgetManager
+from analytics.reports import Reports
+from analytics import forecast
+from analytics import anomalies
+
+app = FastAPI(title="Expense Tracker API", version="1.0")
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# Refuse to start without a real signing key: every route trusts the token
+session.signing_key(settings.SECRET_KEY)
+authenticator = Authenticator(settings.SECRET_KEY)
+reports = Reports()
+bearer = HTTPBearer(auto_error=False)
+
+MAX_PER_PAGE = 500
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def current_user(creds: Optional[HTTPAuthorizationCredentials] = Depends(bearer)) -> dict:
+    user = authenticator.verify_token(creds.credentials) if creds else None
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid or missing token", headers={"WWW-Authenticate": "Bearer"})
+    return user
+
+
+def json_response(request: Request, payload, status_code: int = 200) -> Response:
+    """
+    Serialize `payload` and tag it with an ETag; answer 304 when the client
+    already holds this exact representation.
+    """
+    body = json.dumps(payload, separators=(",", ":"), default=_json_default).encode()
+    # Weak: the gzip middleware may re-encode the bytes on the wire
+    etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if status_code == 200 and etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+def _json_default(o):
+    if isinstance(o, (datetime.date, datetime.datetime)):
+        return o.isoformat() if not pd.isna(o) else None
+    if isinstance(o, np.generic):
+        return o.item()
+    if o is pd.NaT:
+        return None
+    return str(o)  # ObjectId and friends
+
+
+def page_payload(rows: list, total: int, page: int, per_page: int) -> dict:
+    return {
+        "items": rows,
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "pages": (total + per_page - 1) // per_page,
+    }
+
+
+def frame_records(df) -> list:
+    # NaN isn't valid JSON
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+# -----------------------------
+# Schemas
+# -----------------------------
+class LoginIn(BaseModel):
+    email: str
+    password: str
+
+
+class ExpenseIn(BaseModel):
+    amount: float = Field(gt=0)
+    category: str
+    note: str = ""
+    date: Optional[datetime.date] = None
+    currency: str = "USD"
+
+
+class IncomeIn(BaseModel):
+    amount: float = Field(gt=0)
+    source: str
+    date: Optional[datetime.date] = None
+    currency: str = "USD"
+
+
+class BudgetIn(BaseModel):
+    monthly_limit: float = Field(ge=0)
+
+
+# -----------------------------
+# Auth
+# -----------------------------
+@app.post("/auth/login")
+def login(body: LoginIn, request: Request):
+    ok, user, token, msg = authenticator.login(body.email, body.password, client_ip=request.client.host if request.client else None)
+    if not ok:
+        status = 429 if msg.startswith("Too many") else 401
+        raise HTTPException(status_code=status, detail=msg)
+    return {"token": token, "user": user}
+
+
+@app.get("/me")
+def me(request: Request, user: dict = Depends(current_user)):
+    return json_response(request, user)
+
+
+# -----------------------------
+# Expenses
+# -----------------------------
+@app.get("/expenses")
+def list_expenses(request: Request, page: int = Query(1, ge=1), per_page: int = Query(50, ge=1, le=MAX_PER_PAGE), user: dict = Depends(current_user)):
+    rows, total = ExpenseManager(user["id"]).list_page(page, per_page)
+    return json_response(request, page_payload([r.as_dict() for r in rows], total, page, per_page))
+
+
+@app.get("/expenses/search")
+def search_expenses(request: Request, q: str, page: int = Query(1, ge=1), per_page: int = Query(20, ge=1, le=100), user: dict = Depends(current_user)):
+    return json_response(request, ExpenseManager(user["id"]).search(q, page=page, per_page=per_page))
+
+
+@app.post("/expenses", status_code=201)
+def add_expense(body: ExpenseIn, user: dict = Depends(current_user)):
+    ExpenseManager(user["id"]).add_expense(body.amount, body.category, body.note, body.date, body.currency)
+    return {"ok": True}
+
+
+@app.delete("/expenses/{expense_id}")
+def delete_expense(expense_id: str, user: dict = Depends(current_user)):
+    if not ExpenseManager(user["id"]).delete_expense(expense_id):
+        raise HTTPException(status_code=404, detail="Expense not found")
+    return {"ok": True}
+
+
+@app.get("/expenses/suggest-category")
+def suggest_category(note: str, user: dict = Depends(current_user)):
+    suggestion = ExpenseManager(user["id"]).suggest_category(note)
+    if not suggestion:
+        return {"category": None, "confidence": 0.0}
+    category, confidence = suggestion
+    return {"category": category, "confidence": confidence}
+
+
+# -----------------------------
+# Income
+# -----------------------------
+@app.get("/income")
+def list_income(request: Request, page: int = Query(1, ge=1), per_page: int = Query(50, ge=1, le=MAX_PER_PAGE), user: dict = Depends(current_user)):
+    rows, total = IncomeManager(user["id"]).list_page(page, per_page)
+    return json_response(request, page_payload([r.as_dict() for r in rows], total, page, per_page))
+
+
+@app.post("/income", status_code=201)
+def add_income(body: IncomeIn, user: dict = Depends(current_user)):
+    IncomeManager(user["id"]).add_income(body.amount, body.source, body.date, body.currency)
+    return {"ok": True}
+
+
+@app.delete("/income/{income_id}")
+def delete_income(income_id: str, user: dict = Depends(current_user)):
+    if not IncomeManager(user["id"]).delete_income(income_id):
+        raise HTTPException(status_code=404, detail="Income not found")
+    return {"ok": True}
+
+
+# -----------------------------
+# Budgets
+# -----------------------------
+@app.get("/budgets")
+def list_budgets(request: Request, user: dict = Depends(current_user)):
+    return json_response(request, mongo_manager.list_budgets(user["id"]))
+
+
+@app.get("/budgets/status")
+def budget_status(user: dict = Depends(current_user)):
+    return {"summary": BudgetManager(user["id"]).budget_status_summary()}
+
+
+@app.put("/budgets/{category}")
+def set_budget(category: str, body: BudgetIn, user: dict = Depends(current_user)):
+    BudgetManager(user["id"]).set_budget(category, body.monthly_limit)
+    return {"ok": True}
+
+
+@app.delete("/budgets/{category}")
+def delete_budget(category: str, user: dict = Depends(current_user)):
+    if not BudgetManager(user["id"]).delete_budget(category):
+        raise HTTPException(status_code=404, detail="Budget not found")
+    return {"ok": True}
+
+
+# -----------------------------
+# Reports
+# -----------------------------
+@app.get("/reports/{fmt}")
+def download_report(fmt: str, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None, user: dict = Depends(current_user)):
+    if fmt == "csv":
+        data, media = reports.generate_csv(user["id"], start=start, end=end), "text/csv"
+    elif fmt == "pdf":
+        data, media = reports.generate_pdf(user["id"], start=start, end=end), "application/pdf"
+    else:
+        raise HTTPException(status_code=404, detail="Unknown report format")
+    return Response(data, media_type=media, headers={"Content-Disposition": f"attachment; filename=report.{fmt}"})
+
+
+# -----------------------------
+# Analytics
+# -----------------------------
+@app.get("/analytics/summary")
+def analytics_summary(request: Request, months: int = Query(12, ge=1, le=120), user: dict = Depends(current_user)):
+    uid = user["id"]
+    return json_response(request, {
+        "categories": mongo_manager.get_expense_summary(uid),
+        "income_sources": mongo_manager.get_income_summary(uid),
+        "monthly_expenses": mongo_manager.get_monthly_totals(uid, "expenses", months),
+        "monthly_income": mongo_manager.get_monthly_totals(uid, "income", months),
+        "top_merchants": mongo_manager.get_top_merchants(uid),
+    })
+
+
+@app.get("/analytics/forecast")
+def analytics_forecast(request: Request, user: dict = Depends(current_user)):
+    fc = forecast.get_forecast(user["id"])
+    return json_response(request, {
+        "projected_totals": fc["projected_totals"],
+        "categories": frame_records(fc["categories"]),
+        "goal_etas": fc["goal_etas"],
+    })
+
+
+@app.get("/analytics/anomalies")
+def analytics_anomalies(request: Request, limit: int = Query(20, ge=1, le=200), user: dict = Depends(current_user)):
+    return json_response(request, anomalies.get_findings(user["id"], limit=limit))
+
+
+@app.get("/health")
+def health():
+    return {"ok": True}
@@ -1,9 +1,11 @@
+import threading
 import streamlit as st
 import pandas as pd
 from config import settings
 from auth.authenticator import Authenticator
 from database import mongo_manager
 from database.mongo_manager import init_db
+from database import records
 from features.expense_manager import ExpenseManager
 from features.income_manager import IncomeManager
 from features.budget_manager import BudgetManager
@@ -12,14 +14,17 @@ from features.currency_converter import CurrencyConverter
 from analytics.dashboard import render_dashboard
 from analytics import stock_trends
 from analytics.reports import Reports
+from analytics import exports
 from analytics.ai_insights import AIInsights
 from collaboration.shared_accounts import SharedAccounts
+from collaboration.group_ledger import GroupLedger
 from gamification.achievements import Achievements
 from notifications.email_handler import EmailHandler
 from ui.theme import apply_theme
-from ui.components import nav_bar, animated_header
-from datetime import datetime
+from ui.components import nav_bar, animated_header, stop_button, was_stopped
+from datetime import datetime, timedelta
 from features.chatbot import ChatBot
+from features import recurring_scheduler
 from notifications import email_handler
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -44,6 +49,24 @@ apply_theme()
 # ---------- Initialize DB ----------
 db = init_db()
 
+@st.cache_resource
+def start_recurring_scheduler():
+    # One scheduler thread per server process, not per session
+    return recurring_scheduler.start_background_worker(settings.RECURRING_INTERVAL_SECONDS)
+
+start_recurring_scheduler()
+
+@st.cache_resource
+def run_startup_migrations():
+    # Idempotent data fixes; once per server process
+    return {
+        "inline_receipts": mongo_manager.migrate_inline_receipts(),
+        "bill_due_dates": mongo_manager.normalize_bill_due_dates(),
+        "minor_amounts": mongo_manager.backfill_minor_amounts(),
+    }
+
+run_startup_migrations()
+
 # ---------- Initialize Services ----------
 auth = Authenticator(settings.SECRET_KEY)
 email_service = EmailHandler(settings)
@@ -63,6 +86,24 @@ st.session_state.setdefault("logged_in", False)  # Flag for rendering authentica
 animated_header()
 
 # ---------- Authentication Flow ----------
+def client_ip():
+    # Behind a proxy the first X-Forwarded-For hop is the browser
+    headers = getattr(getattr(st, "context", None), "headers", None) or {}
+    forwarded = headers.get("X-Forwarded-For", "")
+    return forwarded.split(",")[0].strip() or getattr(st.context, "ip_address", None)
+
+# Re-check the signed session token on every rerun (no database hit);
+# an expired or tampered token drops back to the login screen.
+if st.session_state.logged_in:
+    verified_user = auth.verify_token(st.session_state.token)
+    if verified_user:
+        st.session_state.user = verified_user
+    else:
+        st.session_state.token = None
+        st.session_state.user = None
+        st.session_state.logged_in = False
+        st.warning("Your session has expired. Please log in again.")
+
 if not st.session_state.logged_in:
     tab_login, tab_signup = st.tabs(["Login", "Sign Up"])
 
@@ -78,7 +119,7 @@ if not st.session_state.logged_in:
                 if not email or not password:
                     st.warning("Please fill all fields")
                 else:
-                    ok, user, token, msg = auth.login(email, password)
+                    ok, user, token, msg = auth.login(email, password, client_ip=client_ip())
                     if ok:
                         st.session_state.token = token
                         st.session_state.user = user
@@ -101,7 +142,7 @@ if not st.session_state.logged_in:
                 if not name or not email2 or not pass1:
                     st.warning("Please fill all fields")
                 else:
-                    ok, msg = auth.signup(name, email2, pass1)
+                    ok, msg = auth.signup(name, email2, pass1, client_ip=client_ip())
                     if ok:
                         st.success("🎉 Account created! Please log in.")
                     else:
@@ -202,6 +243,11 @@ elif page == "Expenses":
                                 except:
                                     ocr_text = "Receipt analyzed by AI"
                                 
+                                # Prefer the user's own categorization habits when the local model is confident
+                                suggestion = exp_mgr.suggest_category(note, ocr_text)
+                                if suggestion:
+                                    category = suggestion[0]
+                                
                                 # Add expense directly to database
                                 exp_mgr.add_expense(
                                     amount=amount,
@@ -209,7 +255,9 @@ elif page == "Expenses":
                                     note=note,
                                     date=date_val,
                                     currency_code=currency_code,
-                                    receipt_text=ocr_text
+                                    receipt_text=ocr_text,
+                                    receipt_image=receipt.getvalue(),
+                                    receipt_thumbnail=ocr.make_thumbnail(receipt)
                                 )
                                 
                                 st.success(f"✅ Expense added successfully! Amount: {currency_code} {amount:,.2f}")
@@ -291,6 +339,15 @@ elif page == "Expenses":
         currency_code = st.text_input("Currency", value=st.session_state.currency_value, key="currency_input")
 
     note = st.text_input("Note", value=st.session_state.note_value, key="note_input")
+
+    # --- Local category suggestion from the note ---
+    suggestion = exp_mgr.suggest_category(note) if note.strip() else None
+    if suggestion and suggestion[0] in categories and suggestion[0] != category:
+        st.button(
+            f"💡 Use suggested category: {suggestion[0]} ({suggestion[1]:.0%})",
+            key="use_suggested_category",
+            on_click=lambda c=suggestion[0]: st.session_state.update(category_input=c)
+        )
     
     import datetime as dt_module
     date = st.date_input("Date", value=st.session_state.date_value, key="date_input")
@@ -323,11 +380,15 @@ elif page == "Expenses":
                         
                         # Extract OCR text from receipt if available
                         ocr_text = None
+                        receipt_image = None
+                        receipt_thumbnail = None
                         if receipt:
                             try:
                                 ocr_text = ocr.extract_text(receipt)
                             except:
                                 ocr_text = ""
+                            receipt_image = receipt.getvalue()
+                            receipt_thumbnail = ocr.make_thumbnail(receipt)
 
                         exp_mgr.add_expense(
                             amount=amt,
@@ -335,7 +396,9 @@ elif page == "Expenses":
                             note=note,
                             date=date_val,
                             currency_code=currency_code.upper(),
-                            receipt_text=ocr_text
+                            receipt_text=ocr_text,
+                            receipt_image=receipt_image,
+                            receipt_thumbnail=receipt_thumbnail
                         )
 
                         # Clear form fields and widget state
@@ -375,8 +438,19 @@ elif page == "Expenses":
     st.divider()
     st.subheader("Your Expenses")
 
-    # --- Fetch updated expenses ---
-    df_expenses = exp_mgr.list_expenses_df().copy()
+    # --- Search (note, category, tax category, receipt text) ---
+    search_col, page_col = st.columns([4, 1])
+    with search_col:
+        search_query = st.text_input("🔍 Search expenses", key="expense_search", placeholder="e.g. coffee, uber, electricity")
+    if search_query.strip():
+        with page_col:
+            search_page = st.number_input("Page", min_value=1, value=1, step=1, key="expense_search_page")
+        results, total_matches = exp_mgr.search(search_query, page=int(search_page), per_page=20)
+        st.caption(f"{total_matches} matching expense(s)")
+        df_expenses = pd.DataFrame(results)
+    else:
+        # --- Fetch updated expenses ---
+        df_expenses = exp_mgr.list_expenses_df().copy()
 
     if df_expenses.empty:
         st.info("No expenses logged yet.")
@@ -391,12 +465,14 @@ elif page == "Expenses":
             cols[0].markdown(row['category'])
             cols[1].markdown(f"₹{row['amount']:,.2f} ({row.get('currency', currency.base)})")
             cols[2].markdown(row.get('note', '—'))
-            cols[3].markdown(str(row['date']))
+            cols[3].markdown(records.format_date(row['date']))
 
-            receipt_preview = row.get('receipt_text', '')[:30]
-            if len(row.get('receipt_text', '')) > 30:
-                receipt_preview += "..."
-            cols[4].markdown(receipt_preview)
+            # Receipt text/images are fetched lazily, only when viewed
+            if row.get('has_receipt') == True:
+                if cols[4].button(f"📄 {row.get('receipt_preview') or 'View'}", key=f"view_receipt_{row['id']}"):
+                    st.session_state.open_receipt = None if st.session_state.get("open_receipt") == row['id'] else row['id']
+            else:
+                cols[4].markdown("—")
 
             # --- Delete button (single click refresh, same as Budgets) ---
             if cols[5].button("🗑️", key=f"del_exp_{row['id']}"):
@@ -408,6 +484,17 @@ elif page == "Expenses":
                 else:
                     st.error("Failed to delete expense")
 
+            if st.session_state.get("open_receipt") == row['id']:
+                receipt_data = exp_mgr.get_receipt(row['id'], include_image=True)
+                if receipt_data:
+                    with st.container():
+                        if receipt_data.get("image") or receipt_data.get("thumbnail"):
+                            st.image(receipt_data.get("image") or receipt_data.get("thumbnail"), width=320)
+                        if receipt_data.get("text"):
+                            st.code(receipt_data["text"])
+                else:
+                    st.info("Receipt not found.")
+
     st.info("Click **🗑️** to remove an expense.")
 
 
@@ -479,16 +566,12 @@ elif page == "Income":
             cols = st.columns([2, 2, 2, 2, 1])
             cols[0].markdown(row.get('source', '—'))
             cols[1].markdown(f"₹{row['amount']:,.2f}")
-            cols[2].markdown(str(row['date']))
+            cols[2].markdown(records.format_date(row['date']))
             cols[3].markdown(row.get('currency', currency.base))
 
             delete_key = f"del_income_{row['id']}"
             if cols[4].button("🗑️", key=delete_key):
-                from database import mongo_manager
-                ok = mongo_manager.db.income.delete_one({
-                    "user_id": user["id"],
-                    "_id": mongo_manager.ObjectId(row['id'])
-                }).acknowledged
+                ok = inc_mgr.delete_income(row['id'])
 
                 if ok:
                     st.session_state.deleted_income_id = row['id']
@@ -524,24 +607,8 @@ elif page == "Budgets":
     if st.button("Set Budget"):
         try:
             amt = float(str(monthly_limit).replace(",", ""))
-            from database import mongo_manager
-
             # ✅ Update if exists, else insert new (avoids duplicate key error)
-            mongo_manager.db.budgets.update_one(
-                {"user_id": user["id"], "category": category},
-                {
-                    "$set": {
-                        "monthly_limit": amt,
-                        "remaining": amt,
-                        "spent": 0,
-                        "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    },
-                    "$setOnInsert": {
-                        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    },
-                },
-                upsert=True
-            )
+            bud_mgr.set_budget(category, amt)
 
             st.success("Budget set ✅")
             st.session_state.refresh_budgets += 1
@@ -576,10 +643,7 @@ elif page == "Budgets":
 
             # Delete budget button
             if cols[4].button("🗑️", key=f"del_budget_{row['category']}"):
-                ok = mongo_manager.db.budgets.delete_one({
-                    "user_id": user["id"],
-                    "category": row['category']
-                }).acknowledged
+                ok = bud_mgr.delete_budget(row['category'])
                 if ok:
                     st.success(f"Deleted budget: {row['category']}")
                     st.session_state.refresh_budgets += 1
@@ -595,11 +659,14 @@ elif page == "Reports":
     st.subheader("Generate Report")
     start = st.date_input("Start Date")
     end = st.date_input("End Date")
-    fmt = st.selectbox("Format", ["CSV", "PDF"])
+    fmt = st.selectbox("Format", ["CSV", "PDF", "Parquet"] if exports.available() else ["CSV", "PDF"])
     if st.button("Download"):
         if fmt == "CSV":
             data = reports.generate_csv(user["id"], start, end)
             st.download_button("Download CSV", data=data, file_name="report.csv", mime="text/csv")
+        elif fmt == "Parquet":
+            data = reports.generate_parquet(user["id"], start, end)
+            st.download_button("Download Parquet", data=data, file_name="transactions.parquet", mime="application/vnd.apache.parquet")
         else:
             pdf_bytes = reports.generate_pdf(user["id"], start, end)
             st.download_button("Download PDF", data=pdf_bytes, file_name="report.pdf", mime="application/pdf")
@@ -609,19 +676,23 @@ elif page == "AI Insights":
 
     prompt = st.text_area("Ask about your finances (e.g., 'Where did I overspend last month?')")
 
+    if was_stopped("ai_insights_cancel"):
+        st.info("Stopped.")
+
     if st.button("Analyze"):
         if not prompt.strip():
             st.warning("Please enter a question or prompt.")
         else:
-            with st.spinner("Analyzing your data..."):
-                result, error = ai.analyze(user["id"], prompt)
+            cancel = threading.Event()
+            stream, error = ai.stream_analyze(user["id"], prompt, cancel_event=cancel)
 
             if error:
                 st.error(error)
                 st.info("➡️ Go to **Settings → Gemini API Configuration** to add your key.")
             else:
                 st.markdown("### ✨ AI Insights:")
-                st.write(result)
+                stop_button("ai_insights_cancel", cancel)
+                st.write_stream(stream)
 
 
 elif page == "Collaboration":
@@ -680,7 +751,7 @@ elif page == "Collaboration":
                     owner_exps = mongo_manager.list_expenses(owner_id, limit=50)
                     if owner_exps:
                         st.subheader("📊 Recent Expenses")
-                        st.dataframe(pd.DataFrame(owner_exps), use_container_width=True)
+                        st.dataframe(records.to_frame(owner_exps), use_container_width=True)
                     else:
                         st.info("No expenses to show")
                     
@@ -795,6 +866,19 @@ elif page == "Settings":
             except Exception as e:
                 st.error(f"❌ Failed to send email. Details: {e}")
                 st.code(traceback.format_exc())
+
+    # --- Database connection pool ---
+    with st.expander("🗄️ Database Connections"):
+        pool_stats = mongo_manager.get_pool_stats()
+        st.caption(f"Max pool size: {pool_stats['max_pool_size']} · Compression: {pool_stats['compressors'] or 'none'}")
+        if pool_stats["pools"]:
+            st.dataframe(
+                pd.DataFrame([{"server": k, **v} for k, v in pool_stats["pools"].items()]),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("No connections opened yet")
 elif page == "Stock Trends":
     from analytics.stock_trends import render_stock_trends_page
     render_stock_trends_page(user["id"])
@@ -802,7 +886,7 @@ elif page == "Stock Trends":
 elif page == "Bills":
     st.header("📅 Bill Reminders")
     
-    tab1, tab2, tab3 = st.tabs(["➕ Add Bill", "📋 Due Bills", "✅ Paid Bills"])
+    tab1, tab2, tab3, tab4 = st.tabs(["➕ Add Bill", "📋 Due Bills", "✅ Paid Bills", "🔁 Subscriptions"])
     
     with tab1:
         st.subheader("Add Bill Reminder")
@@ -814,12 +898,14 @@ elif page == "Bills":
         with col2:
             bill_category = st.selectbox("Category", ["Utilities", "Rent", "Insurance", "Other"])
             bill_notes = st.text_area("Notes (optional)")
+            bill_repeats = st.selectbox("Repeats", ["Never", "weekly", "monthly", "yearly"])
         
         if st.button("➕ Add Bill"):
             if bill_title and bill_amount:
                 try:
                     amount = float(bill_amount)
-                    ok = mongo_manager.add_bill_reminder(user["id"], bill_title, amount, due_date, bill_category, bill_notes)
+                    frequency = None if bill_repeats == "Never" else bill_repeats
+                    ok = mongo_manager.add_bill_reminder(user["id"], bill_title, amount, due_date, bill_category, bill_notes, frequency=frequency)
                     if ok:
                         st.success(f"✅ Added {bill_title} bill reminder")
                         st.rerun()
@@ -827,8 +913,8 @@ elif page == "Bills":
                     st.error("Invalid amount")
     
     with tab2:
-        all_bills = mongo_manager.list_bill_reminders(user["id"])
-        due_bills = [b for b in all_bills if not b.get("is_paid", False)]
+        due_bills = mongo_manager.list_upcoming_bills(user["id"], include_undated=True)
+        today = datetime.combine(date.today(), datetime.min.time())
         
         if due_bills:
             for bill in due_bills:
@@ -837,9 +923,10 @@ elif page == "Bills":
                     st.write(f"📋 **{bill.get('title')}**")
                 with col2:
                     due = bill.get("due_date")
-                    if isinstance(due, str):
-                        due = due[:10]
-                    st.write(f"Due: {due}")
+                    if isinstance(due, datetime):
+                        st.write(f"{'⏰ Overdue' if due < today else 'Due'}: {due:%Y-%m-%d}")
+                    else:
+                        st.write(f"Due: {str(due)[:10] if due else 'no date'}")
                 with col3:
                     st.write(f"₹{bill.get('amount', 0):,.2f}")
                 with col4:
@@ -851,38 +938,123 @@ elif page == "Bills":
             st.success("🎉 All bills are paid!")
     
     with tab3:
-        all_bills = mongo_manager.list_bill_reminders(user["id"])
-        paid_bills = [b for b in all_bills if b.get("is_paid", False)]
+        paid_bills = mongo_manager.list_paid_bills(user["id"])
         if paid_bills:
             st.dataframe(pd.DataFrame(paid_bills), use_container_width=True)
         else:
             st.info("No paid bills yet")
 
+    with tab4:
+        st.subheader("Recurring Subscriptions")
+        st.caption("Active subscriptions are added to your expenses automatically on each due date.")
+        col1, col2 = st.columns(2)
+        with col1:
+            sub_name = st.text_input("Name", placeholder="Netflix, Gym, etc.")
+            sub_amount = st.number_input("Amount", min_value=0.0, step=1.0, key="sub_amount")
+            sub_start = st.date_input("Start Date", key="sub_start")
+        with col2:
+            sub_category = st.selectbox("Category", ["Entertainment", "Utilities", "Health", "Education", "Other"], key="sub_category")
+            sub_frequency = st.selectbox("Frequency", ["monthly", "weekly", "yearly"], key="sub_frequency")
+            sub_currency = st.selectbox("Currency", ["USD", "INR", "EUR", "GBP"], key="sub_currency")
+
+        sub_backfill = False
+        today_utc = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        if sub_start < today_utc.date():
+            from features.recurring_scheduler import occurrences
+            oldest = today_utc - timedelta(days=settings.RECURRING_MAX_BACKFILL_DAYS)
+            past = len(occurrences(sub_start, sub_frequency, after=oldest, through=today_utc - timedelta(days=1)))
+            sub_backfill = st.checkbox(
+                f"Also add the {past} past payment(s) since the start date as expenses",
+                key="sub_backfill",
+                help=f"At most {settings.RECURRING_MAX_BACKFILL_DAYS} days back. Unchecked, only payments from today on are added."
+            )
+
+        if st.button("➕ Add Subscription"):
+            if sub_name and sub_amount > 0:
+                ok = mongo_manager.add_subscription(user["id"], sub_name, sub_amount, sub_category, sub_frequency, sub_start, currency=sub_currency, backfill=sub_backfill)
+                if ok:
+                    st.success(f"✅ Added {sub_name}")
+                    st.rerun()
+            else:
+                st.warning("Enter a name and amount")
+
+        subs = mongo_manager.list_subscriptions(user["id"])
+        if subs:
+            for sub in subs:
+                col1, col2, col3 = st.columns([4, 3, 1])
+                with col1:
+                    st.write(f"🔁 **{sub.get('name')}** · {sub.get('frequency')}")
+                with col2:
+                    st.write(f"{sub.get('currency', 'USD')} {sub.get('amount', 0):,.2f}")
+                with col3:
+                    if st.button("🛑", key=f"cancel_sub_{sub.get('_id')}"):
+                        mongo_manager.cancel_subscription(str(sub.get('_id')), user["id"])
+                        st.rerun()
+        else:
+            st.info("No active subscriptions")
+
 elif page == "Split Bills":
     st.header("👥 Split Bills")
+    ledger = GroupLedger(user["id"], user.get("email"))
     
     st.subheader("Create Group Expense")
     col1, col2 = st.columns(2)
     with col1:
+        group_name = st.text_input("Group", value="General")
         description = st.text_input("What is this expense for?")
         total_amount = st.text_input("Total Amount")
         split_type = st.selectbox("Split Type", ["Equal Split", "Custom Amounts"])
     with col2:
-        member_emails = st.text_area("Enter member emails (comma-separated)", placeholder="email1@example.com, email2@example.com")
+        if split_type == "Equal Split":
+            member_emails = st.text_area("Enter member emails (comma-separated)", placeholder="email1@example.com, email2@example.com")
+            st.caption("Include yourself if you share the cost too.")
+        else:
+            member_emails = st.text_area("Enter 'email: amount' per member (comma or newline separated)", placeholder="email1@example.com: 250\nemail2@example.com: 150")
     
     if st.button("➕ Add Group Expense"):
         if description and total_amount and member_emails:
             try:
                 amount = float(total_amount)
-                emails = [e.strip() for e in member_emails.split(",")]
-                members = [{"email": email, "amount": amount/len(emails), "paid": False} for email in emails]
-                ok = mongo_manager.add_group_expense(user["id"], description, amount, split_type.lower().replace(" ", "_"), members)
+            except ValueError:
+                st.error("Invalid amount")
+            else:
+                if split_type == "Equal Split":
+                    ok, msg = ledger.add_expense(group_name, description, amount, member_emails.split(","))
+                else:
+                    ok, msg = ledger.add_expense(group_name, description, amount, [], custom_text=member_emails)
                 if ok:
                     st.success(f"✅ Created group expense: {description}")
                     st.rerun()
-            except:
-                st.error("Invalid amount")
+                else:
+                    st.error(msg)
     
+    st.divider()
+    groups = [gid.split(":", 1)[1] for gid in ledger.groups()]
+    if groups:
+        st.subheader("⚖️ Balances & Settle Up")
+        selected_group = st.selectbox("Group", groups, key="settle_group")
+        balances = ledger.balances(selected_group)
+        if balances:
+            bal_df = pd.DataFrame(
+                [{"member": m, "balance": b} for m, b in sorted(balances.items(), key=lambda x: -x[1])]
+            )
+            st.dataframe(bal_df, use_container_width=True, hide_index=True)
+            st.caption("Positive = is owed money, negative = owes money.")
+            st.markdown("**Suggested transfers**")
+            for i, (frm, to, amt) in enumerate(ledger.settlement(selected_group)):
+                col1, col2 = st.columns([5, 1])
+                with col1:
+                    st.write(f"{frm} → {to}: ₹{amt:,.2f}")
+                with col2:
+                    if st.button("✅ Paid", key=f"settle_{i}_{frm}_{to}"):
+                        ledger.record_payment(selected_group, frm, to, amt)
+                        st.rerun()
+        else:
+            st.success("🎉 Everyone is settled up!")
+        if st.button("🔄 Recalculate balances from history"):
+            ledger.rebuild(selected_group)
+            st.rerun()
+
     st.divider()
     st.subheader("My Group Expenses")
     group_exps = mongo_manager.list_group_expenses(user["id"])
@@ -931,6 +1103,8 @@ elif page == "Goals":
     with tab2:
         goals = mongo_manager.list_financial_goals(user["id"])
         if goals:
+            from analytics import forecast
+            goal_etas = forecast.get_forecast(user["id"], goals=goals)["goal_etas"]
             for goal in goals:
                 current = goal.get("current_amount", 0)
                 target = goal.get("target_amount", 1)
@@ -941,6 +1115,9 @@ elif page == "Goals":
                     st.subheader(f"🎯 {goal.get('title')}")
                     st.progress(progress / 100)
                     st.write(f"₹{current:,.2f} / ₹{target:,.2f} ({progress:.1f}%)")
+                    eta = goal_etas.get(str(goal.get('_id')))
+                    if progress < 100:
+                        st.caption(f"📅 Projected completion: {eta:%b %d, %Y}" if eta else "📅 Contribute regularly to see a projected completion date")
                 with col2:
                     add_amount = st.number_input("Add ₹", min_value=0, key=f"goal_{goal.get('_id')}")
                     if st.button("💵 Contribute", key=f"btn_{goal.get('_id')}"):
@@ -952,7 +1129,7 @@ elif page == "Goals":
 elif page == "Debts":
     st.header("💳 Debt Management")
     
-    tab1, tab2 = st.tabs(["➕ Add Debt", "📋 My Debts"])
+    tab1, tab2, tab3 = st.tabs(["➕ Add Debt", "📋 My Debts", "📉 Payoff Planner"])
     
     with tab1:
         st.subheader("Add Debt Record")
@@ -1000,8 +1177,34 @@ elif page == "Debts":
                         
                         payment_amount = st.number_input("Payment", min_value=0.0, key=f"pay_{debt.get('_id')}")
                         if st.button("💵 Record Payment", key=f"btn_{debt.get('_id')}"):
-                            mongo_manager.record_debt_payment(str(debt.get("_id")), payment_amount)
-                            st.rerun()
+                            if mongo_manager.record_debt_payment(str(debt.get("_id")), payment_amount, user_id=user["id"]):
+                                st.rerun()
+                            else:
+                                st.warning("Payment not recorded: enter an amount, or this debt is already paid off.")
+        else:
+            st.info("No debts recorded")
+
+    with tab3:
+        from analytics import debt_simulator
+        debts = mongo_manager.list_debts(user["id"])
+        if debts:
+            st.subheader("Compare Payoff Strategies")
+            extra_payment = st.number_input("Extra payment per month (₹)", min_value=0.0, value=0.0, step=500.0)
+            # Options are debt indices: two debts may share a creditor name
+            custom_order = st.multiselect(
+                "Custom order (optional, first gets extra money first)",
+                list(range(len(debts))),
+                format_func=lambda i: f"{debts[i].get('creditor_name')} (₹{debts[i].get('remaining_amount', 0):,.2f})"
+            ) or None
+
+            comparison = debt_simulator.compare_strategies(debts, extra=extra_payment, custom_order=custom_order)
+            st.dataframe(comparison, use_container_width=True, hide_index=True)
+            if comparison["months"].isna().any():
+                st.warning("Some strategies don't clear your debts within 30 years. Increase your payments.")
+
+            strategy = st.selectbox("Show balance over time for", list(comparison["strategy"]))
+            curve = debt_simulator.balance_curve(debts, extra=extra_payment, strategy=strategy.lower(), custom_order=custom_order)
+            st.line_chart(curve, x="month", y="remaining")
         else:
             st.info("No debts recorded")
 
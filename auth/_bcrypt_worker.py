@@ -0,0 +1,16 @@
+# auth/_bcrypt_worker.py
+# Functions run inside the hashing process pool. Kept apart from
+# auth/hashing.py so worker processes only import bcrypt, not the app.
+import bcrypt
+
+
+def hashpw(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def checkpw(password: bytes, hashed: bytes) -> bool:
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except ValueError:
+        # Malformed stored hash
+        return False
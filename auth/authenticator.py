@@ -1,37 +1,78 @@
-import bcrypt
+import math
 from database import mongo_manager
 from config import settings
+from auth import session
+from auth import hashing
+from utils.rate_limit import KeyedRateLimiter
+
+# Shared by every session in the process: a burst of LOGIN_BURST attempts,
+# then LOGIN_RATE_PER_MINUTE per email; IPs get a larger allowance.
+_email_limiter = KeyedRateLimiter(settings.LOGIN_BURST, settings.LOGIN_RATE_PER_MINUTE / 60)
+_ip_limiter = KeyedRateLimiter(settings.LOGIN_BURST * 4, settings.LOGIN_RATE_PER_MINUTE * 4 / 60)
+
+
+def _throttled(email: str = None, client_ip: str = None):
+    """Seconds to wait if this email/IP is over its limit, else 0"""
+    wait = 0.0
+    if client_ip:
+        wait = max(wait, _ip_limiter.try_acquire(client_ip))
+    if email and not wait:
+        wait = max(wait, _email_limiter.try_acquire(email.strip().lower()))
+    return wait
+
 
 class Authenticator:
     def __init__(self, secret_key=None):
         self.secret_key = secret_key or settings.SECRET_KEY
 
-    def signup(self, name: str, email: str, password: str):
+    def signup(self, name: str, email: str, password: str, client_ip: str = None):
+        wait = _throttled(client_ip=client_ip)
+        if wait:
+            return False, f"Too many attempts. Try again in {math.ceil(wait)}s"
         existing = mongo_manager.get_user_by_email(email)
         if existing:
             return False, "Email already registered"
-        hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+        try:
+            hashed = hashing.hash_password(password)
+        except hashing.HashingBusy as e:
+            return False, str(e)
         user_id = mongo_manager.create_user(name, email, hashed)
         if user_id:
             return True, "Account created"
         return False, "Failed to create account"
 
-    def login(self, email: str, password: str):
+    def login(self, email: str, password: str, client_ip: str = None):
+        wait = _throttled(email, client_ip)
+        if wait:
+            return False, None, None, f"Too many login attempts. Try again in {math.ceil(wait)}s"
         user = mongo_manager.get_user_by_email(email)
         if not user:
             return False, None, None, "User not found"
         phash = user.get("password_hash")
-        if isinstance(phash, str):
-            phash = phash.encode()
-        if bcrypt.checkpw(password.encode(), phash):
-            # create a simple token (not JWT for simplicity)
-            token = f"token-{user.get('_id')}"
-            # return ok, user dict, token, message
+        try:
+            ok = hashing.check_password(password, phash)
+            if ok and hashing.needs_rehash(phash):
+                # Transparently move the stored hash to the configured cost
+                mongo_manager.update_password_hash(user["_id"], hashing.hash_password(password), phash)
+        except hashing.HashingBusy as e:
+            return False, None, None, str(e)
+        if ok:
+            # return ok, user dict, signed token, message
             user_out = {
                 "id": str(user.get("_id")),
                 "name": user.get("name"),
                 "email": user.get("email"),
                 "_id": str(user.get("_id"))
             }
+            try:
+                token = session.issue_token(user_out, self.secret_key)
+            except session.InsecureSecretKey as e:
+                return False, None, None, str(e)
+            session.profiles.put(user_out)
             return True, user_out, token, "Logged in"
         return False, None, None, "Invalid password"
+
+    def verify_token(self, token: str):
+        """Resolve a signed token to the user dict returned by login(), or None (no DB hit)"""
+        claims = session.verify_token(token, self.secret_key)
+        return session.user_from_claims(claims) if claims else None
@@ -0,0 +1,90 @@
+# auth/hashing.py
+# Password hashing off the request threads.
+#
+# bcrypt is deliberately slow, so hashing and checking run in a small
+# process pool (AUTH_HASH_WORKERS). At most AUTH_MAX_PENDING operations may
+# be in flight; further callers wait up to AUTH_QUEUE_TIMEOUT seconds and
+# then get HashingBusy instead of piling up and stalling every other
+# session. The cost factor comes from BCRYPT_ROUNDS, and needs_rehash()
+# lets login upgrade old hashes.
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from config import settings
+from auth import _bcrypt_worker
+
+
+class HashingBusy(Exception):
+    """Too many password operations are already queued"""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(settings.AUTH_MAX_PENDING)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: never fork a process that already runs server threads
+                _pool = ProcessPoolExecutor(
+                    max_workers=settings.AUTH_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+def _run(fn, *args, timeout: float = 30):
+    global _pool
+    if not _slots.acquire(timeout=settings.AUTH_QUEUE_TIMEOUT):
+        raise HashingBusy("Too many sign-in attempts right now, please retry in a moment")
+    future = None
+    try:
+        future = _get_pool().submit(fn, *args)
+        return future.result(timeout)
+    except FutureTimeout:
+        # Drop the job if it hasn't started yet; a running one can't be stopped
+        future.cancel()
+        raise HashingBusy("Sign-in is taking too long right now, please retry in a moment")
+    except BrokenProcessPool:
+        # A worker died: start a fresh pool next time, answer this call inline
+        with _pool_lock:
+            _pool = None
+        return fn(*args)
+    finally:
+        # A job still running after a timeout keeps its slot until it ends
+        if future is None or future.done():
+            _slots.release()
+        else:
+            future.add_done_callback(lambda _: _slots.release())
+
+
+def _as_bytes(value) -> bytes:
+    return value.encode() if isinstance(value, str) else value
+
+
+def hash_password(password: str, rounds: int = None) -> bytes:
+    return _run(_bcrypt_worker.hashpw, password.encode(), int(rounds or settings.BCRYPT_ROUNDS))
+
+
+def check_password(password: str, hashed) -> bool:
+    if not hashed:
+        return False
+    return _run(_bcrypt_worker.checkpw, password.encode(), _as_bytes(hashed))
+
+
+def hash_rounds(hashed) -> int:
+    """Cost factor stored in a bcrypt hash ($2b$12$...), 0 if unreadable"""
+    try:
+        return int(_as_bytes(hashed).split(b"$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def needs_rehash(hashed, rounds: int = None) -> bool:
+    return hash_rounds(hashed) != int(rounds or settings.BCRYPT_ROUNDS)
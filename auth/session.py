@@ -0,0 +1,127 @@
+# auth/session.py
+# Stateless session tokens and a small user-profile cache.
+#
+# A token is base64url(claims JSON) + "." + base64url(HMAC-SHA256 of the
+# claims part keyed with SECRET_KEY). Claims carry the user's id, name and
+# email plus issue/expiry times, so verifying a token needs no database
+# round-trip; the signature is compared in constant time. While SECRET_KEY
+# is the placeholder, tokens are neither issued nor accepted.
+import hmac
+import json
+import time
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+
+from config import settings
+from config.settings import DEV_SECRET_KEY
+from database import mongo_manager
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class InsecureSecretKey(RuntimeError):
+    """SECRET_KEY is unset, so anyone could forge tokens"""
+
+
+def signing_key(secret: str = None) -> str:
+    key = secret or settings.SECRET_KEY
+    if key == DEV_SECRET_KEY and not settings.ALLOW_DEV_SECRET_KEY:
+        raise InsecureSecretKey("SECRET_KEY is not configured; set it (or ALLOW_DEV_SECRET_KEY=1 for local development)")
+    return key
+
+
+def _sign(payload: str, secret: str) -> str:
+    return _b64encode(hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(user: dict, secret: str = None, ttl: int = None) -> str:
+    """Signed token for a user dict with id/name/email"""
+    now = int(time.time())
+    claims = {
+        "sub": str(user.get("id") or user.get("_id")),
+        "name": user.get("name"),
+        "email": user.get("email"),
+        "iat": now,
+        "exp": now + int(ttl or settings.SESSION_TTL_SECONDS),
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload, signing_key(secret))}"
+
+
+def verify_token(token: str, secret: str = None):
+    """Claims dict for a valid, unexpired token; None otherwise"""
+    if not token or token.count(".") != 1:
+        return None
+    try:
+        key = signing_key(secret)
+    except InsecureSecretKey:
+        return None
+    payload, signature = token.split(".")
+    if not hmac.compare_digest(signature.encode(), _sign(payload, key).encode()):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if claims.get("exp", 0) < time.time():
+        return None
+    return claims
+
+
+def user_from_claims(claims: dict) -> dict:
+    """The user dict shape the app passes around (same as Authenticator.login)"""
+    return {"id": claims["sub"], "name": claims.get("name"), "email": claims.get("email"), "_id": claims["sub"]}
+
+
+# -----------------------------
+# User profile cache
+# -----------------------------
+class ProfileCache:
+    """LRU of public user fields with a TTL; never holds password hashes"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str):
+        uid = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(uid)
+            if hit and hit[0] > now:
+                self._entries.move_to_end(uid)
+                return hit[1]
+        user = mongo_manager.get_user_by_id(uid)
+        if not user:
+            return None
+        profile = {"id": uid, "_id": uid, "name": user.get("name"), "email": user.get("email")}
+        self.put(profile)
+        return profile
+
+    def put(self, profile: dict):
+        with self._lock:
+            self._entries[profile["id"]] = (time.monotonic() + self.ttl, profile)
+            self._entries.move_to_end(profile["id"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+
+profiles = ProfileCache()
+
+
+def get_profile(user_id: str):
+    return profiles.get(user_id)
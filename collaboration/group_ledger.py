@@ -0,0 +1,151 @@
+# collaboration/group_ledger.py
+# Running balances and settle-up transfers for split bills.
+#
+# Each group keeps one balance per member in `group_balances` (integer
+# cents: positive = is owed, negative = owes). Expenses and payments $inc
+# those balances, so "who owes whom" never rescans the expense history.
+# Settlement pairs the largest debtor with the largest creditor (two heaps)
+# which needs at most n-1 transfers for n members with a balance.
+import heapq
+import re
+
+from database import mongo_manager
+
+DEFAULT_GROUP = "General"
+
+
+def to_cents(amount) -> int:
+    return int(round(float(amount) * 100))
+
+
+def split_equal(total_cents: int, members: list) -> dict:
+    """Equal shares in cents; leftover cents go to the first members"""
+    if not members:
+        return {}
+    base, extra = divmod(total_cents, len(members))
+    return {m: base + (1 if i < extra else 0) for i, m in enumerate(members)}
+
+
+def parse_custom_splits(text: str) -> dict:
+    """
+    Parse "email: amount" pairs (comma or newline separated) into
+    {email: cents}. Raises ValueError on malformed entries.
+    """
+    shares = {}
+    for part in re.split(r"[,\n]", text or ""):
+        part = part.strip()
+        if not part:
+            continue
+        if ":" not in part:
+            raise ValueError(f"Expected 'email: amount', got '{part}'")
+        email, amount = part.rsplit(":", 1)
+        email = email.strip().lower()
+        shares[email] = shares.get(email, 0) + to_cents(amount.strip())
+    return shares
+
+
+def expense_deltas(payer: str, shares: dict) -> dict:
+    """Balance changes for one expense: the payer is owed everyone's share"""
+    deltas = {m: -c for m, c in shares.items()}
+    deltas[payer] = deltas.get(payer, 0) + sum(shares.values())
+    return {m: c for m, c in deltas.items() if c}
+
+
+def minimal_transfers(balances: dict) -> list:
+    """
+    Greedy settle-up: repeatedly move money from the largest debtor to the
+    largest creditor. Returns [(from, to, cents)].
+    """
+    creditors = [(-c, m) for m, c in balances.items() if c > 0]
+    debtors = [(c, m) for m, c in balances.items() if c < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
+
+
+class GroupLedger:
+    def __init__(self, user_id: str, user_email: str):
+        self.user_id = user_id
+        self.user_email = (user_email or "").lower()
+
+    def group_id(self, name: str) -> str:
+        return f"{self.user_id}:{(name or DEFAULT_GROUP).strip()}"
+
+    def groups(self):
+        ids = mongo_manager.list_group_ids(self.user_id)
+        # Expenses recorded before groups existed belong to "General"
+        if self.group_id(DEFAULT_GROUP) not in ids and mongo_manager.has_legacy_group_expenses(self.user_id):
+            ids.append(self.group_id(DEFAULT_GROUP))
+        return ids
+
+    def add_expense(self, group: str, description: str, amount: float, member_emails: list, custom_text: str=None, payer: str=None):
+        """
+        Record a shared expense paid by `payer` (default: the current user).
+        Returns (ok, message).
+        """
+        total = to_cents(amount)
+        if total <= 0:
+            return False, "Amount must be positive"
+        payer = (payer or self.user_email).lower()
+        if custom_text:
+            try:
+                shares = parse_custom_splits(custom_text)
+            except ValueError as e:
+                return False, str(e)
+            if sum(shares.values()) != total:
+                return False, f"Custom amounts add up to {sum(shares.values()) / 100:,.2f}, not {total / 100:,.2f}"
+            split_type = "custom"
+        else:
+            emails = list(dict.fromkeys(e.strip().lower() for e in member_emails if e.strip()))
+            if not emails:
+                return False, "Add at least one member"
+            shares = split_equal(total, emails)
+            split_type = "equal"
+        members = [{"email": m, "amount": c / 100, "paid": m == payer} for m, c in shares.items()]
+        gid = self.group_id(group)
+        ok = mongo_manager.add_group_expense(
+            self.user_id, description, total / 100, split_type, members,
+            group_id=gid, payer=payer, balance_deltas=expense_deltas(payer, shares)
+        )
+        return ok, "Recorded" if ok else "Failed to record group expense"
+
+    def record_payment(self, group: str, from_member: str, to_member: str, amount: float):
+        cents = to_cents(amount)
+        if cents <= 0 or from_member == to_member:
+            return False
+        return mongo_manager.add_group_payment(self.group_id(group), from_member.lower(), to_member.lower(), cents, recorded_by=self.user_id)
+
+    def balances(self, group: str) -> dict:
+        """{member: amount} with positive = is owed"""
+        return {m: c / 100 for m, c in mongo_manager.get_group_balances(self.group_id(group)).items()}
+
+    def settlement(self, group: str) -> list:
+        """[(from, to, amount)] that clears every balance in the group"""
+        cents = mongo_manager.get_group_balances(self.group_id(group))
+        return [(f, t, c / 100) for f, t, c in minimal_transfers(cents)]
+
+    def rebuild(self, group: str) -> dict:
+        """Recompute a group's balances from its expense and payment history"""
+        gid = self.group_id(group)
+        totals = {}
+        legacy_owner = self.user_id if group == DEFAULT_GROUP else None
+        for exp in mongo_manager.iter_group_expenses(gid, legacy_user_id=legacy_owner):
+            shares = {m["email"]: to_cents(m.get("amount", 0)) for m in exp.get("members", [])}
+            for m, c in expense_deltas(exp.get("payer") or self.user_email, shares).items():
+                totals[m] = totals.get(m, 0) + c
+        for p in mongo_manager.list_group_payments(gid):
+            totals[p["from_member"]] = totals.get(p["from_member"], 0) + p["amount_cents"]
+            totals[p["to_member"]] = totals.get(p["to_member"], 0) - p["amount_cents"]
+        totals = {m: c for m, c in totals.items() if c}
+        mongo_manager.replace_group_balances(gid, totals)
+        return totals
@@ -2,13 +2,48 @@ from pydantic_settings import BaseSettings
 import os
 import streamlit as st
 
+# Placeholder key: session tokens are refused while it is in use unless
+# ALLOW_DEV_SECRET_KEY is set (local development only)
+DEV_SECRET_KEY = "dev_secret_key"
+
 class Settings(BaseSettings):
-    SECRET_KEY: str = os.getenv("SECRET_KEY", None) or st.secrets.get("SECRET_KEY", "dev_secret_key")
+    SECRET_KEY: str = os.getenv("SECRET_KEY", None) or st.secrets.get("SECRET_KEY", DEV_SECRET_KEY)
+    ALLOW_DEV_SECRET_KEY: bool = os.getenv("ALLOW_DEV_SECRET_KEY", "").lower() in ("1", "true", "yes")
     MONGO_URI: str = os.getenv("MONGO_URI", None) or st.secrets.get("MONGO_URI", None)
     SMTP_HOST: str = os.getenv("SMTP_HOST", "smtp.gmail.com")
     SMTP_PORT: int = int(os.getenv("SMTP_PORT", 587))
     SMTP_USER: str = os.getenv("SMTP_USER", None) or st.secrets.get("SMTP_USER", "")
     SMTP_PASS: str = os.getenv("SMTP_PASS", None) or st.secrets.get("SMTP_PASS", "")
     CURRENCY_BASE: str = os.getenv("CURRENCY_BASE", None) or st.secrets.get("CURRENCY_BASE", "USD")
+    AI_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("AI_CONTEXT_TOKEN_BUDGET", 1500))
+    AI_CONTEXT_TTL_SECONDS: int = int(os.getenv("AI_CONTEXT_TTL_SECONDS", 600))
+    LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", 3600))
+    LLM_RATE_PER_MINUTE: float = float(os.getenv("LLM_RATE_PER_MINUTE", 15))
+    GEMINI_MAX_CLIENTS: int = int(os.getenv("GEMINI_MAX_CLIENTS", 32))
+    RECURRING_INTERVAL_SECONDS: int = int(os.getenv("RECURRING_INTERVAL_SECONDS", 3600))
+    RECURRING_MAX_BACKFILL_DAYS: int = int(os.getenv("RECURRING_MAX_BACKFILL_DAYS", 366))
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000))
+    MONGO_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    MONGO_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 20000))
+    MONGO_COMPRESSORS: str = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+    MONGO_ANALYTICS_READ_PREFERENCE: str = os.getenv("MONGO_ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+    MONGO_MAX_STALENESS_SECONDS: int = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", 0))
+    MONGO_READ_YOUR_WRITES_SECONDS: int = int(os.getenv("MONGO_READ_YOUR_WRITES_SECONDS", 120))
+    SESSION_TTL_SECONDS: int = int(os.getenv("SESSION_TTL_SECONDS", 12 * 3600))
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+    AUTH_HASH_WORKERS: int = int(os.getenv("AUTH_HASH_WORKERS", 2))
+    AUTH_MAX_PENDING: int = int(os.getenv("AUTH_MAX_PENDING", 16))
+    AUTH_QUEUE_TIMEOUT: float = float(os.getenv("AUTH_QUEUE_TIMEOUT", 2))
+    LOGIN_BURST: int = int(os.getenv("LOGIN_BURST", 5))
+    LOGIN_RATE_PER_MINUTE: float = float(os.getenv("LOGIN_RATE_PER_MINUTE", 5))
+    TRANSACTION_STORAGE: str = os.getenv("TRANSACTION_STORAGE", None) or st.secrets.get("TRANSACTION_STORAGE", "standard")
+    ANALYTICS_ENGINE: str = os.getenv("ANALYTICS_ENGINE", None) or st.secrets.get("ANALYTICS_ENGINE", "mongo")
+    ANALYTICS_DB_PATH: str = os.getenv("ANALYTICS_DB_PATH", ".analytics/transactions.duckdb")
+    ANALYTICS_REFRESH_SECONDS: int = int(os.getenv("ANALYTICS_REFRESH_SECONDS", 60))
+    FRAME_CACHE_MAX_USERS: int = int(os.getenv("FRAME_CACHE_MAX_USERS", 256))
+    FRAME_CACHE_TTL_SECONDS: int = int(os.getenv("FRAME_CACHE_TTL_SECONDS", 600))
 
 settings = Settings()
@@ -0,0 +1,142 @@
+# database/async_mongo_manager.py
+# Async twins of the read functions pages load together (Motor).
+#
+# Streamlit scripts are synchronous, so the coroutines run on one
+# long-lived event loop in a daemon thread and the script blocks on the
+# results. fetch_all() fires a page's independent queries at once: the
+# page waits for the slowest query instead of the sum of all of them.
+# Without Motor, fetch_all() runs the same-named sync functions from
+# mongo_manager on a thread pool instead.
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import ASCENDING, DESCENDING
+from config.settings import settings
+from database import mongo_manager
+from database.mongo_manager import DB_NAME, _tx, _expense_row, _income_row, _bill_summary, _bill_summary_pipeline
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:
+    AsyncIOMotorClient = None
+
+_loop = None
+_client = None
+_lock = threading.Lock()
+_executor = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True, name="mongo-async-loop").start()
+                _loop = loop
+    return _loop
+
+
+def get_db():
+    # Motor clients bind to the loop they are first used on: only call
+    # this from coroutines running on _get_loop()
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(settings.MONGO_URI, **mongo_manager.client_options())
+        mongo_manager.init_db()  # indexes are created once by the sync layer
+    return _client[DB_NAME]
+
+
+def get_read_db(user_id: str=None):
+    if user_id is not None and mongo_manager.recently_written(user_id):
+        return get_db()
+    return get_db().with_options(read_preference=mongo_manager._read_preference(settings.MONGO_ANALYTICS_READ_PREFERENCE))
+
+
+def run(coro, timeout: float=None):
+    """Run a coroutine on the background loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result(timeout)
+
+
+# -----------------------------
+# Async twins (same names and arguments as mongo_manager)
+# -----------------------------
+async def list_expenses(user_id: str, limit: int=200, secondary: bool=False, skip: int=0):
+    db = get_read_db(user_id) if secondary else get_db()
+    cursor = _tx(db, "expenses").find({"user_id": str(user_id)}, {"receipt_text": 0}).sort([("date", DESCENDING), ("_id", DESCENDING)]).skip(skip).limit(limit)
+    return [_expense_row(r) async for r in cursor]
+
+
+async def list_income(user_id: str, limit: int=200, secondary: bool=False, skip: int=0):
+    db = get_read_db(user_id) if secondary else get_db()
+    cursor = _tx(db, "income").find({"user_id": str(user_id)}).sort([("date", DESCENDING), ("_id", DESCENDING)]).skip(skip).limit(limit)
+    return [_income_row(r) async for r in cursor]
+
+
+async def list_budgets(user_id: str):
+    return await get_db().budgets.find({"user_id": str(user_id)}).to_list(None)
+
+
+async def list_debts(user_id: str):
+    return await get_db().debts.find({"user_id": user_id, "is_paid": False}).to_list(None)
+
+
+async def list_financial_goals(user_id: str):
+    return await get_db().financial_goals.find({"user_id": user_id}).to_list(None)
+
+
+async def list_upcoming_bills(user_id: str, limit: int=0):
+    query = {"user_id": user_id, "is_paid": False, "due_date": {"$ne": None}}
+    cursor = get_db().bill_reminders.find(query).sort("due_date", ASCENDING).limit(limit)
+    return await cursor.to_list(None)
+
+
+async def get_bill_summary(user_id: str, paid_since=None, today=None):
+    cursor = get_db().bill_reminders.aggregate(_bill_summary_pipeline(user_id, paid_since, today))
+    return _bill_summary(await cursor.to_list(None))
+
+
+# -----------------------------
+# Concurrent page fetch
+# -----------------------------
+def fetch_all(timeout: float=30, **calls) -> dict:
+    """
+    Run independent queries concurrently and return {name: result}.
+
+        data = fetch_all(
+            debts=("list_debts", user_id),
+            expenses=("list_expenses", user_id, {"limit": 1000}),
+        )
+
+    Each call is (function name, *args[, kwargs dict]); names refer to the
+    functions above, or to mongo_manager when Motor isn't installed.
+    """
+    specs = {}
+    for name, call in calls.items():
+        fn_name, *args = call
+        kwargs = args.pop() if args and isinstance(args[-1], dict) else {}
+        specs[name] = (fn_name, args, kwargs)
+
+    if AsyncIOMotorClient is None:
+        return _fetch_all_threaded(specs, timeout)
+
+    async def gather():
+        this = globals()
+        results = await asyncio.gather(*(this[fn](*args, **kwargs) for fn, args, kwargs in specs.values()))
+        return dict(zip(specs, results))
+
+    return run(gather(), timeout)
+
+
+def _fetch_all_threaded(specs: dict, timeout: float) -> dict:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="mongo-fetch")
+    futures = {
+        name: _executor.submit(getattr(mongo_manager, fn), *args, **kwargs)
+        for name, (fn, args, kwargs) in specs.items()
+    }
+    return {name: f.result(timeout) for name, f in futures.items()}
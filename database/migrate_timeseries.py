@@ -0,0 +1,25 @@
+# database/migrate_timeseries.py
+# Copy expenses and income into time-series collections.
+#
+#   python -m database.migrate_timeseries [--batch-size 1000]
+#
+# Safe to interrupt and re-run. Once it finishes, set
+# TRANSACTION_STORAGE=timeseries and restart the app; the old collections
+# are left untouched so switching back is just unsetting the variable.
+import argparse
+
+from database import mongo_manager
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate expenses/income to MongoDB time-series collections")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    copied = mongo_manager.migrate_to_timeseries(
+        batch_size=args.batch_size,
+        progress=lambda name, n: print(f"{name}: {n} copied", end="\r", flush=True)
+    )
+    print()
+    for name, n in copied.items():
+        print(f"✅ {name} → {mongo_manager.TS_COLLECTIONS[name]}: {n} documents")
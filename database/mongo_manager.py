@@ -1,41 +1,377 @@
 # database/mongo_manager.py
 import datetime
 import logging
-from pymongo import MongoClient, ASCENDING, DESCENDING
-import streamlit as st
+import time
+import zlib
+import threading
+import importlib.util
+import gridfs
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne
+from pymongo import read_preferences
+from pymongo.monitoring import ConnectionPoolListener
+from pymongo.errors import BulkWriteError
 from config.settings import settings
-from pymongo import MongoClient
 from bson.objectid import ObjectId
-import os
+from bson.binary import Binary
+from utils import money
+from database.records import ExpenseRecord, IncomeRecord
 
 # -----------------------------
 # MongoDB Client
 # -----------------------------
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["expense_tracker"]
-@st.cache_resource
+# One MongoClient per process. Pool size, timeouts and wire compression come
+# from settings; writes and interactive reads go to the primary, while
+# dashboard/report aggregations use get_read_db() (secondaryPreferred by
+# default) to keep that load off the primary, except for users who have
+# just written (so caches rebuilt after a write see it).
+DB_NAME = "expense_tracker"
+
+class PoolMetrics(ConnectionPoolListener):
+    """Connection pool counters, per server address"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pools = {}
+
+    def _pool(self, address):
+        key = f"{address[0]}:{address[1]}"
+        return self.pools.setdefault(key, {
+            "open": 0, "checked_out": 0, "max_checked_out": 0,
+            "created": 0, "closed": 0, "checkout_failures": 0, "cleared": 0
+        })
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address)["cleared"] += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self.pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        with self._lock:
+            p = self._pool(event.address)
+            p["created"] += 1
+            p["open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            p = self._pool(event.address)
+            p["closed"] += 1
+            p["open"] = max(0, p["open"] - 1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._pool(event.address)["checkout_failures"] += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            p = self._pool(event.address)
+            p["checked_out"] += 1
+            p["max_checked_out"] = max(p["max_checked_out"], p["checked_out"])
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            p = self._pool(event.address)
+            p["checked_out"] = max(0, p["checked_out"] - 1)
+
+pool_metrics = PoolMetrics()
+_client = None
+_client_lock = threading.Lock()
+_indexes_ready = False
+_indexes_lock = threading.Lock()
+_indexes_retry_at = 0.0
+_read_db = None
+
+def _available_compressors() -> str:
+    # zstd/snappy need optional packages; zlib is always there
+    wanted = [c.strip() for c in settings.MONGO_COMPRESSORS.split(",") if c.strip()]
+    needs = {"zstd": "zstandard", "snappy": "snappy"}
+    return ",".join(c for c in wanted if c not in needs or importlib.util.find_spec(needs[c]))
+
+def _read_preference(name: str):
+    staleness = settings.MONGO_MAX_STALENESS_SECONDS or -1
+    modes = {
+        "primary": read_preferences.Primary,
+        "primaryPreferred": read_preferences.PrimaryPreferred,
+        "secondary": read_preferences.Secondary,
+        "secondaryPreferred": read_preferences.SecondaryPreferred,
+        "nearest": read_preferences.Nearest,
+    }
+    mode = modes.get(name, read_preferences.SecondaryPreferred)
+    return mode() if mode is read_preferences.Primary else mode(max_staleness=staleness)
+
 def get_client():
-    mongo_uri = settings.MONGO_URI
-    if not mongo_uri:
-        raise RuntimeError(
-            "MongoDB URI not set. Put it in .streamlit/secrets.toml as 'mongo_uri' or set MONGO_URI env var."
-        )
-    return MongoClient(mongo_uri)
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                mongo_uri = settings.MONGO_URI
+                if not mongo_uri:
+                    raise RuntimeError(
+                        "MongoDB URI not set. Put it in .streamlit/secrets.toml as 'mongo_uri' or set MONGO_URI env var."
+                    )
+                _client = MongoClient(mongo_uri, **client_options())
+    return _client
+
+def client_options() -> dict:
+    """Pool/timeout/compression options shared by the sync and async clients"""
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGO_SOCKET_TIMEOUT_MS,
+        "appname": "expense-tracker",
+        "event_listeners": [pool_metrics],
+    }
+    compressors = _available_compressors()
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+def get_pool_stats() -> dict:
+    """Pool utilization per server plus the configured limits"""
+    with pool_metrics._lock:
+        pools = {k: dict(v) for k, v in pool_metrics.pools.items()}
+    for p in pools.values():
+        p["utilization"] = p["checked_out"] / settings.MONGO_MAX_POOL_SIZE if settings.MONGO_MAX_POOL_SIZE else 0.0
+    return {"max_pool_size": settings.MONGO_MAX_POOL_SIZE, "compressors": _available_compressors(), "pools": pools}
+
+def get_read_db(user_id: str=None):
+    """
+    Database handle for analytics reads (may be served by a secondary).
+    Reads for a user who wrote within MONGO_READ_YOUR_WRITES_SECONDS go to
+    the primary, so caches rebuilt after a write never store pre-write data.
+    """
+    global _read_db
+    if user_id is not None and recently_written(user_id):
+        return init_db()
+    if _read_db is None:
+        _read_db = init_db().with_options(read_preference=_read_preference(settings.MONGO_ANALYTICS_READ_PREFERENCE))
+    return _read_db
+
+# -----------------------------
+# Transaction storage layout
+# -----------------------------
+# With TRANSACTION_STORAGE=timeseries, expenses and income live in MongoDB
+# time-series collections (timeField "date", metaField "user_id") so each
+# user's history is stored in compressed, time-ordered buckets. Every
+# function below reaches them through _tx(), so signatures don't change.
+# Copy existing data over with `python -m database.migrate_timeseries`.
+# Needs MongoDB 7.0+, which allows deleting time-series documents by _id.
+TIMESERIES_MODE = settings.TRANSACTION_STORAGE == "timeseries"
+TS_COLLECTIONS = {"expenses": "expenses_ts", "income": "income_ts"}
+
+def _tx(db, name: str):
+    return db[TS_COLLECTIONS[name]] if TIMESERIES_MODE else db[name]
+
+def _ensure_timeseries_collections(db):
+    existing = set(db.list_collection_names())
+    for ts_name in TS_COLLECTIONS.values():
+        if ts_name not in existing:
+            db.create_collection(ts_name, timeseries={"timeField": "date", "metaField": "user_id", "granularity": "hours"})
 
 def init_db():
-    client = get_client()
-    db = client["expense_tracker"]
+    db = get_client()[DB_NAME]
+    if not _indexes_ready:
+        _ensure_indexes(db)
+    return db
 
-    # create indexes if not exist
+def _ensure_indexes(db):
+    global _indexes_ready, _indexes_retry_at
+    # Skip while another thread is creating them or shortly after a failure
+    if time.monotonic() < _indexes_retry_at or not _indexes_lock.acquire(blocking=False):
+        return
     try:
-        db.users.create_index([("email", ASCENDING)], unique=True)
-        db.expenses.create_index([("user_id", ASCENDING), ("date", DESCENDING)])
-        db.income.create_index([("user_id", ASCENDING), ("date", DESCENDING)])
-        db.budgets.create_index([("user_id", ASCENDING), ("category", ASCENDING)], unique=True)
-        db.shares.create_index([("owner_id", ASCENDING), ("member_email", ASCENDING)], unique=True)
+        if not _indexes_ready:
+            _create_indexes(db)
+            _indexes_ready = True
     except Exception as e:
+        _indexes_retry_at = time.monotonic() + 60
         logging.warning(f"Index creation error: {e}")
-    return db
+    finally:
+        _indexes_lock.release()
+
+def _create_indexes(db):
+    if TIMESERIES_MODE:
+        _ensure_timeseries_collections(db)
+    db.users.create_index([("email", ASCENDING)], unique=True)
+    _tx(db, "expenses").create_index([("user_id", ASCENDING), ("date", DESCENDING)])
+    _tx(db, "income").create_index([("user_id", ASCENDING), ("date", DESCENDING)])
+    db.budgets.create_index([("user_id", ASCENDING), ("category", ASCENDING)], unique=True)
+    db.shares.create_index([("owner_id", ASCENDING), ("member_email", ASCENDING)], unique=True)
+    db.receipts.create_index([("user_id", ASCENDING)])
+    db.category_models.create_index([("user_id", ASCENDING)], unique=True)
+    if TIMESERIES_MODE:
+        # Time-series collections cannot carry unique indexes
+        _tx(db, "expenses").create_index([("user_id", ASCENDING), ("recurring_key", ASCENDING)])
+    else:
+        db.expenses.create_index(
+            [("user_id", ASCENDING), ("recurring_key", ASCENDING)],
+            unique=True, partialFilterExpression={"recurring_key": {"$exists": True}}
+        )
+    db.bill_reminders.create_index(
+        [("user_id", ASCENDING), ("recurring_key", ASCENDING)],
+        unique=True, partialFilterExpression={"recurring_key": {"$exists": True}}
+    )
+    db.subscriptions.create_index([("is_active", ASCENDING), ("user_id", ASCENDING)])
+    db.bill_reminders.create_index([("user_id", ASCENDING), ("is_paid", ASCENDING), ("due_date", ASCENDING)])
+    db.group_balances.create_index([("group_id", ASCENDING), ("member", ASCENDING)], unique=True)
+    db.group_expenses.create_index([("group_id", ASCENDING), ("created_at", ASCENDING)])
+    db.group_payments.create_index([("group_id", ASCENDING), ("created_at", ASCENDING)])
+
+def _timeseries_date(doc: dict) -> datetime.datetime:
+    # Time-series documents must carry a real datetime in the timeField
+    try:
+        d = _as_datetime(doc.get("date"))
+    except ValueError:
+        d = None
+    if isinstance(d, datetime.datetime):
+        return d
+    return doc.get("created_at") or doc["_id"].generation_time.replace(tzinfo=None)
+
+def migrate_to_timeseries(batch_size: int=1000, progress=None) -> dict:
+    """
+    Copy expenses/income into their time-series collections in _id order.
+    Resumable: a checkpoint per collection is kept in `migrations`, and ids
+    already present in the target are skipped, so re-runs never duplicate.
+    """
+    db = get_client()[DB_NAME]
+    _ensure_timeseries_collections(db)
+    # Inline receipt text must leave the source first: time-series documents can't be $unset
+    migrate_inline_receipts(collection="expenses")
+    copied = {}
+    for name, ts_name in TS_COLLECTIONS.items():
+        source, target = db[name], db[ts_name]
+        target.create_index([("user_id", ASCENDING), ("date", DESCENDING)])
+        key = f"timeseries:{name}"
+        state = db.migrations.find_one({"_id": key}) or {}
+        last_id = state.get("last_id")
+        copied[name] = 0
+        while True:
+            query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+            batch = list(source.find(query).sort("_id", ASCENDING).limit(batch_size))
+            if not batch:
+                break
+            ids = [d["_id"] for d in batch]
+            docs = [dict(d, date=_timeseries_date(d)) for d in batch]
+            # _id isn't indexed in the target: look copies up by (user_id, date)
+            keys = list({(d.get("user_id"), d["date"]) for d in docs})
+            present = {d["_id"] for d in target.find(
+                {"$or": [{"user_id": u, "date": t} for u, t in keys], "_id": {"$in": ids}}, {"_id": 1}
+            )}
+            docs = [d for d in docs if d["_id"] not in present]
+            if docs:
+                target.insert_many(docs, ordered=False)
+            last_id = ids[-1]
+            db.migrations.update_one({"_id": key}, {"$set": {"last_id": last_id, "updated_at": datetime.datetime.utcnow()}}, upsert=True)
+            copied[name] += len(docs)
+            if progress:
+                progress(name, copied[name])
+    return copied
+
+# -----------------------------
+# Exact amounts (utils/money.py)
+# -----------------------------
+# Money fields carry an integer `<field>_minor` twin (cents) that totals are
+# summed from. Documents written before it existed are filled in here.
+MINOR_FIELDS = {
+    "expenses": ("amount",),
+    "income": ("amount",),
+    "subscriptions": ("amount",),
+    "bill_reminders": ("amount",),
+    "group_expenses": ("amount",),
+    "financial_goals": ("target_amount", "current_amount"),
+    "debts": ("total_amount", "remaining_amount", "minimum_payment"),
+}
+
+def backfill_minor_amounts(batch_size: int=500) -> dict:
+    """
+    Add missing `<field>_minor` values; returns documents updated per
+    collection. Idempotent. Skips time-series collections, whose older
+    documents aggregations convert on the fly (money.minor_expr).
+    """
+    db = init_db()
+    updated = {}
+    for name, fields in MINOR_FIELDS.items():
+        if TIMESERIES_MODE and name in TS_COLLECTIONS:
+            continue
+        # None matches a missing field or a null left by an earlier run
+        query = {"$or": [{f"{f}_minor": None, f: {"$type": "number"}} for f in fields]}
+        updated[name] = 0
+        while True:
+            batch = list(db[name].find(query, {f: 1 for f in fields}).limit(batch_size))
+            if not batch:
+                break
+            ops = []
+            for d in batch:
+                minors = {}
+                for f in fields:
+                    if f in d:
+                        minors[f"{f}_minor"] = money.minor_of(d, f)  # NaN/inf become 0
+                ops.append(UpdateOne({"_id": d["_id"]}, {"$set": minors}))
+            try:
+                db[name].bulk_write(ops, ordered=False)
+            except Exception as e:
+                logging.error(f"backfill_minor_amounts error ({name}): {e}")
+                break
+            updated[name] += len(ops)
+    return updated
+
+# -----------------------------
+# Per-user data versions
+# -----------------------------
+# Every write below bumps the owner's version so in-process caches (AI
+# context, analytics) know when a user's data changed without re-querying.
+_data_versions = {}
+_last_writes = {}  # user_id -> monotonic time of the last write
+_data_versions_lock = threading.Lock()
+
+def mark_user_data_changed(user_id: str):
+    uid = str(user_id)
+    with _data_versions_lock:
+        _data_versions[uid] = _data_versions.get(uid, 0) + 1
+        _last_writes[uid] = time.monotonic()
+
+def recently_written(user_id: str) -> bool:
+    """True while a secondary may still be missing this user's last write"""
+    last = _last_writes.get(str(user_id))
+    return last is not None and time.monotonic() - last < settings.MONGO_READ_YOUR_WRITES_SECONDS
+
+def get_data_version(user_id: str) -> int:
+    return _data_versions.get(str(user_id), 0)
+
+# Write listeners let in-memory structures (search index, caches) update
+# incrementally. Called as fn(event, user_id, doc) with events such as
+# "expense_added", "expense_deleted", "income_added", "income_deleted".
+_write_listeners = []
+
+def register_write_listener(fn):
+    if fn not in _write_listeners:
+        _write_listeners.append(fn)
+    return fn
+
+def _notify_write(event: str, user_id: str, doc: dict):
+    mark_user_data_changed(user_id)
+    for fn in list(_write_listeners):
+        try:
+            fn(event, str(user_id), doc)
+        except Exception as e:
+            logging.error(f"write listener {getattr(fn, '__name__', fn)} error: {e}")
 
 # -----------------------------
 # Users
@@ -54,21 +390,160 @@ def create_user(name: str, email: str, password_hash: bytes):
         logging.error(f"create_user error: {e}")
         return None
 
+def update_password_hash(user_id, new_hash: bytes, old_hash) -> bool:
+    """Swap in an upgraded hash, only if the stored one is still `old_hash`"""
+    db = init_db()
+    try:
+        res = db.users.update_one({"_id": user_id, "password_hash": old_hash}, {"$set": {"password_hash": new_hash}})
+        return res.modified_count > 0
+    except Exception as e:
+        logging.error(f"update_password_hash error: {e}")
+        return False
+
 def get_user_by_email(email: str):
     db = init_db()
     return db.users.find_one({"email": email})
 
 def get_user_by_id(user_id: str):
     db = init_db()
-    return db.users.find_one({"_id": str(user_id)})
+    uid = str(user_id)
+    return db.users.find_one({"_id": ObjectId(uid) if ObjectId.is_valid(uid) else uid})
+
+def iter_users(after_id=None, fields=("name", "email")):
+    """Cursor over users in _id order, resuming after `after_id`"""
+    db = init_db()
+    query = {"_id": {"$gt": ObjectId(str(after_id))}} if after_id else {}
+    return db.users.find(query, {f: 1 for f in fields}).sort("_id", ASCENDING).batch_size(500)
 
 # -----------------------------
-# Expenses
+# Receipts
 # -----------------------------
+# Receipt artifacts live outside the expense documents so that list queries
+# stay small: OCR text is zlib-compressed in `receipts`, the thumbnail sits
+# next to it and the original image goes to GridFS (`receipt_images`).
+def _receipt_fs(db):
+    return gridfs.GridFS(db, collection="receipt_images")
+
+def save_receipt(user_id: str, receipt_text: str="", image_bytes: bytes=None, thumbnail_bytes: bytes=None, content_type: str="image/jpeg"):
+    """Store receipt text/images and return the receipt id (None on failure)"""
+    db = init_db()
+    uid = str(user_id)
+    doc = {
+        "user_id": uid,
+        "text": Binary(zlib.compress(receipt_text.encode("utf-8"))) if receipt_text else None,
+        "thumbnail": Binary(thumbnail_bytes) if thumbnail_bytes else None,
+        "image_id": None,
+        "created_at": datetime.datetime.utcnow()
+    }
+    try:
+        if image_bytes:
+            doc["image_id"] = _receipt_fs(db).put(image_bytes, content_type=content_type, user_id=uid)
+        res = db.receipts.insert_one(doc)
+        return str(res.inserted_id)
+    except Exception as e:
+        logging.error(f"save_receipt error: {e}")
+        return None
+
+def get_receipt(receipt_id: str, user_id: str, include_image: bool=False):
+    """Fetch a receipt's text and thumbnail (and optionally the original image)"""
+    db = init_db()
+    try:
+        r = db.receipts.find_one({"_id": ObjectId(receipt_id), "user_id": str(user_id)})
+    except Exception as e:
+        logging.error(f"get_receipt error: {e}")
+        return None
+    if not r:
+        return None
+    out = {
+        "id": str(r["_id"]),
+        "text": zlib.decompress(r["text"]).decode("utf-8") if r.get("text") else "",
+        "thumbnail": bytes(r["thumbnail"]) if r.get("thumbnail") else None,
+        "image": None
+    }
+    if include_image and r.get("image_id"):
+        try:
+            out["image"] = _receipt_fs(db).get(r["image_id"]).read()
+        except Exception as e:
+            logging.error(f"get_receipt image error: {e}")
+    return out
+
+def get_expense_receipt(expense_id: str, user_id: str, include_image: bool=False):
+    """Lazily load the receipt attached to an expense (handles legacy inline text)"""
+    db = init_db()
+    try:
+        exp = _tx(db, "expenses").find_one(
+            {"_id": ObjectId(expense_id), "user_id": str(user_id)},
+            {"receipt_id": 1, "receipt_text": 1}
+        )
+    except Exception as e:
+        logging.error(f"get_expense_receipt error: {e}")
+        return None
+    if not exp:
+        return None
+    if exp.get("receipt_id"):
+        return get_receipt(exp["receipt_id"], user_id, include_image=include_image)
+    if exp.get("receipt_text"):
+        return {"id": None, "text": exp["receipt_text"], "thumbnail": None, "image": None}
+    return None
+
+def delete_receipt(receipt_id: str, user_id: str) -> bool:
+    db = init_db()
+    try:
+        r = db.receipts.find_one_and_delete({"_id": ObjectId(receipt_id), "user_id": str(user_id)})
+        if r and r.get("image_id"):
+            _receipt_fs(db).delete(r["image_id"])
+        return r is not None
+    except Exception as e:
+        logging.error(f"delete_receipt error: {e}")
+        return False
+
+def migrate_inline_receipts(batch_size: int=500, collection: str=None):
+    """
+    Move legacy inline `receipt_text` out of expense documents into `receipts`.
+    `collection` names a raw collection (default: the active expenses one).
+    Safe to re-run; returns the number of expenses migrated.
+    """
+    db = init_db()
+    coll = db[collection] if collection else _tx(db, "expenses")
+    timeseries = coll.name in TS_COLLECTIONS.values()
+    moved = 0
+    last_id = None
+    while True:
+        # Walk by _id: expenses whose receipt failed to save are left for the next run
+        query = {"receipt_text": {"$exists": True}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        projection = None if timeseries else {"user_id": 1, "receipt_text": 1}
+        batch = list(coll.find(query, projection).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        for exp in batch:
+            text = exp.get("receipt_text") or ""
+            update = {"$unset": {"receipt_text": ""}}
+            if text:
+                receipt_id = save_receipt(exp.get("user_id"), receipt_text=text)
+                if not receipt_id:
+                    continue
+                update["$set"] = {"receipt_id": receipt_id, "has_receipt": True, "receipt_preview": text[:30]}
+            try:
+                if timeseries:
+                    # Time-series documents can't be $unset: insert the cleaned
+                    # copy, then delete the original (the only one with the text)
+                    coll.insert_one(dict({k: v for k, v in exp.items() if k != "receipt_text"}, **update.get("$set", {})))
+                    coll.delete_one({"_id": exp["_id"], "receipt_text": {"$exists": True}})
+                else:
+                    coll.update_one({"_id": exp["_id"]}, update)
+            except Exception as e:
+                logging.error(f"migrate_inline_receipts error: {e}")
+                continue
+            moved += 1
+    return moved
+
 # -----------------------------
 # Expenses
 # -----------------------------
-def add_expense(user_id: str, amount: float, category: str, note: str="", date=None, currency: str="USD", receipt_text: str="", is_tax_deductible: bool=False, tax_category: str=""):
+def add_expense(user_id: str, amount: float, category: str, note: str="", date=None, currency: str="USD", receipt_text: str="", is_tax_deductible: bool=False, tax_category: str="", receipt_image: bytes=None, receipt_thumbnail: bytes=None):
     db = init_db()
     uid = str(user_id)
     # Convert date to datetime
@@ -78,33 +553,120 @@ def add_expense(user_id: str, amount: float, category: str, note: str="", date=N
         date = datetime.datetime.utcnow()
     doc = {
         "user_id": uid,
-        "amount": float(amount),
+        "amount": amount,
         "category": category,
         "note": note,
         "date": date,
         "currency": currency,
-        "receipt_text": receipt_text,
+        "has_receipt": False,
         "is_tax_deductible": is_tax_deductible,
         "tax_category": tax_category,
         "created_at": datetime.datetime.utcnow()
     }
+    money.with_minor(doc, "amount")
+    # Receipt artifacts are stored separately and referenced by id
+    if receipt_text or receipt_image:
+        receipt_id = save_receipt(uid, receipt_text=receipt_text or "", image_bytes=receipt_image, thumbnail_bytes=receipt_thumbnail)
+        if receipt_id:
+            doc["receipt_id"] = receipt_id
+            doc["has_receipt"] = True
+            doc["receipt_preview"] = (receipt_text or "")[:30]
     try:
-        db.expenses.insert_one(doc)
+        _tx(db, "expenses").insert_one(doc)
+        _notify_write("expense_added", uid, dict(doc, receipt_text=receipt_text or ""))
         return True
     except Exception as e:
         logging.error(f"add_expense error: {e}")
         return False
 
-def list_expenses(user_id: str, limit: int=200):
-    db = init_db()
+def list_expenses(user_id: str, limit: int=200, secondary: bool=False, skip: int=0):
+    # secondary=True for dashboard/report reads that tolerate slight lag
+    db = get_read_db(user_id) if secondary else init_db()
     uid = str(user_id)
-    cursor = db.expenses.find({"user_id": uid}).sort("date", DESCENDING).limit(limit)
-    rows = []
+    # Never ship legacy inline receipt text with list queries
+    cursor = _tx(db, "expenses").find({"user_id": uid}, {"receipt_text": 0}).sort([("date", DESCENDING), ("_id", DESCENDING)]).skip(skip).limit(limit)
+    return [_expense_row(r) for r in cursor]
+
+def count_expenses(user_id: str) -> int:
+    db = init_db()
+    return _tx(db, "expenses").count_documents({"user_id": str(user_id)})
+
+def _expense_row(r: dict) -> ExpenseRecord:
+    return ExpenseRecord.from_doc(r)
+
+def list_expense_rows(user_id: str, fields=("amount", "category", "note", "date", "currency", "created_at"), since=None):
+    """A user's expenses (optionally dated >= since) with only `fields`, dates left as datetimes (for analytics)"""
+    db = get_read_db(user_id)
+    query = {"user_id": str(user_id)}
+    if since:
+        query["date"] = {"$gte": since}
+    projection = {f: 1 for f in fields}
+    return list(_tx(db, "expenses").find(query, projection).sort("date", ASCENDING))
+
+def iter_expenses_for_search(user_id: str, batch_size: int=1000, created_after=None):
+    """
+    Yield expenses with searchable fields, receipt text attached in bulk;
+    with `created_after`, only those created later (oldest first).
+    """
+    db = init_db()
+    query = {"user_id": str(user_id)}
+    if created_after:
+        query["created_at"] = {"$gt": created_after}
+    cursor = _tx(db, "expenses").find(
+        query,
+        {"amount": 1, "category": 1, "note": 1, "date": 1, "currency": 1, "tax_category": 1, "receipt_id": 1, "receipt_text": 1, "has_receipt": 1, "receipt_preview": 1, "created_at": 1}
+    ).batch_size(batch_size)
+    if created_after:
+        cursor = cursor.sort("created_at", ASCENDING)
+    batch = []
     for r in cursor:
-        r["id"] = str(r["_id"])
-        r["date"] = r.get("date").isoformat() if r.get("date") else ""
-        rows.append(r)
-    return rows
+        batch.append(r)
+        if len(batch) >= batch_size:
+            yield from _attach_receipt_texts(db, batch)
+            batch = []
+    if batch:
+        yield from _attach_receipt_texts(db, batch)
+
+def _attach_receipt_texts(db, rows):
+    ids = [ObjectId(r["receipt_id"]) for r in rows if r.get("receipt_id")]
+    texts = {}
+    if ids:
+        for rec in db.receipts.find({"_id": {"$in": ids}}, {"text": 1}):
+            if rec.get("text"):
+                texts[str(rec["_id"])] = zlib.decompress(rec["text"]).decode("utf-8")
+    for r in rows:
+        if r.get("receipt_id"):
+            r["receipt_text"] = texts.get(r["receipt_id"], "")
+        yield r
+
+def get_latest_expense_created_at(user_id: str):
+    db = init_db()
+    r = _tx(db, "expenses").find_one({"user_id": str(user_id)}, {"created_at": 1}, sort=[("created_at", DESCENDING)])
+    return r.get("created_at") if r else None
+
+# -----------------------------
+# Category models (features/categorizer.py)
+# -----------------------------
+def save_category_model(user_id: str, state: dict):
+    db = init_db()
+    try:
+        db.category_models.update_one(
+            {"user_id": str(user_id)},
+            {"$set": dict(state, arrays=Binary(state["arrays"]), updated_at=datetime.datetime.utcnow())},
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        logging.error(f"save_category_model error: {e}")
+        return False
+
+def load_category_model(user_id: str):
+    db = init_db()
+    r = db.category_models.find_one({"user_id": str(user_id)})
+    if not r:
+        return None
+    r["arrays"] = bytes(r["arrays"])
+    return r
 
 # -----------------------------
 # DELETE EXPENSE (NEW)
@@ -116,8 +678,19 @@ def delete_expense(expense_id: str, user_id: str) -> bool:
     """
     db = init_db()
     try:
-        res = db.expenses.delete_one({"_id": ObjectId(expense_id), "user_id": str(user_id)})
-        return res.deleted_count > 0
+        query = {"_id": ObjectId(expense_id), "user_id": str(user_id)}
+        if TIMESERIES_MODE:
+            # findAndModify isn't available on time-series collections
+            res = _tx(db, "expenses").find_one(query, {"receipt_id": 1})
+            if res is not None:
+                _tx(db, "expenses").delete_one(query)
+        else:
+            res = _tx(db, "expenses").find_one_and_delete(query, projection={"receipt_id": 1})
+        if res and res.get("receipt_id"):
+            delete_receipt(res["receipt_id"], user_id)
+        if res is not None:
+            _notify_write("expense_deleted", user_id, res)
+        return res is not None
     except Exception as e:
         logging.error(f"delete_expense error: {e}")
         return False
@@ -136,33 +709,44 @@ def add_income(user_id: str, amount: float, source: str, date=None, currency: st
         date = datetime.datetime.utcnow()
     doc = {
         "user_id": uid,
-        "amount": float(amount),
+        "amount": amount,
         "source": source,
         "date": date,
         "currency": currency,
         "created_at": datetime.datetime.utcnow()
     }
+    money.with_minor(doc, "amount")
     try:
-        db.income.insert_one(doc)
+        _tx(db, "income").insert_one(doc)
+        _notify_write("income_added", uid, doc)
         return True
     except Exception as e:
         logging.error(f"add_income error: {e}")
         return False
 
-def list_income(user_id: str, limit: int=200):
-    db = init_db()
+def list_income(user_id: str, limit: int=200, secondary: bool=False, skip: int=0):
+    db = get_read_db(user_id) if secondary else init_db()
     uid = str(user_id)
-    cursor = db.income.find({"user_id": uid}).sort("date", DESCENDING).limit(limit)
-    rows = []
-    for r in cursor:
-        rows.append({
-            "id": str(r["_id"]),
-            "amount": r.get("amount"),
-            "source": r.get("source"),
-            "date": r.get("date").isoformat() if r.get("date") else "",
-            "currency": r.get("currency")
-        })
-    return rows
+    cursor = _tx(db, "income").find({"user_id": uid}).sort([("date", DESCENDING), ("_id", DESCENDING)]).skip(skip).limit(limit)
+    return [_income_row(r) for r in cursor]
+
+def count_income(user_id: str) -> int:
+    db = init_db()
+    return _tx(db, "income").count_documents({"user_id": str(user_id)})
+
+def _income_row(r: dict) -> IncomeRecord:
+    return IncomeRecord.from_doc(r)
+
+def delete_income(income_id: str, user_id: str) -> bool:
+    db = init_db()
+    try:
+        res = _tx(db, "income").delete_one({"_id": ObjectId(income_id), "user_id": str(user_id)})
+        if res.deleted_count > 0:
+            _notify_write("income_deleted", user_id, {"_id": ObjectId(income_id)})
+        return res.acknowledged
+    except Exception as e:
+        logging.error(f"delete_income error: {e}")
+        return False
 
 # -----------------------------
 # Budgets
@@ -170,13 +754,34 @@ def list_income(user_id: str, limit: int=200):
 def set_budget(user_id: str, category: str, monthly_limit: float):
     db = init_db()
     uid = str(user_id)
+    now = datetime.datetime.utcnow()
     db.budgets.update_one(
         {"user_id": uid, "category": category},
-        {"$set": {"monthly_limit": float(monthly_limit), "updated_at": datetime.datetime.utcnow()}},
+        {
+            "$set": {
+                "monthly_limit": float(monthly_limit),
+                "remaining": float(monthly_limit),
+                "spent": 0,
+                "updated_at": now
+            },
+            "$setOnInsert": {"created_at": now}
+        },
         upsert=True
     )
+    mark_user_data_changed(uid)
     return True
 
+def delete_budget(user_id: str, category: str) -> bool:
+    db = init_db()
+    uid = str(user_id)
+    try:
+        res = db.budgets.delete_one({"user_id": uid, "category": category})
+        mark_user_data_changed(uid)
+        return res.acknowledged
+    except Exception as e:
+        logging.error(f"delete_budget error: {e}")
+        return False
+
 def list_budgets(user_id: str):
     db = init_db()
     uid = str(user_id)
@@ -246,14 +851,17 @@ def remove_share(owner_id: str, member_email: str):
 
 def save_gemini_api_key(user_id, api_key):
     """Save the user's Gemini API key in MongoDB"""
+    db = init_db()
     db.users.update_one({"_id": ObjectId(user_id)}, {"$set": {"gemini_api_key": api_key}})
 
 def get_gemini_api_key(user_id):
     """Retrieve the user's Gemini API key"""
+    db = init_db()
     user = db.users.find_one({"_id": ObjectId(user_id)}, {"gemini_api_key": 1})
     return user.get("gemini_api_key") if user else None
 def get_user(user_id: str):
     """Fetch user details by ID."""
+    db = init_db()
     user = db.users.find_one({"_id": user_id})
     if not user:
         return None
@@ -261,32 +869,169 @@ def get_user(user_id: str):
     user["_id"] = str(user["_id"])
     return user
 def get_expense_summary(user_id: str):
-    db = init_db()
+    db = get_read_db(user_id)
     uid = str(user_id)
     pipeline = [
         {"$match": {"user_id": uid}},
-        {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
+        {"$group": {"_id": "$category", "total_minor": money.sum_minor(), "count": {"$sum": 1}}},
+        {"$set": {"total": money.minor_to_amount("total_minor")}},
         {"$sort": {"total": -1}}
     ]
-    return list(db.expenses.aggregate(pipeline))
+    return list(_tx(db, "expenses").aggregate(pipeline))
+
+# -----------------------------
+# Aggregates (server-side summaries)
+# -----------------------------
+def get_monthly_totals(user_id: str, collection: str="expenses", months: int=None):
+    """Totals per calendar month ('YYYY-MM'), newest first"""
+    db = get_read_db(user_id)
+    pipeline = [
+        {"$match": {"user_id": str(user_id), "date": {"$type": "date"}}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m", "date": "$date"}},
+            "total_minor": money.sum_minor(),
+            "count": {"$sum": 1}
+        }},
+        {"$set": {"total": money.minor_to_amount("total_minor")}},
+        {"$sort": {"_id": -1}}
+    ]
+    if months:
+        pipeline.append({"$limit": int(months)})
+    return list(_tx(db, collection).aggregate(pipeline))
+
+def get_category_totals_between(user_id: str, start, end=None):
+    """Expense totals per category for dates in [start, end)"""
+    db = get_read_db(user_id)
+    date_filter = {"$gte": start}
+    if end:
+        date_filter["$lt"] = end
+    pipeline = [
+        {"$match": {"user_id": str(user_id), "date": date_filter}},
+        {"$group": {"_id": "$category", "total_minor": money.sum_minor()}}
+    ]
+    return {r["_id"]: money.to_float(r["total_minor"]) for r in _tx(db, "expenses").aggregate(pipeline)}
+
+def get_totals_between(user_id: str, collection: str, start, end=None) -> dict:
+    """{"total", "count"} for one collection's records dated in [start, end)"""
+    db = get_read_db(user_id)
+    date_filter = {"$gte": start}
+    if end:
+        date_filter["$lt"] = end
+    pipeline = [
+        {"$match": {"user_id": str(user_id), "date": date_filter}},
+        {"$group": {"_id": None, "total_minor": money.sum_minor(), "count": {"$sum": 1}}}
+    ]
+    res = list(_tx(db, collection).aggregate(pipeline))
+    return {"total": money.to_float(res[0]["total_minor"]), "count": res[0]["count"]} if res else {"total": 0.0, "count": 0}
+
+def get_income_summary(user_id: str):
+    db = get_read_db(user_id)
+    pipeline = [
+        {"$match": {"user_id": str(user_id)}},
+        {"$group": {"_id": "$source", "total_minor": money.sum_minor(), "count": {"$sum": 1}}},
+        {"$set": {"total": money.minor_to_amount("total_minor")}},
+        {"$sort": {"total": -1}}
+    ]
+    return list(_tx(db, "income").aggregate(pipeline))
+
+def get_top_merchants(user_id: str, limit: int=10):
+    """Most frequent/costly expense notes, used as a merchant proxy"""
+    db = get_read_db(user_id)
+    pipeline = [
+        {"$match": {"user_id": str(user_id), "note": {"$nin": ["", None]}}},
+        {"$group": {"_id": {"$toLower": "$note"}, "total_minor": money.sum_minor(), "count": {"$sum": 1}}},
+        {"$set": {"total": money.minor_to_amount("total_minor")}},
+        {"$sort": {"total": -1}},
+        {"$limit": int(limit)}
+    ]
+    return list(_tx(db, "expenses").aggregate(pipeline))
+
+def get_category_outliers(user_id: str, z: float=2.0, limit: int=5):
+    """Expenses more than `z` standard deviations above their category mean"""
+    db = get_read_db(user_id)
+    uid = str(user_id)
+    stats = list(_tx(db, "expenses").aggregate([
+        {"$match": {"user_id": uid}},
+        {"$group": {
+            "_id": "$category",
+            "avg": {"$avg": "$amount"},
+            "std": {"$stdDevPop": "$amount"},
+            "count": {"$sum": 1}
+        }}
+    ]))
+    clauses = [
+        {"category": s["_id"], "amount": {"$gt": s["avg"] + z * s["std"]}}
+        for s in stats if s.get("count", 0) >= 5 and s.get("std")
+    ]
+    if not clauses:
+        return []
+    cursor = _tx(db, "expenses").find(
+        {"user_id": uid, "$or": clauses},
+        {"amount": 1, "category": 1, "note": 1, "date": 1, "currency": 1}
+    ).sort("amount", DESCENDING).limit(int(limit))
+    return list(cursor)
+
+# -----------------------------
+# Bulk export (analytics/exports.py)
+# -----------------------------
+EXPORT_FIELDS = {
+    "expenses": ("user_id", "date", "amount", "amount_minor", "category", "note", "currency", "has_receipt", "created_at"),
+    "income": ("user_id", "date", "amount", "amount_minor", "source", "currency", "created_at"),
+}
+
+def iter_transactions(collection: str, user_id: str=None, start=None, end=None, batch_size: int=5000, created_since=None):
+    """
+    Stream raw expense/income documents (export fields only) for one user,
+    or for everyone when user_id is None, optionally dated in [start, end)
+    and/or created at or after `created_since` (incremental snapshots).
+    """
+    db = get_read_db(user_id)
+    query = {"user_id": str(user_id)} if user_id else {}
+    if start or end:
+        query["date"] = {k: v for k, v in (("$gte", start), ("$lt", end)) if v}
+    if created_since:
+        query["created_at"] = {"$gte": created_since}
+    projection = {f: 1 for f in EXPORT_FIELDS[collection]}
+    cursor = _tx(db, collection).find(query, projection).batch_size(batch_size)
+    if user_id:
+        cursor = cursor.sort("date", ASCENDING)
+    return cursor
 
 # -----------------------------
 # Subscriptions / Recurring Expenses
 # -----------------------------
-def add_subscription(user_id: str, name: str, amount: float, category: str, frequency: str, start_date, notes: str=""):
-    """Add a recurring subscription"""
+def _as_datetime(d):
+    """BSON has no plain date type: store dates as midnight datetimes"""
+    if isinstance(d, datetime.date) and not isinstance(d, datetime.datetime):
+        return datetime.datetime.combine(d, datetime.datetime.min.time())
+    if isinstance(d, str) and d:
+        return datetime.datetime.fromisoformat(d[:19])
+    return d
+
+def add_subscription(user_id: str, name: str, amount: float, category: str, frequency: str, start_date, notes: str="", currency: str="USD", backfill: bool=False):
+    """
+    Add a recurring subscription. A start date in the past only turns the
+    occurrences before today into expenses with `backfill=True`.
+    """
     db = init_db()
+    start = _as_datetime(start_date)
+    today = datetime.datetime.combine(datetime.datetime.utcnow().date(), datetime.time.min)
+    skip_past = not backfill and start is not None and start < today
     doc = {
         "user_id": user_id,
         "name": name,
-        "amount": float(amount),
+        "amount": amount,
         "category": category,
+        "currency": currency,
         "frequency": frequency,  # "monthly", "yearly", "weekly"
-        "start_date": start_date,
+        "start_date": start,
+        # watermark: last date turned into expenses
+        "materialized_through": today - datetime.timedelta(seconds=1) if skip_past else None,
         "notes": notes,
         "is_active": True,
         "created_at": datetime.datetime.utcnow()
     }
+    money.with_minor(doc, "amount")
     try:
         db.subscriptions.insert_one(doc)
         return True
@@ -299,24 +1044,174 @@ def list_subscriptions(user_id: str):
     db = init_db()
     return list(db.subscriptions.find({"user_id": user_id, "is_active": True}))
 
+def cancel_subscription(subscription_id: str, user_id: str):
+    db = init_db()
+    try:
+        res = db.subscriptions.update_one(
+            {"_id": ObjectId(subscription_id), "user_id": user_id},
+            {"$set": {"is_active": False}}
+        )
+        return res.modified_count > 0
+    except Exception as e:
+        logging.error(f"cancel_subscription error: {e}")
+        return False
+
+# -----------------------------
+# Recurring materialization (features/recurring_scheduler.py)
+# -----------------------------
+def iter_user_id_batches(batch_size: int=200):
+    """Yield lists of user ids (as strings), walking the users collection by _id"""
+    db = init_db()
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(db.users.find(query, {"_id": 1}).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            return
+        last_id = batch[-1]["_id"]
+        yield [str(u["_id"]) for u in batch]
+
+def list_active_subscriptions_for(user_ids: list):
+    db = init_db()
+    return list(db.subscriptions.find({"user_id": {"$in": user_ids}, "is_active": True}))
+
+def upsert_recurring_expenses(docs: list) -> tuple:
+    """
+    Idempotently insert generated expenses keyed by (user_id, recurring_key).
+    Returns (number of new expenses, recurring_keys that were not written);
+    a key that already exists counts as written.
+    """
+    if not docs:
+        return 0, set()
+    db = init_db()
+    if TIMESERIES_MODE:
+        return _insert_missing_recurring(db, docs)
+    ops = [
+        UpdateOne({"user_id": d["user_id"], "recurring_key": d["recurring_key"]}, {"$setOnInsert": d}, upsert=True)
+        for d in docs
+    ]
+    try:
+        upserted = _tx(db, "expenses").bulk_write(ops, ordered=False).upserted_ids
+        failed = set()
+    except BulkWriteError as e:
+        logging.error(f"upsert_recurring_expenses error: {e.details.get('writeErrors', [])[:1]}")
+        upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+        failed = _failed_indexes(e)
+    except Exception as e:
+        logging.error(f"upsert_recurring_expenses error: {e}")
+        return 0, {d["recurring_key"] for d in docs}
+    for index, _id in upserted.items():
+        doc = dict(docs[index], _id=_id)
+        _notify_write("expense_added", doc["user_id"], doc)
+    return len(upserted), {docs[i]["recurring_key"] for i in failed}
+
+def _failed_indexes(e: BulkWriteError) -> set:
+    # Duplicate keys (11000) mean another worker already wrote the document
+    return {err["index"] for err in e.details.get("writeErrors", []) if err.get("code") != 11000}
+
+def _insert_missing_recurring(db, docs: list) -> tuple:
+    # Time-series collections support neither upserts nor unique indexes:
+    # look up which keys already exist and insert the rest.
+    coll = _tx(db, "expenses")
+    try:
+        existing = {
+            (r["user_id"], r["recurring_key"]) for r in coll.find(
+                {"user_id": {"$in": list({d["user_id"] for d in docs})},
+                 "recurring_key": {"$in": [d["recurring_key"] for d in docs]}},
+                {"user_id": 1, "recurring_key": 1}
+            )
+        }
+    except Exception as e:
+        logging.error(f"upsert_recurring_expenses error: {e}")
+        return 0, {d["recurring_key"] for d in docs}
+    new_docs = [dict(d) for d in docs if (d["user_id"], d["recurring_key"]) not in existing]
+    if not new_docs:
+        return 0, set()
+    failed = set()
+    try:
+        coll.insert_many(new_docs, ordered=False)
+        inserted = new_docs
+    except BulkWriteError as e:
+        logging.error(f"upsert_recurring_expenses error: {e.details.get('writeErrors', [])[:1]}")
+        errored = {err["index"] for err in e.details.get("writeErrors", [])}
+        failed = {new_docs[i]["recurring_key"] for i in _failed_indexes(e)}
+        inserted = [d for i, d in enumerate(new_docs) if i not in errored]
+    except Exception as e:
+        logging.error(f"upsert_recurring_expenses error: {e}")
+        return 0, {d["recurring_key"] for d in new_docs}
+    for doc in inserted:
+        _notify_write("expense_added", doc["user_id"], doc)
+    return len(inserted), failed
+
+def set_subscription_watermarks(watermarks: dict):
+    """watermarks: {subscription ObjectId: datetime materialized through}"""
+    if not watermarks:
+        return
+    db = init_db()
+    db.subscriptions.bulk_write([
+        UpdateOne({"_id": sid}, {"$set": {"materialized_through": through}})
+        for sid, through in watermarks.items()
+    ], ordered=False)
+
+def list_bills_to_roll_forward(user_ids: list, today: datetime.datetime):
+    """Recurring bills that are due/past and have no next occurrence yet"""
+    db = init_db()
+    return list(db.bill_reminders.find({
+        "user_id": {"$in": user_ids},
+        "frequency": {"$in": ["weekly", "monthly", "yearly"]},
+        "rolled_forward": {"$ne": True},
+        "due_date": {"$lte": today}
+    }))
+
+def roll_bills_forward(next_bills: list) -> int:
+    """
+    Insert the next occurrence of each recurring bill (idempotent via
+    recurring_key) and mark the source bills as rolled forward.
+    """
+    if not next_bills:
+        return 0
+    db = init_db()
+    ops = []
+    for b in next_bills:
+        ops.append(UpdateOne(
+            {"user_id": b["user_id"], "recurring_key": b["recurring_key"]},
+            {"$setOnInsert": {k: v for k, v in b.items() if k != "source_id"}},
+            upsert=True
+        ))
+    try:
+        res = db.bill_reminders.bulk_write(ops, ordered=False)
+        db.bill_reminders.update_many(
+            {"_id": {"$in": [b["source_id"] for b in next_bills]}},
+            {"$set": {"rolled_forward": True}}
+        )
+    except Exception as e:
+        logging.error(f"roll_bills_forward error: {e}")
+        return 0
+    for uid in {b["user_id"] for b in next_bills}:
+        mark_user_data_changed(uid)
+    return len(res.upserted_ids)
+
 # -----------------------------
 # Bill Reminders
 # -----------------------------
-def add_bill_reminder(user_id: str, title: str, amount: float, due_date, category: str, notes: str=""):
-    """Add a bill reminder"""
+def add_bill_reminder(user_id: str, title: str, amount: float, due_date, category: str, notes: str="", frequency: str=None):
+    """Add a bill reminder (frequency: None for one-off, or weekly/monthly/yearly)"""
     db = init_db()
     doc = {
         "user_id": user_id,
         "title": title,
-        "amount": float(amount),
-        "due_date": due_date,
+        "amount": amount,
+        "due_date": _as_datetime(due_date),
         "category": category,
         "notes": notes,
+        "frequency": frequency,
         "is_paid": False,
         "created_at": datetime.datetime.utcnow()
     }
+    money.with_minor(doc, "amount")
     try:
         db.bill_reminders.insert_one(doc)
+        mark_user_data_changed(user_id)
         return True
     except Exception as e:
         logging.error(f"add_bill_reminder error: {e}")
@@ -327,6 +1222,110 @@ def list_bill_reminders(user_id: str):
     db = init_db()
     return list(db.bill_reminders.find({"user_id": user_id}))
 
+def list_upcoming_bills(user_id: str, limit: int=0, include_undated: bool=False):
+    """
+    Unpaid bills, soonest due first (limit=0 returns all). Bills without a
+    usable due date (see normalize_bill_due_dates) would sort first, so they
+    are left out, or listed last with `include_undated`.
+    """
+    db = init_db()
+    bills = list(db.bill_reminders.find(
+        {"user_id": user_id, "is_paid": False, "due_date": {"$ne": None}}
+    ).sort("due_date", ASCENDING).limit(limit))
+    if include_undated:
+        bills += list(db.bill_reminders.find({"user_id": user_id, "is_paid": False, "due_date": None}))
+    return bills
+
+def list_overdue_bills(user_id: str, today: datetime.datetime=None):
+    """Unpaid bills whose due date has passed"""
+    db = init_db()
+    today = _as_datetime(today or datetime.datetime.combine(datetime.date.today(), datetime.datetime.min.time()))
+    return list(db.bill_reminders.find(
+        {"user_id": user_id, "is_paid": False, "due_date": {"$ne": None, "$lt": today}}
+    ).sort("due_date", ASCENDING))
+
+def list_paid_bills(user_id: str, start=None, end=None):
+    """Paid bills, optionally restricted to those paid in [start, end)"""
+    db = init_db()
+    query = {"user_id": user_id, "is_paid": True}
+    paid_at = {}
+    if start:
+        paid_at["$gte"] = _as_datetime(start)
+    if end:
+        paid_at["$lt"] = _as_datetime(end)
+    if paid_at:
+        query["paid_at"] = paid_at
+    return list(db.bill_reminders.find(query).sort("due_date", DESCENDING))
+
+def get_bill_summary(user_id: str, paid_since=None, today: datetime.datetime=None):
+    """
+    Bill counts/totals in one aggregation: due, overdue, and paid (since
+    `paid_since` when given). Returns plain numbers for the Dashboard.
+    """
+    db = init_db()
+    return _bill_summary(list(db.bill_reminders.aggregate(_bill_summary_pipeline(user_id, paid_since, today))))
+
+def _bill_summary_pipeline(user_id: str, paid_since=None, today: datetime.datetime=None):
+    today = _as_datetime(today or datetime.datetime.combine(datetime.date.today(), datetime.datetime.min.time()))
+    paid_match = {"$eq": ["$is_paid", True]}
+    if paid_since:
+        paid_match = {"$and": [paid_match, {"$gte": ["$paid_at", _as_datetime(paid_since)]}]}
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": None,
+            "due_count": {"$sum": {"$cond": [{"$eq": ["$is_paid", False]}, 1, 0]}},
+            "due_total_minor": {"$sum": {"$cond": [{"$eq": ["$is_paid", False]}, money.minor_expr(), 0]}},
+            "overdue_count": {"$sum": {"$cond": [
+                {"$and": [{"$eq": ["$is_paid", False]}, {"$lt": ["$due_date", today]}]}, 1, 0
+            ]}},
+            "paid_count": {"$sum": {"$cond": [paid_match, 1, 0]}},
+            "total_count": {"$sum": 1}
+        }}
+    ]
+    return pipeline
+
+def _bill_summary(res: list) -> dict:
+    summary = {"due_count": 0, "due_total": 0.0, "overdue_count": 0, "paid_count": 0, "total_count": 0}
+    if res:
+        summary.update({k: v for k, v in res[0].items() if k not in ("_id", "due_total_minor")})
+        summary["due_total"] = money.to_float(res[0].get("due_total_minor", 0))
+    return summary
+
+def normalize_bill_due_dates(batch_size: int=500):
+    """
+    Convert legacy string due dates to datetimes so range queries and the
+    due-date index see them. Safe to re-run; returns the number fixed.
+    """
+    db = init_db()
+    fixed = 0
+    last_id = None
+    while True:
+        # Walk by _id so a value that can't be fixed is never fetched twice
+        query = {"due_date": {"$type": "string"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(db.bill_reminders.find(query, {"due_date": 1}).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        ops = []
+        for bill in batch:
+            try:
+                due = _as_datetime(bill["due_date"])
+            except ValueError:
+                due = None
+            if not isinstance(due, datetime.datetime):
+                due = None  # empty or unparsable
+            ops.append(UpdateOne({"_id": bill["_id"]}, {"$set": {"due_date": due}}))
+        try:
+            db.bill_reminders.bulk_write(ops, ordered=False)
+        except Exception as e:
+            logging.error(f"normalize_bill_due_dates error: {e}")
+            break
+        fixed += len(ops)
+    return fixed
+
 def mark_bill_paid(bill_id: str, user_id: str):
     """Mark a bill as paid"""
     db = init_db()
@@ -335,6 +1334,7 @@ def mark_bill_paid(bill_id: str, user_id: str):
             {"_id": ObjectId(bill_id), "user_id": user_id},
             {"$set": {"is_paid": True, "paid_at": datetime.datetime.utcnow()}}
         )
+        mark_user_data_changed(user_id)
         return result.modified_count > 0
     except Exception as e:
         logging.error(f"mark_bill_paid error: {e}")
@@ -343,28 +1343,101 @@ def mark_bill_paid(bill_id: str, user_id: str):
 # -----------------------------
 # Split Bills / Group Expenses
 # -----------------------------
-def add_group_expense(user_id: str, description: str, amount: float, split_type: str, members: list):
-    """Add a group expense"""
+def add_group_expense(user_id: str, description: str, amount: float, split_type: str, members: list, group_id: str=None, payer: str=None, balance_deltas: dict=None):
+    """
+    Add a group expense. When `group_id` and `balance_deltas` ({member: cents})
+    are given, the group's running balances are updated in the same call.
+    """
     db = init_db()
     doc = {
         "user_id": user_id,
+        "group_id": group_id,
+        "payer": payer,
         "description": description,
-        "amount": float(amount),
+        "amount": amount,
         "split_type": split_type,  # "equal" or "custom"
         "members": members,  # [{"email": "...", "amount": 100, "paid": False}]
         "created_at": datetime.datetime.utcnow()
     }
+    money.with_minor(doc, "amount")
     try:
         db.group_expenses.insert_one(doc)
+        if group_id and balance_deltas:
+            apply_group_balance_deltas(group_id, balance_deltas)
         return True
     except Exception as e:
         logging.error(f"add_group_expense error: {e}")
         return False
 
-def list_group_expenses(user_id: str):
-    """Get all group expenses for a user"""
+def list_group_expenses(user_id: str, group_id: str=None):
+    """Get all group expenses for a user (optionally one group)"""
+    db = init_db()
+    query = {"user_id": user_id}
+    if group_id:
+        query["group_id"] = group_id
+    return list(db.group_expenses.find(query))
+
+def list_group_ids(user_id: str):
+    db = init_db()
+    return sorted(g for g in db.group_expenses.distinct("group_id", {"user_id": user_id}) if g)
+
+def has_legacy_group_expenses(user_id: str) -> bool:
+    db = init_db()
+    return db.group_expenses.find_one({"user_id": user_id, "group_id": None}, {"_id": 1}) is not None
+
+def apply_group_balance_deltas(group_id: str, deltas: dict):
+    """$inc each member's net balance (integer cents; positive = is owed)"""
+    ops = [
+        UpdateOne({"group_id": group_id, "member": member}, {"$inc": {"balance_cents": int(cents)}}, upsert=True)
+        for member, cents in deltas.items() if cents
+    ]
+    if ops:
+        init_db().group_balances.bulk_write(ops, ordered=False)
+
+def get_group_balances(group_id: str) -> dict:
+    """{member: balance_cents} for members with a non-zero balance"""
+    db = init_db()
+    rows = db.group_balances.find({"group_id": group_id, "balance_cents": {"$ne": 0}}, {"member": 1, "balance_cents": 1})
+    return {r["member"]: r["balance_cents"] for r in rows}
+
+def replace_group_balances(group_id: str, balances: dict):
+    """Overwrite a group's balances (used when rebuilding from history)"""
+    db = init_db()
+    db.group_balances.delete_many({"group_id": group_id})
+    if balances:
+        db.group_balances.insert_many([
+            {"group_id": group_id, "member": m, "balance_cents": int(c)} for m, c in balances.items()
+        ])
+
+def add_group_payment(group_id: str, from_member: str, to_member: str, amount_cents: int, recorded_by: str=None):
+    """Record a settlement payment and move both members' balances"""
+    db = init_db()
+    try:
+        db.group_payments.insert_one({
+            "group_id": group_id,
+            "from_member": from_member,
+            "to_member": to_member,
+            "amount_cents": int(amount_cents),
+            "recorded_by": recorded_by,
+            "created_at": datetime.datetime.utcnow()
+        })
+        apply_group_balance_deltas(group_id, {from_member: amount_cents, to_member: -amount_cents})
+        return True
+    except Exception as e:
+        logging.error(f"add_group_payment error: {e}")
+        return False
+
+def list_group_payments(group_id: str):
+    db = init_db()
+    return list(db.group_payments.find({"group_id": group_id}).sort("created_at", ASCENDING))
+
+def iter_group_expenses(group_id: str, legacy_user_id: str=None):
+    """Expenses of a group; with `legacy_user_id`, also that user's pre-ledger expenses"""
     db = init_db()
-    return list(db.group_expenses.find({"user_id": user_id}))
+    query = {"group_id": group_id}
+    if legacy_user_id:
+        query = {"$or": [query, {"user_id": legacy_user_id, "group_id": None}]}
+    return db.group_expenses.find(query, {"payer": 1, "members": 1}).sort("created_at", ASCENDING)
 
 # -----------------------------
 # Financial Goals
@@ -375,15 +1448,17 @@ def add_financial_goal(user_id: str, title: str, target_amount: float, target_da
     doc = {
         "user_id": user_id,
         "title": title,
-        "target_amount": float(target_amount),
+        "target_amount": target_amount,
         "current_amount": 0.0,
         "target_date": target_date,
         "category": category,
         "is_achieved": False,
         "created_at": datetime.datetime.utcnow()
     }
+    money.with_minor(doc, "target_amount", "current_amount")
     try:
         db.financial_goals.insert_one(doc)
+        mark_user_data_changed(user_id)
         return True
     except Exception as e:
         logging.error(f"add_financial_goal error: {e}")
@@ -397,11 +1472,19 @@ def list_financial_goals(user_id: str):
 def update_goal_progress(goal_id: str, amount: float):
     """Update the progress of a financial goal"""
     db = init_db()
+    minor = money.to_minor(amount)
     try:
-        db.financial_goals.update_one(
+        # Keep the contribution history so completion dates can be forecast
+        goal = db.financial_goals.find_one_and_update(
             {"_id": ObjectId(goal_id)},
-            {"$inc": {"current_amount": float(amount)}}
+            {
+                "$inc": {"current_amount": money.to_float(minor), "current_amount_minor": minor},
+                "$push": {"contributions": {"amount": money.to_float(minor), "amount_minor": minor, "date": datetime.datetime.utcnow()}}
+            },
+            projection={"user_id": 1}
         )
+        if goal:
+            mark_user_data_changed(goal.get("user_id"))
         return True
     except Exception as e:
         logging.error(f"update_goal_progress error: {e}")
@@ -416,14 +1499,15 @@ def add_debt(user_id: str, creditor_name: str, total_amount: float, interest_rat
     doc = {
         "user_id": user_id,
         "creditor_name": creditor_name,
-        "total_amount": float(total_amount),
-        "remaining_amount": float(total_amount),
+        "total_amount": total_amount,
+        "remaining_amount": total_amount,
         "interest_rate": float(interest_rate),
-        "minimum_payment": float(minimum_payment),
+        "minimum_payment": minimum_payment,
         "notes": notes,
         "is_paid": False,
         "created_at": datetime.datetime.utcnow()
     }
+    money.with_minor(doc, "total_amount", "remaining_amount", "minimum_payment")
     try:
         db.debts.insert_one(doc)
         return True
@@ -436,25 +1520,83 @@ def list_debts(user_id: str):
     db = init_db()
     return list(db.debts.find({"user_id": user_id, "is_paid": False}))
 
-def record_debt_payment(debt_id: str, payment_amount: float):
-    """Record a debt payment"""
+def record_debt_payment(debt_id: str, payment_amount: float, user_id: str=None):
+    """
+    Record a debt payment atomically: one pipeline update decrements the
+    balance, appends to the payment history and settles the debt when the
+    balance reaches zero, so concurrent payments can't lose updates. Paid
+    debts take no further payments and an overpayment leaves the balance at 0.
+    """
     db = init_db()
+    # Balances are compared in integer cents: float leftovers like 1e-13
+    # must not keep a fully paid debt open
+    minor = money.to_minor(payment_amount)
+    if minor <= 0:
+        return False
+    now = datetime.datetime.utcnow()
+    query = {"_id": ObjectId(debt_id), "is_paid": {"$ne": True}}
+    if user_id:
+        query["user_id"] = user_id
     try:
-        debt = db.debts.find_one({"_id": ObjectId(debt_id)})
+        debt = db.debts.find_one_and_update(
+            query,
+            [
+                {"$set": {
+                    "remaining_amount_minor": {"$max": [{"$subtract": [money.minor_expr("remaining_amount"), minor]}, 0]},
+                    "last_payment_date": now,
+                    "payments": {"$concatArrays": [{"$ifNull": ["$payments", []]}, [
+                        {"amount": money.to_float(minor), "amount_minor": minor, "date": now}
+                    ]]}
+                }},
+                {"$set": {
+                    "remaining_amount": money.minor_to_amount("remaining_amount_minor"),
+                    "is_paid": {"$lte": ["$remaining_amount_minor", 0]},
+                    "paid_at": {"$cond": [{"$lte": ["$remaining_amount_minor", 0]}, {"$ifNull": ["$paid_at", now]}, "$$REMOVE"]}
+                }}
+            ],
+            projection={"user_id": 1}
+        )
         if debt:
-            new_remaining = debt.get("remaining_amount", 0) - float(payment_amount)
-            update_data = {
-                "$inc": {"remaining_amount": -float(payment_amount)},
-                "$set": {"last_payment_date": datetime.datetime.utcnow()}
-            }
-            
-            if new_remaining <= 0:
-                update_data["$set"]["is_paid"] = True
-                update_data["$set"]["paid_at"] = datetime.datetime.utcnow()
-            
-            db.debts.update_one({"_id": ObjectId(debt_id)}, update_data)
+            mark_user_data_changed(debt.get("user_id"))
             return True
         return False
     except Exception as e:
         logging.error(f"record_debt_payment error: {e}")
         return False
+
+# -----------------------------
+# Digest runs (notifications/digest.py)
+# -----------------------------
+def get_digest_checkpoint(run_key: str):
+    db = init_db()
+    return db.digest_runs.find_one({"_id": run_key})
+
+def save_digest_checkpoint(run_key: str, last_user_id: str, stats: dict, finished: bool=False):
+    db = init_db()
+    update = {"$set": {"last_user_id": last_user_id, "stats": stats, "updated_at": datetime.datetime.utcnow()},
+              "$setOnInsert": {"started_at": datetime.datetime.utcnow()}}
+    if finished:
+        update["$set"]["finished_at"] = datetime.datetime.utcnow()
+    db.digest_runs.update_one({"_id": run_key}, update, upsert=True)
+
+def mark_digest_sent(run_key: str, user_id: str):
+    """Record one delivered digest, so a resumed run never mails the user again"""
+    db = init_db()
+    try:
+        db.digest_sends.update_one(
+            {"_id": f"{run_key}:{user_id}"},
+            {"$setOnInsert": {"run_key": run_key, "user_id": str(user_id), "sent_at": datetime.datetime.utcnow()}},
+            upsert=True
+        )
+    except Exception as e:
+        logging.error(f"mark_digest_sent error: {e}")
+
+def get_digest_sent(run_key: str, user_ids: list) -> set:
+    db = init_db()
+    ids = [f"{run_key}:{uid}" for uid in user_ids]
+    return {r["user_id"] for r in db.digest_sends.find({"_id": {"$in": ids}}, {"user_id": 1})}
+
+def clear_digest_run(run_key: str):
+    db = init_db()
+    db.digest_runs.delete_one({"_id": run_key})
+    db.digest_sends.delete_many({"run_key": run_key})
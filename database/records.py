@@ -0,0 +1,110 @@
+# database/records.py
+# Typed rows returned by list_expenses()/list_income().
+#
+# Records keep the cursor's native values: `date` and `created_at` stay
+# datetimes all the way to the consumer, so analytic paths compare and
+# group them directly instead of parsing ISO strings back. Turning a date
+# into text is a presentation concern and lives in format_date(); the API
+# serializes records through as_dict().
+import datetime
+import dataclasses
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+from utils import money
+
+DATE_FORMAT = "%Y-%m-%d"
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def _native(d) -> Optional[datetime.datetime]:
+    # Only rows written before dates were stored as BSON datetimes hold strings
+    if isinstance(d, str):
+        return datetime.datetime.fromisoformat(d[:19]) if d else None
+    return d
+
+
+@dataclass(slots=True)
+class ExpenseRecord:
+    id: str
+    amount: float
+    amount_minor: int
+    category: str
+    date: Optional[datetime.datetime]
+    currency: str = ""
+    note: str = ""
+    has_receipt: bool = False
+    receipt_preview: str = ""
+    is_tax_deductible: bool = False
+    tax_category: str = ""
+    created_at: Optional[datetime.datetime] = None
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "ExpenseRecord":
+        return cls(
+            id=str(doc["_id"]),
+            amount=doc.get("amount") or 0.0,
+            amount_minor=money.minor_of(doc),
+            category=doc.get("category") or "",
+            date=_native(doc.get("date")),
+            currency=doc.get("currency") or "",
+            note=doc.get("note") or "",
+            has_receipt=bool(doc.get("has_receipt")),
+            receipt_preview=doc.get("receipt_preview") or "",
+            is_tax_deductible=bool(doc.get("is_tax_deductible")),
+            tax_category=doc.get("tax_category") or "",
+            created_at=_native(doc.get("created_at")),
+        )
+
+    def as_dict(self) -> dict:
+        return {f.name: getattr(self, f.name) for f in dataclasses.fields(self)}
+
+
+@dataclass(slots=True)
+class IncomeRecord:
+    id: str
+    amount: float
+    amount_minor: int
+    source: str
+    date: Optional[datetime.datetime]
+    currency: str = ""
+    created_at: Optional[datetime.datetime] = None
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "IncomeRecord":
+        return cls(
+            id=str(doc["_id"]),
+            amount=doc.get("amount") or 0.0,
+            amount_minor=money.minor_of(doc),
+            source=doc.get("source") or "",
+            date=_native(doc.get("date")),
+            currency=doc.get("currency") or "",
+            created_at=_native(doc.get("created_at")),
+        )
+
+    def as_dict(self) -> dict:
+        return {f.name: getattr(self, f.name) for f in dataclasses.fields(self)}
+
+
+def to_frame(records: list) -> pd.DataFrame:
+    """Records as a DataFrame; `date`/`created_at` become datetime64 without parsing"""
+    if not records:
+        return pd.DataFrame()
+    df = pd.DataFrame([r.as_dict() for r in records])
+    for column in ("date", "created_at"):
+        df[column] = pd.to_datetime(df[column])
+    return df
+
+
+# -----------------------------
+# Presentation
+# -----------------------------
+def format_date(d, fmt: str=DATE_FORMAT) -> str:
+    """Display text for a record date; empty for missing values"""
+    if d is None or d is pd.NaT:
+        return ""
+    if hasattr(d, "strftime"):
+        return d.strftime(fmt)
+    return str(d)
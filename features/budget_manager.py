@@ -1,4 +1,6 @@
 from database import mongo_manager
+from analytics import frame_cache
+from utils import money
 import pandas as pd
 import datetime
 import calendar
@@ -11,6 +13,9 @@ class BudgetManager:
     def set_budget(self, category: str, monthly_limit: float):
         mongo_manager.set_budget(self.user_id, category, monthly_limit)
 
+    def delete_budget(self, category: str) -> bool:
+        return mongo_manager.delete_budget(self.user_id, category)
+
     def list_budgets_df(self) -> pd.DataFrame:
         rows = mongo_manager.list_budgets(self.user_id)
         if not rows:
@@ -20,27 +25,18 @@ class BudgetManager:
 
     def budget_status_summary(self) -> str:
         today = datetime.date.today()
-        start = today.replace(day=1)
+        start = datetime.datetime(today.year, today.month, 1)
         last_day = calendar.monthrange(today.year, today.month)[1]
-        end = today.replace(day=last_day)
-        # sum expenses between start and end
-        expenses = mongo_manager.list_expenses(self.user_id, limit=1000)
-        spent = {}
-        for e in expenses:
-            # e['date'] might be iso string
-            d = e.get('date')
-            try:
-                ddate = datetime.datetime.fromisoformat(d) if isinstance(d, str) else d
-            except Exception:
-                ddate = None
-            if ddate and start <= ddate.date() <= end:
-                amt = float(e.get('amount', 0.0))
-                spent[e.get('category', 'Other')] = spent.get(e.get('category', 'Other'), 0.0) + amt
+        end = start + datetime.timedelta(days=last_day)
+        # this month's exact per-category totals from the cached columns
+        month = frame_cache.expenses(self.user_id, start, end)
+        by_cat = month.groupby("category", observed=True)["amount_minor"].sum()
+        spent = {cat: money.to_float(minor) for cat, minor in by_cat.items()}
         budgets = mongo_manager.list_budgets(self.user_id)
         lines = []
         for b in budgets:
             cat = b.get('category')
-            limit = float(b.get('monthly_limit', 0.0))
+            limit = float(money.to_decimal(b.get('monthly_limit', 0.0)))
             s = spent.get(cat, 0.0)
             pct = 0 if limit == 0 else (s / limit) * 100
             lines.append(f"{cat}: {s:.2f}/{limit:.2f} ({pct:.0f}%)")
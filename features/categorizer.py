@@ -0,0 +1,225 @@
+# features/categorizer.py
+# Per-user expense categorizer trained on the user's own history
+# (note + receipt text -> category). Hashed TF-IDF features feed a
+# multinomial naive Bayes model, which is linear in the features, can be
+# updated one expense at a time and predicts by touching only the few
+# non-zero columns, so a suggestion costs well under a millisecond.
+# Models are cached in memory and persisted to MongoDB. New expenses are
+# learned in place; saves are batched on a timer off the request path, and
+# a model loaded from MongoDB first catches up on expenses created after
+# its `trained_through`, so writes from other processes are never missed.
+import io
+import re
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from database import mongo_manager
+
+N_FEATURES = 2 ** 14
+ALPHA = 0.1                # Laplace smoothing
+RECEIPT_WEIGHT = 0.5       # receipt OCR text is noisier than the note
+MIN_CONFIDENCE = 0.5
+MAX_CACHED_USERS = 128
+SAVE_DELAY_SECONDS = 30    # batch model writes instead of saving per expense
+
+TOKEN_RE = re.compile(r"[a-z]{2,}|\d+")
+
+
+def _hash(token: str) -> int:
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(token.encode("utf-8")) % N_FEATURES
+
+
+def featurize(note: str = "", receipt_text: str = ""):
+    """Sparse (indices, weights) vector of unigrams and bigrams, log-scaled tf."""
+    weights = {}
+    for text, w in ((note, 1.0), (receipt_text, RECEIPT_WEIGHT)):
+        tokens = TOKEN_RE.findall(str(text or "").lower())
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for g in grams:
+            i = _hash(g)
+            weights[i] = weights.get(i, 0.0) + w
+    if not weights:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    idx = np.fromiter(weights.keys(), dtype=np.int64, count=len(weights))
+    tf = np.log1p(np.fromiter(weights.values(), dtype=np.float64, count=len(weights)))
+    return idx, tf
+
+
+class CategoryClassifier:
+    def __init__(self):
+        self.classes = []
+        self.feature_counts = np.zeros((0, N_FEATURES), dtype=np.float32)
+        self.class_totals = np.zeros(0)
+        self.class_docs = np.zeros(0)
+        self.doc_freq = np.zeros(N_FEATURES, dtype=np.float32)
+        self.n_docs = 0
+        self.trained_through = None  # created_at of the newest expense learned
+        self._lock = threading.Lock()
+
+    def _class_index(self, category: str) -> int:
+        if category not in self.classes:
+            self.classes.append(category)
+            self.feature_counts = np.vstack([self.feature_counts, np.zeros((1, N_FEATURES), dtype=np.float32)])
+            self.class_totals = np.append(self.class_totals, 0.0)
+            self.class_docs = np.append(self.class_docs, 0.0)
+        return self.classes.index(category)
+
+    def partial_fit(self, note: str, receipt_text: str, category: str):
+        if not category:
+            return
+        idx, tf = featurize(note, receipt_text)
+        if idx.size == 0:
+            return
+        with self._lock:
+            c = self._class_index(category)
+            self.feature_counts[c, idx] += tf
+            self.class_totals[c] += tf.sum()
+            self.class_docs[c] += 1
+            self.doc_freq[idx] += 1
+            self.n_docs += 1
+
+    def predict(self, note: str, receipt_text: str = ""):
+        """Return (category, confidence) or None if the model can't tell."""
+        idx, tf = featurize(note, receipt_text)
+        with self._lock:
+            if idx.size == 0 or len(self.classes) < 2:
+                return None
+            idf = np.log((self.n_docs + 1) / (self.doc_freq[idx] + 1)) + 1
+            x = tf * idf
+            log_theta = np.log(self.feature_counts[:, idx] + ALPHA) - np.log(self.class_totals + ALPHA * N_FEATURES)[:, None]
+            scores = np.log(self.class_docs / self.class_docs.sum()) + log_theta @ x
+        probs = np.exp(scores - scores.max())
+        probs /= probs.sum()
+        best = int(np.argmax(probs))
+        return self.classes[best], float(probs[best])
+
+    def learn(self, doc: dict):
+        """Learn one stored expense unless it is older than trained_through"""
+        created_at = doc.get("created_at")
+        if self.trained_through and created_at and created_at <= self.trained_through:
+            return
+        self.partial_fit(doc.get("note", ""), doc.get("receipt_text", ""), doc.get("category"))
+        self.trained_through = created_at or self.trained_through
+
+    # --- persistence ---
+    def to_state(self) -> dict:
+        buf = io.BytesIO()
+        with self._lock:
+            np.savez_compressed(
+                buf,
+                feature_counts=self.feature_counts,
+                class_totals=self.class_totals,
+                class_docs=self.class_docs,
+                doc_freq=self.doc_freq,
+            )
+            return {
+                "classes": list(self.classes),
+                "arrays": buf.getvalue(),
+                "n_docs": self.n_docs,
+                "trained_through": self.trained_through,
+            }
+
+    @classmethod
+    def from_state(cls, state: dict):
+        model = cls()
+        arrays = np.load(io.BytesIO(state["arrays"]))
+        model.classes = list(state.get("classes", []))
+        model.feature_counts = arrays["feature_counts"]
+        model.class_totals = arrays["class_totals"]
+        model.class_docs = arrays["class_docs"]
+        model.doc_freq = arrays["doc_freq"]
+        model.n_docs = int(state.get("n_docs", 0))
+        model.trained_through = state.get("trained_through")
+        return model
+
+
+_models = OrderedDict()
+_models_lock = threading.Lock()
+_dirty = set()       # users whose cached model changed since the last save
+_save_timer = None
+
+
+def _train_from_history(user_id: str) -> CategoryClassifier:
+    model = CategoryClassifier()
+    for doc in mongo_manager.iter_expenses_for_search(user_id):
+        model.partial_fit(doc.get("note", ""), doc.get("receipt_text", ""), doc.get("category"))
+    model.trained_through = mongo_manager.get_latest_expense_created_at(user_id)
+    return model
+
+
+def get_classifier(user_id: str) -> CategoryClassifier:
+    uid = str(user_id)
+    with _models_lock:
+        model = _models.get(uid)
+        if model is not None:
+            _models.move_to_end(uid)
+            return model
+    state = mongo_manager.load_category_model(uid)
+    if state:
+        model = CategoryClassifier.from_state(state)
+        caught_up = 0
+        for doc in mongo_manager.iter_expenses_for_search(uid, created_after=model.trained_through):
+            model.learn(doc)
+            caught_up += 1
+        if caught_up:
+            _schedule_save(uid)
+    else:
+        model = _train_from_history(uid)
+        _schedule_save(uid)
+    with _models_lock:
+        _models[uid] = _models.get(uid, model)
+        while len(_models) > MAX_CACHED_USERS:
+            _models.popitem(last=False)
+        return _models[uid]
+
+
+def suggest_category(user_id: str, note: str, receipt_text: str = "", min_confidence: float = MIN_CONFIDENCE):
+    """(category, confidence) when the user's model is confident enough, else None."""
+    try:
+        result = get_classifier(user_id).predict(note, receipt_text)
+    except Exception as e:
+        logging.error(f"suggest_category error: {e}")
+        return None
+    if result and result[1] >= min_confidence:
+        return result
+    return None
+
+
+def _schedule_save(user_id: str):
+    global _save_timer
+    with _models_lock:
+        _dirty.add(user_id)
+        if _save_timer is None:
+            _save_timer = threading.Timer(SAVE_DELAY_SECONDS, flush)
+            _save_timer.daemon = True
+            _save_timer.start()
+
+
+def flush():
+    """Persist every cached model changed since the last save"""
+    global _save_timer
+    with _models_lock:
+        pending = [(uid, _models.get(uid)) for uid in _dirty]
+        _dirty.clear()
+        _save_timer = None
+    for uid, model in pending:
+        # An evicted model is not lost: the next load catches up from trained_through
+        if model is not None:
+            mongo_manager.save_category_model(uid, model.to_state())
+
+
+@mongo_manager.register_write_listener
+def _on_write(event: str, user_id: str, doc: dict):
+    if event != "expense_added":
+        return
+    with _models_lock:
+        model = _models.get(user_id)
+    if model is None:
+        return  # not loaded here: the next load catches up from MongoDB
+    model.learn(doc)
+    _schedule_save(user_id)
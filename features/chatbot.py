@@ -1,5 +1,7 @@
+import threading
 import streamlit as st
 from analytics.ai_insights import AIInsights
+from ui.components import stop_button, was_stopped
 
 class ChatBot:
     def __init__(self, user_id):
@@ -8,6 +10,7 @@ class ChatBot:
         self.chat_open_key = f"chat_open_{user_id}"
         self.input_key = f"chat_input_{user_id}"
         self.clear_input_key = f"clear_input_{user_id}"
+        self.cancel_key = f"chat_cancel_{user_id}"
         self.ai = AIInsights()
 
         if self.chat_history_key not in st.session_state:
@@ -69,6 +72,8 @@ class ChatBot:
             st.session_state[self.clear_input_key] = False
 
         user_input = st.text_input("Type your question here:", key=self.input_key, value=input_value)
+        if was_stopped(self.cancel_key):
+            st.info("Stopped.")
 
         if st.button("Ask", key="ask_btn"):
             question = st.session_state[self.input_key].strip()
@@ -78,10 +83,18 @@ class ChatBot:
                 history = st.session_state[self.chat_history_key]
                 last_user_msg = next((msg for msg in history if msg[0] == "User"), None)
                 if last_user_msg is None or last_user_msg[1] != question:
-                    with st.spinner("Thinking..."):
-                        answer, error = self.ai.analyze(self.user_id, question)
-                        if error:
-                            answer = f"Error: {error}"
+                    cancel = threading.Event()
+                    stream, error = self.ai.stream_analyze(self.user_id, question, cancel_event=cancel)
+                    if error:
+                        answer = f"Error: {error}"
+                    else:
+                        # Show tokens as they arrive; the full text is returned at the end
+                        st.markdown(f"**User:**  \n{question}")
+                        st.markdown("**Bot:**")
+                        stop_button(self.cancel_key, cancel)
+                        answer = st.write_stream(stream)
+                        if not isinstance(answer, str):
+                            answer = "".join(str(part) for part in answer)
                     # Insert at beginning for latest at top
                     history.insert(0, ("Bot", answer))
                     history.insert(0, ("User", question))
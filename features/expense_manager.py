@@ -1,4 +1,7 @@
 from database import mongo_manager
+from database import records
+from features import search_index
+from features import categorizer
 import pandas as pd
 from datetime import datetime, date as dt_date
 
@@ -7,7 +10,7 @@ class ExpenseManager:
         self.user_id = user_id
         self.currency = currency
 
-    def add_expense(self, amount: float, category: str, note: str, date, currency_code: str, receipt_text: str | None = None):
+    def add_expense(self, amount: float, category: str, note: str, date, currency_code: str, receipt_text: str | None = None, receipt_image: bytes | None = None, receipt_thumbnail: bytes | None = None):
         # Convert date to datetime.datetime
         if isinstance(date, dt_date) and not isinstance(date, datetime):
             date = datetime.combine(date, datetime.min.time())
@@ -18,21 +21,40 @@ class ExpenseManager:
             note=note,
             date=date,
             currency=currency_code,
-            receipt_text=receipt_text or ""
+            receipt_text=receipt_text or "",
+            receipt_image=receipt_image,
+            receipt_thumbnail=receipt_thumbnail
         )
         return True
 
     def list_expenses_df(self) -> pd.DataFrame:
-        rows = mongo_manager.list_expenses(self.user_id)
-        if not rows:
-            return pd.DataFrame()
-        df = pd.DataFrame(rows)
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date']).dt.date
-        if 'amount' in df.columns and self.currency:
+        df = records.to_frame(mongo_manager.list_expenses(self.user_id))
+        if df.empty:
+            return df
+        if self.currency:
             df['amount_in_base'] = df.apply(lambda r: self.currency.convert(r['amount'], r.get('currency', self.currency.base)), axis=1)
         return df
+    def list_page(self, page: int = 1, per_page: int = 50):
+        """One page of expenses (newest first) and the total count"""
+        page = max(1, page)
+        rows = mongo_manager.list_expenses(self.user_id, limit=per_page, skip=(page - 1) * per_page)
+        return rows, mongo_manager.count_expenses(self.user_id)
+
     def delete_expense(self, expense_id: str) -> bool:
         """Delete an expense by ID"""
         from database import mongo_manager
-        return mongo_manager.delete_expense(expense_id, self.user_id)
\ No newline at end of file
+        return mongo_manager.delete_expense(expense_id, self.user_id)
+
+    def get_receipt(self, expense_id: str, include_image: bool = False):
+        """Load an expense's receipt on demand"""
+        return mongo_manager.get_expense_receipt(expense_id, self.user_id, include_image=include_image)
+
+    def search(self, query: str, page: int = 1, per_page: int = 20):
+        """Ranked full-text search over note, category, tax category and receipt text"""
+        return search_index.search_expenses(self.user_id, query, page=page, per_page=per_page)
+
+    def suggest_category(self, note: str, receipt_text: str = ""):
+        """Local (category, confidence) suggestion from the user's own history, or None"""
+        if not (note or receipt_text):
+            return None
+        return categorizer.suggest_category(self.user_id, note, receipt_text)
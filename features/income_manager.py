@@ -1,4 +1,5 @@
 from database import mongo_manager
+from database import records
 import pandas as pd
 
 class IncomeManager:
@@ -11,12 +12,19 @@ class IncomeManager:
         return True
 
     def list_income_df(self) -> pd.DataFrame:
-        rows = mongo_manager.list_income(self.user_id)
-        if not rows:
-            return pd.DataFrame()
-        df = pd.DataFrame(rows)
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date']).dt.date
-        if 'amount' in df.columns and self.currency:
+        df = records.to_frame(mongo_manager.list_income(self.user_id))
+        if df.empty:
+            return df
+        if self.currency:
             df['amount_in_base'] = df.apply(lambda r: self.currency.convert(r['amount'], r.get('currency', self.currency.base)), axis=1)
         return df
+
+    def list_page(self, page: int = 1, per_page: int = 50):
+        """One page of income (newest first) and the total count"""
+        page = max(1, page)
+        rows = mongo_manager.list_income(self.user_id, limit=per_page, skip=(page - 1) * per_page)
+        return rows, mongo_manager.count_income(self.user_id)
+
+    def delete_income(self, income_id: str) -> bool:
+        """Delete an income record by ID"""
+        return mongo_manager.delete_income(income_id, self.user_id)
@@ -25,6 +25,22 @@ class OCRProcessor:
         except Exception:
             return ""
     
+    def make_thumbnail(self, file, max_size=(256, 256)) -> bytes:
+        """Return a small JPEG preview of the receipt image"""
+        try:
+            if hasattr(file, "read"):
+                file.seek(0)
+                img = Image.open(file)
+            else:
+                img = Image.open(io.BytesIO(file))
+            img = img.convert("RGB")
+            img.thumbnail(max_size)
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=70)
+            return buf.getvalue()
+        except Exception:
+            return b""
+    
     def parse_receipt_with_gemini(self, file, api_key: str) -> dict:
         """
         Parse receipt image using Gemini Vision API and extract expense details.
@@ -34,9 +50,6 @@ class OCRProcessor:
             return None
         
         try:
-            # Configure Gemini
-            genai.configure(api_key=api_key)
-            
             # Read file to bytes
             if hasattr(file, "read"):
                 # Reset file pointer to beginning if already read
@@ -75,18 +88,14 @@ Rules:
 Return ONLY valid JSON, no additional text.
 """
             
-            # Use Gemini Vision model
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            
-            # Generate response with image
-            response = model.generate_content([prompt, img])
+            # Generate response with image (re-uploads of the same receipt hit the cache)
+            from analytics.llm_gateway import get_gateway
+            text = get_gateway().generate(api_key, 'gemini-2.5-flash', [prompt, img]).strip()
             
             # Parse JSON from response
             import json
             import re
             
-            text = response.text.strip()
-            
             # Try to extract JSON from markdown code blocks first
             json_match = re.search(r'```json\s*(\{.*?\})\s*```', text, re.DOTALL)
             if not json_match:
@@ -0,0 +1,190 @@
+# features/recurring_scheduler.py
+# Turns subscriptions into real expenses and rolls recurring bills forward.
+#
+# Each subscription keeps a `materialized_through` watermark, so a run only
+# generates occurrences after it. Expenses are bulk-upserted on
+# (user_id, recurring_key), which makes re-runs and overlapping workers
+# harmless. Users are processed in batches. Past occurrences are only
+# generated when the user asked for them (add_subscription(backfill=True)),
+# and never further back than RECURRING_MAX_BACKFILL_DAYS.
+#
+#   python -m features.recurring_scheduler            # loop forever
+#   python -m features.recurring_scheduler --once     # single pass
+import logging
+import argparse
+import datetime
+import threading
+
+import pandas as pd
+
+from config import settings
+from database import mongo_manager
+from utils import money
+
+FREQUENCIES = {
+    "weekly": pd.DateOffset(weeks=1),
+    "monthly": pd.DateOffset(months=1),
+    "yearly": pd.DateOffset(years=1),
+}
+DEFAULT_INTERVAL = 3600
+
+
+def occurrences(start, frequency: str, after=None, through=None) -> list:
+    """
+    Due dates of a schedule starting at `start`, strictly after `after` and
+    up to `through` (inclusive). Monthly/yearly dates are anchored on the
+    start date and clamped to month end (Jan 31 -> Feb 28 -> Mar 31).
+    """
+    offset = FREQUENCIES.get(frequency)
+    if offset is None or start is None:
+        return []
+    start = pd.Timestamp(start)
+    through = pd.Timestamp(through or datetime.datetime.utcnow())
+    if start > through:
+        return []
+    # Upper bound on the number of periods between start and through
+    span_days = (through - start).days
+    per_period = {"weekly": 7, "monthly": 28, "yearly": 365}[frequency]
+    n = span_days // per_period + 2
+    k = pd.RangeIndex(n)
+    if frequency == "weekly":
+        dates = start + pd.to_timedelta(k * 7, unit="D")
+    else:
+        months = k * (12 if frequency == "yearly" else 1)
+        dates = pd.DatetimeIndex([start + pd.DateOffset(months=int(m)) for m in months])
+    mask = dates <= through
+    if after is not None:
+        mask &= dates > pd.Timestamp(after)
+    return [d.to_pydatetime() for d in dates[mask]]
+
+
+def nth_occurrence(start, frequency: str, n: int):
+    """The n-th due date after `start`, anchored like occurrences()"""
+    if frequency not in FREQUENCIES or start is None:
+        return None
+    start = pd.Timestamp(start)
+    if frequency == "weekly":
+        return (start + pd.Timedelta(days=7 * n)).to_pydatetime()
+    months = n * (12 if frequency == "yearly" else 1)
+    return (start + pd.DateOffset(months=months)).to_pydatetime()
+
+
+def _subscription_expenses(sub: dict, today: datetime.datetime):
+    after = sub.get("materialized_through")
+    floor = today - datetime.timedelta(days=settings.RECURRING_MAX_BACKFILL_DAYS)
+    start = sub.get("start_date")
+    if (after is None or after < floor) and start is not None and start < floor:
+        logging.info(f"subscription {sub['_id']}: not backfilling occurrences before {floor:%Y-%m-%d}")
+        after = floor
+    dates = occurrences(start, sub.get("frequency"), after, today)
+    now = datetime.datetime.utcnow()
+    minor = money.minor_of(sub)
+    docs = [{
+        "user_id": sub["user_id"],
+        "amount": money.to_float(minor),
+        "amount_minor": minor,
+        "category": sub.get("category", "Other"),
+        "note": sub.get("name", "Subscription"),
+        "date": d,
+        "currency": sub.get("currency", "USD"),
+        "has_receipt": False,
+        "is_tax_deductible": False,
+        "tax_category": "",
+        "subscription_id": str(sub["_id"]),
+        "recurring_key": f"sub:{sub['_id']}:{d:%Y-%m-%d}",
+        "created_at": now,
+    } for d in dates]
+    return docs, (dates[-1] if dates else None)
+
+
+def _next_bill(bill: dict):
+    # Roll from the series start, not the previous due date, so a bill due
+    # on the 31st comes back to the 31st after a short month
+    start = bill.get("series_start") or bill.get("due_date")
+    index = bill.get("series_index", 0) + 1
+    due = nth_occurrence(start, bill.get("frequency"), index)
+    if due is None:
+        return None
+    series = bill.get("series_id") or str(bill["_id"])
+    return {
+        "source_id": bill["_id"],
+        "user_id": bill["user_id"],
+        "title": bill.get("title"),
+        "amount": money.to_float(money.minor_of(bill)),
+        "amount_minor": money.minor_of(bill),
+        "due_date": due,
+        "category": bill.get("category"),
+        "notes": bill.get("notes", ""),
+        "frequency": bill.get("frequency"),
+        "series_id": series,
+        "series_start": start,
+        "series_index": index,
+        "recurring_key": f"bill:{series}:{due:%Y-%m-%d}",
+        "is_paid": False,
+        "created_at": datetime.datetime.utcnow(),
+    }
+
+
+def run_once(batch_size: int = 200, today: datetime.datetime = None) -> dict:
+    """Process every user once; returns counters."""
+    today = today or datetime.datetime.utcnow()
+    stats = {"users": 0, "expenses_created": 0, "bills_created": 0, "subscriptions_failed": 0}
+    for user_ids in mongo_manager.iter_user_id_batches(batch_size):
+        stats["users"] += len(user_ids)
+
+        docs, watermarks = [], {}
+        for sub in mongo_manager.list_active_subscriptions_for(user_ids):
+            sub_docs, through = _subscription_expenses(sub, today)
+            if sub_docs:
+                docs.extend(sub_docs)
+                watermarks[sub["_id"]] = through
+        created, failed_keys = mongo_manager.upsert_recurring_expenses(docs)
+        stats["expenses_created"] += created
+        # Only advance watermarks after the expenses are safely written:
+        # a subscription with any unwritten occurrence is retried next pass
+        failed_subs = {d["subscription_id"] for d in docs if d["recurring_key"] in failed_keys}
+        stats["subscriptions_failed"] += len(failed_subs)
+        mongo_manager.set_subscription_watermarks({sid: t for sid, t in watermarks.items() if str(sid) not in failed_subs})
+
+        # A bill may be several periods behind: keep rolling until caught up.
+        # `seen` stops the loop if a failed write leaves sources unmarked.
+        seen = set()
+        while True:
+            bills = [b for b in mongo_manager.list_bills_to_roll_forward(user_ids, today) if b["_id"] not in seen]
+            seen.update(b["_id"] for b in bills)
+            next_bills = [b for b in (_next_bill(b) for b in bills) if b]
+            if not next_bills:
+                break
+            stats["bills_created"] += mongo_manager.roll_bills_forward(next_bills)
+    return stats
+
+
+def run_forever(interval: int = DEFAULT_INTERVAL, batch_size: int = 200, stop_event: threading.Event = None):
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            stats = run_once(batch_size=batch_size)
+            logging.info(f"recurring scheduler: {stats}")
+        except Exception as e:
+            logging.error(f"recurring scheduler error: {e}")
+        stop_event.wait(interval)
+
+
+def start_background_worker(interval: int = DEFAULT_INTERVAL) -> threading.Event:
+    """Start the scheduler in a daemon thread; set the returned event to stop it."""
+    stop_event = threading.Event()
+    threading.Thread(target=run_forever, kwargs={"interval": interval, "stop_event": stop_event}, daemon=True, name="recurring-scheduler").start()
+    return stop_event
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialize subscriptions and roll recurring bills forward")
+    parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL, help="seconds between passes")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.once:
+        print(run_once(batch_size=args.batch_size))
+    else:
+        run_forever(interval=args.interval, batch_size=args.batch_size)
@@ -1,45 +1,42 @@
 # gamifications.py
 from database import mongo_manager
+from analytics import frame_cache
+from utils import money
+import numpy as np
 import pandas as pd
-import datetime
 
 class Achievements:
     def _evaluate(self, user_id: str):
         badges = []
         
-        # Get expenses and income
-        exps = mongo_manager.list_expenses(user_id, limit=1000)
-        incs = mongo_manager.list_income(user_id, limit=1000)
+        # Get expenses and income (cached columnar frames)
+        exps = frame_cache.expenses(user_id)
+        incs = frame_cache.income(user_id)
         buds = mongo_manager.list_budgets(user_id)
+        n_exps = len(exps)
 
         # --- Milestone Badges ---
-        if exps and len(exps) >= 1:
+        if n_exps >= 1:
             badges.append(("🎯 First Step", "Logged your first expense", "💼"))
-        if exps and len(exps) >= 5:
+        if n_exps >= 5:
             badges.append(("🌱 Getting Started", "Logged 5 expenses", "📝"))
-        if exps and len(exps) >= 10:
+        if n_exps >= 10:
             badges.append(("⭐ Active Tracker", "Logged 10 expenses", "📊"))
-        if exps and len(exps) >= 25:
+        if n_exps >= 25:
             badges.append(("🎖️ Dedicated User", "Logged 25 expenses", "📈"))
-        if exps and len(exps) >= 50:
+        if n_exps >= 50:
             badges.append(("🏆 Expense Master", "Logged 50+ expenses", "💯"))
-        if exps and len(exps) >= 100:
+        if n_exps >= 100:
             badges.append(("👑 Legendary Tracker", "Logged 100+ expenses", "🌟"))
 
         # --- Streak Badges ---
-        if exps:
-            dates = sorted({e.get('date')[:10] for e in exps if e.get('date')})
-            if dates:
-                streak = 1
-                best_streak = 1
-                parsed_dates = [datetime.date.fromisoformat(d) for d in dates if d]
-                for i in range(1, len(parsed_dates)):
-                    if (parsed_dates[i] - parsed_dates[i-1]).days == 1:
-                        streak += 1
-                        best_streak = max(best_streak, streak)
-                    else:
-                        streak = 1
-                
+        if n_exps:
+            days = np.unique(exps["date"].values.astype("datetime64[D]").astype(np.int64))
+            if len(days):
+                # Longest run of consecutive days: split wherever the gap isn't 1
+                runs = np.split(days, np.flatnonzero(np.diff(days) != 1) + 1)
+                best_streak = max(len(r) for r in runs)
+
                 if best_streak >= 2:
                     badges.append(("🔥 Hot Start", "2-day expense streak", "💪"))
                 if best_streak >= 3:
@@ -52,8 +49,8 @@ class Achievements:
                     badges.append(("🔥🔥🔥🔥🔥 Perfectionist", "30-day expense streak", "✨"))
 
         # --- Spending Badges ---
-        if exps:
-            total_exp = sum(e.get("amount", 0) for e in exps)
+        if n_exps:
+            total_exp = money.frame_total(exps)
             
             if total_exp >= 1000:
                 badges.append(("💰 Thousand Club", f"Spent ₹{total_exp:,.0f}+", "💵"))
@@ -65,7 +62,7 @@ class Achievements:
                 badges.append(("👑 Premium Member", f"Spent ₹{total_exp:,.0f}+", "💴"))
             
             # Single big expense
-            max_exp = max((e.get("amount", 0) for e in exps), default=0)
+            max_exp = money.to_float(exps["amount_minor"].max())
             if max_exp >= 1000:
                 badges.append(("💳 Large Purchase", f"Single expense ₹{max_exp:,.0f}+", "💸"))
             if max_exp >= 5000:
@@ -93,8 +90,8 @@ class Achievements:
                 badges.append(("✅ Budget Hero", "All budgets under control", "🎯"))
 
         # --- Income Badges ---
-        if incs:
-            total_inc = sum(i.get("amount", 0) for i in incs)
+        if len(incs):
+            total_inc = money.frame_total(incs)
             income_count = len(incs)
             
             if income_count >= 1:
@@ -104,35 +101,35 @@ class Achievements:
             if total_inc >= 50000:
                 badges.append(("🏅 Wealth Builder", f"Total income ₹{total_inc:,.0f}+", "💸"))
             
-            max_inc = max((i.get("amount", 0) for i in incs), default=0)
+            max_inc = money.to_float(incs["amount_minor"].max())
             if max_inc >= 10000:
                 badges.append(("🎯 Big Income", f"Single income ₹{max_inc:,.0f}+", "💰"))
 
         # --- Multi-Currency Badge ---
-        currencies = set(e.get("currency", "") for e in exps if e.get("currency"))
-        if len(currencies) > 1:
-            badges.append(("🌍 World Traveler", f"Used {len(currencies)} currencies", "✈️"))
+        currencies = exps["currency"].nunique()
+        if currencies > 1:
+            badges.append(("🌍 World Traveler", f"Used {currencies} currencies", "✈️"))
 
         # --- Category Diversity ---
-        if exps:
-            categories = set(e.get("category", "") for e in exps if e.get("category"))
-            if len(categories) >= 3:
-                badges.append(("🎪 Diversified Spender", f"{len(categories)} categories", "🎨"))
-            if len(categories) >= 6:
-                badges.append(("🌈 Complete Coverage", f"{len(categories)} categories", "🎯"))
+        if n_exps:
+            categories = exps["category"].nunique()
+            if categories >= 3:
+                badges.append(("🎪 Diversified Spender", f"{categories} categories", "🎨"))
+            if categories >= 6:
+                badges.append(("🌈 Complete Coverage", f"{categories} categories", "🎯"))
 
         # --- Weekly Consistency ---
-        if exps:
-            weeks = set(e.get("date")[:7] for e in exps if e.get("date"))
-            if len(weeks) >= 2:
-                badges.append(("📅 Consistent Logger", f"{len(weeks)} weeks active", "📝"))
-            if len(weeks) >= 4:
-                badges.append(("📆 Regular Tracker", f"{len(weeks)} weeks active", "📊"))
-            if len(weeks) >= 8:
-                badges.append(("📅💯 Long-term User", f"{len(weeks)} weeks active", "🌟"))
+        if n_exps:
+            weeks = len(np.unique(exps["date"].values.astype("datetime64[M]")))
+            if weeks >= 2:
+                badges.append(("📅 Consistent Logger", f"{weeks} weeks active", "📝"))
+            if weeks >= 4:
+                badges.append(("📆 Regular Tracker", f"{weeks} weeks active", "📊"))
+            if weeks >= 8:
+                badges.append(("📅💯 Long-term User", f"{weeks} weeks active", "🌟"))
 
         # --- Receipt Master (OCR feature) ---
-        receipt_count = sum(1 for e in exps if e.get("receipt_text"))
+        receipt_count = int(exps["has_receipt"].sum()) if n_exps else 0
         if receipt_count >= 1:
             badges.append(("📷 Photo Finish", f"{receipt_count} receipt(s) scanned", "📸"))
         if receipt_count >= 5:
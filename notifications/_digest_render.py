@@ -0,0 +1,73 @@
+# notifications/_digest_render.py
+# Digest rendering, run inside the digest process pool. Works only on the
+# plain summary dict so worker processes never touch the database.
+import io
+import csv
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import LETTER
+
+
+def render_csv(summary: dict) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["period", "metric", "category", "amount"])
+    writer.writerow([summary["period"], "income", "", f"{summary['income']:.2f}"])
+    writer.writerow([summary["period"], "expenses", "", f"{summary['expenses']:.2f}"])
+    for category, amount in summary["categories"]:
+        writer.writerow([summary["period"], "category", category, f"{amount:.2f}"])
+    return out.getvalue().encode("utf-8")
+
+
+def render_pdf(summary: dict) -> bytes:
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=LETTER)
+    width, height = LETTER
+    margin = 50
+    y = height - margin
+
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(margin, y, f"Monthly Summary - {summary['period']}")
+    y -= 22
+    c.setFont("Helvetica", 11)
+    c.drawString(margin, y, f"Prepared for {summary.get('name') or 'you'}")
+    y -= 30
+
+    balance = summary["income"] - summary["expenses"]
+    for label, value in (("Income", summary["income"]), ("Expenses", summary["expenses"]), ("Balance", balance)):
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(margin, y, label)
+        c.setFont("Helvetica", 12)
+        c.drawRightString(width - margin, y, f"{value:,.2f}")
+        y -= 18
+    c.setFont("Helvetica", 10)
+    c.drawString(margin, y, f"{summary['expense_count']} expenses, {summary['income_count']} income records")
+    y -= 30
+
+    if summary["categories"]:
+        c.setFont("Helvetica-Bold", 13)
+        c.drawString(margin, y, "Spending by category")
+        y -= 20
+        top = max(a for _, a in summary["categories"]) or 1
+        bar_max = width - 2 * margin - 220
+        for category, amount in summary["categories"]:
+            if y < margin:
+                c.showPage()
+                y = height - margin
+            c.setFont("Helvetica", 10)
+            c.drawString(margin, y, str(category)[:28])
+            c.setFillGray(0.55)
+            c.rect(margin + 150, y - 2, bar_max * amount / top, 10, stroke=0, fill=1)
+            c.setFillGray(0)
+            c.drawRightString(width - margin, y, f"{amount:,.2f}")
+            y -= 16
+
+    c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def render(summary: dict, fmt: str) -> tuple:
+    """(user_id, bytes) so results can be matched back in any order"""
+    data = render_pdf(summary) if fmt == "pdf" else render_csv(summary)
+    return summary["user_id"], data
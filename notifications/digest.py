@@ -0,0 +1,182 @@
+# notifications/digest.py
+# Monthly digest for every user, as a batch command.
+#
+#   python -m notifications.digest                       # last month, PDF
+#   python -m notifications.digest --period 2026-09 --format csv --workers 4
+#
+# Users are read with one cursor in _id order. Each batch builds its
+# summaries from aggregation queries (threads, I/O bound), renders them in
+# a process pool (CPU bound) and mails them over one SMTP session. After
+# every batch the last user id is checkpointed in `digest_runs`, and each
+# delivered digest is recorded in `digest_sends`, so an interrupted run
+# resumes where it stopped without re-mailing anyone. If the SMTP server
+# stays unreachable after a few retries the run stops at its checkpoint.
+import time
+import argparse
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from database import mongo_manager
+from notifications import _digest_render
+
+
+def previous_period(today: datetime.date = None) -> str:
+    today = today or datetime.date.today()
+    last_month = today.replace(day=1) - datetime.timedelta(days=1)
+    return last_month.strftime("%Y-%m")
+
+
+def period_bounds(period: str):
+    start = datetime.datetime.strptime(period, "%Y-%m")
+    end = (start + datetime.timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def build_summary(user: dict, period: str):
+    """Plain-dict summary for one user and month; None when there was no activity"""
+    uid = str(user["_id"])
+    start, end = period_bounds(period)
+    expenses = mongo_manager.get_totals_between(uid, "expenses", start, end)
+    income = mongo_manager.get_totals_between(uid, "income", start, end)
+    if not expenses["count"] and not income["count"]:
+        return None
+    categories = mongo_manager.get_category_totals_between(uid, start, end)
+    return {
+        "user_id": uid,
+        "name": user.get("name"),
+        "email": user.get("email"),
+        "period": period,
+        "expenses": float(expenses["total"]),
+        "expense_count": expenses["count"],
+        "income": float(income["total"]),
+        "income_count": income["count"],
+        "categories": sorted(((c or "Other", float(t)) for c, t in categories.items()), key=lambda x: -x[1]),
+    }
+
+
+SMTP_RETRIES = 3
+SMTP_BACKOFF_SECONDS = 5
+
+
+def _connect(email_handler, log):
+    """Open an SMTP session, backing off between attempts; None if it stays down"""
+    for attempt in range(SMTP_RETRIES):
+        try:
+            return email_handler.connect()
+        except Exception as e:
+            log(f"SMTP connect failed ({attempt + 1}/{SMTP_RETRIES}): {e}")
+            if attempt + 1 < SMTP_RETRIES:
+                time.sleep(SMTP_BACKOFF_SECONDS * 2 ** attempt)
+    return None
+
+
+def _next_batch(cursor, size: int) -> list:
+    batch = []
+    for user in cursor:
+        batch.append(user)
+        if len(batch) >= size:
+            break
+    return batch
+
+
+def run_digest(period: str = None, fmt: str = "pdf", workers: int = None, batch_size: int = 50,
+               dry_run: bool = False, restart: bool = False, email_handler=None, log=print) -> dict:
+    """Generate and send every user's digest for `period`; returns run stats"""
+    period = period or previous_period()
+    run_key = f"monthly:{period}:{fmt}"
+    if restart and not dry_run:
+        mongo_manager.clear_digest_run(run_key)
+    checkpoint = None if restart else mongo_manager.get_digest_checkpoint(run_key)
+    if checkpoint and checkpoint.get("finished_at"):
+        log(f"{run_key} already finished at {checkpoint['finished_at']:%Y-%m-%d %H:%M}; use --restart to run again")
+        return checkpoint.get("stats", {})
+
+    stats = dict((checkpoint or {}).get("stats") or {"users": 0, "sent": 0, "skipped": 0, "failed": 0})
+    last_user_id = (checkpoint or {}).get("last_user_id")
+    if last_user_id:
+        log(f"Resuming {run_key} after user {last_user_id}")
+    if email_handler is None and not dry_run:
+        from notifications.email_handler import EmailHandler
+        email_handler = EmailHandler()
+
+    subject = f"Your {datetime.datetime.strptime(period, '%Y-%m'):%B %Y} summary"
+    filename = f"summary-{period}.{fmt}"
+    subtype = "pdf" if fmt == "pdf" else "csv"
+    started = time.monotonic()
+    processed_this_run = 0
+
+    cursor = mongo_manager.iter_users(after_id=last_user_id)
+    with ThreadPoolExecutor(max_workers=8) as io_pool, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as cpu_pool:
+        while True:
+            users = _next_batch(cursor, batch_size)
+            if not users:
+                break
+            # Users mailed before a crash in the middle of this batch
+            already_sent = set() if dry_run else mongo_manager.get_digest_sent(run_key, [str(u["_id"]) for u in users])
+            pending = [u for u in users if str(u["_id"]) not in already_sent]
+            summaries = [s for s in io_pool.map(lambda u: build_summary(u, period), pending) if s]
+            by_user = {s["user_id"]: s for s in summaries}
+
+            server = None
+            if summaries and not dry_run:
+                server = _connect(email_handler, log)
+                if server is None:
+                    log(f"Stopping {run_key}: SMTP unavailable; rerun to resume from the last checkpoint")
+                    return stats
+            stats["sent"] += len(already_sent)
+            stats["skipped"] += len(pending) - len(summaries)
+            futures = [cpu_pool.submit(_digest_render.render, s, fmt) for s in summaries]
+            try:
+                for fut in as_completed(futures):
+                    try:
+                        uid, data = fut.result()
+                    except Exception as e:
+                        log(f"render failed: {e}")
+                        stats["failed"] += 1
+                        continue
+                    summary = by_user[uid]
+                    if not summary.get("email"):
+                        stats["skipped"] += 1
+                        continue
+                    if dry_run:
+                        stats["sent"] += 1
+                        continue
+                    body = f"Hi {summary.get('name') or 'there'},\n\nAttached is your summary for {period}."
+                    if email_handler.send_attachment(summary["email"], subject, body, data, filename, subtype, server=server):
+                        mongo_manager.mark_digest_sent(run_key, uid)
+                        stats["sent"] += 1
+                    else:
+                        stats["failed"] += 1
+            finally:
+                if server is not None:
+                    try:
+                        server.quit()
+                    except Exception:
+                        pass
+
+            stats["users"] += len(users)
+            processed_this_run += len(users)
+            last_user_id = str(users[-1]["_id"])
+            mongo_manager.save_digest_checkpoint(run_key, last_user_id, stats)
+            elapsed = time.monotonic() - started
+            stats["users_per_min"] = round(processed_this_run / elapsed * 60, 1) if elapsed else 0.0
+            log(f"{stats['users']} users · {stats['sent']} sent · {stats['skipped']} skipped · "
+                f"{stats['failed']} failed · {stats['users_per_min']} users/min")
+
+    mongo_manager.save_digest_checkpoint(run_key, last_user_id, stats, finished=True)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send every user's monthly digest")
+    parser.add_argument("--period", help="YYYY-MM (default: last month)")
+    parser.add_argument("--format", choices=["pdf", "csv"], default="pdf")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--dry-run", action="store_true", help="render but don't send")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+    result = run_digest(args.period, args.format, args.workers, args.batch_size, args.dry_run, args.restart)
+    print(f"✅ Done: {result}")
@@ -66,3 +66,33 @@ class EmailHandler:
         except Exception as e:
             print(f"❌ Failed to send email: {e}")
             return False
+
+    def send_attachment(self, to_email: str, subject: str, body: str, data: bytes, filename: str, subtype: str = "octet-stream", server=None) -> bool:
+        """
+        Send an email with one in-memory attachment. Pass an open `server`
+        (see connect()) to reuse one SMTP session across many messages.
+        """
+        msg = MIMEMultipart()
+        msg["From"] = self.user
+        msg["To"] = to_email
+        msg["Subject"] = subject
+        msg.attach(MIMEText(body, "plain"))
+        msg.attach(MIMEApplication(data, _subtype=subtype, Name=filename))
+        msg.get_payload()[-1].add_header("Content-Disposition", "attachment", filename=filename)
+        try:
+            if server is not None:
+                server.send_message(msg)
+            else:
+                with self.connect() as smtp:
+                    smtp.send_message(msg)
+            return True
+        except Exception as e:
+            print(f"❌ Failed to send email to {to_email}: {e}")
+            return False
+
+    def connect(self) -> smtplib.SMTP:
+        """Logged-in SMTP session; use as a context manager"""
+        server = smtplib.SMTP(self.host, self.port)
+        server.starttls()
+        server.login(self.user, self.password)
+        return server
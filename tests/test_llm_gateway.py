@@ -0,0 +1,175 @@
+# tests/test_llm_gateway.py
+# LLMGateway against the offline FakeBackend: caching, coalescing, retry and
+# per-key rate limiting.
+import threading
+import time
+
+import pytest
+
+from analytics.llm_gateway import LLMGateway, LLMError, FakeBackend, cache_key
+
+
+class FailingBackend(FakeBackend):
+    """Raises `error` on every call"""
+
+    def __init__(self, error: Exception, delay: float = 0.0):
+        super().__init__(delay=delay)
+        self.error = error
+
+    def generate(self, api_key, model_name, contents):
+        self.calls.append((api_key, model_name, contents))
+        if self.delay:
+            time.sleep(self.delay)
+        raise self.error
+
+
+def make_gateway(backend, **kwargs):
+    kwargs.setdefault("rate_per_minute", 0)
+    kwargs.setdefault("backoff", 0)
+    return LLMGateway(backend=backend, ttl=kwargs.pop("ttl", 60), **kwargs)
+
+
+def test_identical_prompts_are_answered_from_cache():
+    backend = FakeBackend(responses={"budget": "Spend less"})
+    gw = make_gateway(backend)
+    assert gw.generate("k", "m", "my budget?") == "Spend less"
+    assert gw.generate("k", "m", "my budget?") == "Spend less"
+    assert len(backend.calls) == 1
+    assert gw.stats["hits"] == 1 and gw.stats["misses"] == 1
+
+
+def test_cache_entries_expire_after_ttl():
+    backend = FakeBackend()
+    gw = make_gateway(backend, ttl=0.05)
+    gw.generate("k", "m", "hello")
+    time.sleep(0.1)
+    gw.generate("k", "m", "hello")
+    assert len(backend.calls) == 2
+
+
+def test_cache_is_per_api_key_unless_shared():
+    backend = FakeBackend()
+    gw = make_gateway(backend)
+    gw.generate("key-a", "m", "hello")
+    gw.generate("key-b", "m", "hello")
+    assert len(backend.calls) == 2
+
+    gw.generate("key-a", "m", "market report", shared=True)
+    gw.generate("key-b", "m", "market report", shared=True)
+    assert len(backend.calls) == 3
+
+
+def test_cache_key_covers_model_parts_and_api_key():
+    assert cache_key("m", "a") == cache_key("m", ["a"])
+    assert cache_key("m", "a") != cache_key("m2", "a")
+    assert cache_key("m", ["a", "b"]) != cache_key("m", ["ab"])
+    assert cache_key("m", "a", "k1") != cache_key("m", "a", "k2")
+    assert cache_key("m", "a", "k1") != cache_key("m", "a")
+
+
+def test_concurrent_identical_calls_are_coalesced():
+    backend = FakeBackend(default="answer", delay=0.2)
+    gw = make_gateway(backend)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(gw.generate("k", "m", "same"))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["answer"] * 5
+    assert len(backend.calls) == 1
+    assert gw.stats["coalesced"] == 4
+
+
+def test_followers_get_the_leaders_error():
+    backend = FailingBackend(LLMError("bad request", code=400), delay=0.2)
+    gw = make_gateway(backend)
+    errors = []
+
+    def call():
+        try:
+            gw.generate("k", "m", "same")
+        except LLMError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == ["bad request"] * 3
+    assert len(backend.calls) == 1
+
+
+def test_transient_failures_are_retried():
+    backend = FakeBackend(default="recovered", fail_times=2)
+    gw = make_gateway(backend, max_retries=3)
+    assert gw.generate("k", "m", "hi") == "recovered"
+    assert len(backend.calls) == 3
+    assert gw.stats["retries"] == 2
+
+
+def test_retries_stop_at_max_retries():
+    backend = FakeBackend(fail_times=10)
+    gw = make_gateway(backend, max_retries=2)
+    with pytest.raises(LLMError):
+        gw.generate("k", "m", "hi")
+    assert len(backend.calls) == 3
+
+
+def test_backoff_grows_between_retries(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("analytics.llm_gateway.time.sleep", sleeps.append)
+    gw = make_gateway(FakeBackend(fail_times=3), max_retries=3, backoff=1.0)
+    gw.generate("k", "m", "hi")
+    assert len(sleeps) == 3
+    assert 1.0 <= sleeps[0] < 2.0 <= sleeps[1] < 4.0 <= sleeps[2] < 8.0
+
+
+@pytest.mark.parametrize("error", [
+    LLMError("amount 5000 invalid"),
+    LLMError("Invalid API key", code=400),
+    ValueError("429 in the prompt text"),
+])
+def test_permanent_failures_are_not_retried(error):
+    backend = FailingBackend(error)
+    gw = make_gateway(backend, max_retries=3)
+    with pytest.raises(LLMError):
+        gw.generate("k", "m", "hi")
+    assert len(backend.calls) == 1
+
+
+def test_retryable_by_status_code_or_type():
+    class ResourceExhausted(Exception):
+        pass
+
+    class HTTPError(Exception):
+        status_code = 504
+
+    for error in (LLMError("slow down", code=429), ResourceExhausted("quota"), HTTPError("gateway")):
+        backend = FailingBackend(error)
+        gw = make_gateway(backend, max_retries=1)
+        with pytest.raises(LLMError):
+            gw.generate("k", "m", "hi")
+        assert len(backend.calls) == 2
+
+
+def test_rate_limit_is_per_api_key():
+    gw = make_gateway(FakeBackend(), rate_per_minute=1)
+    gw.generate("key-a", "m", "hi")
+    assert gw.limiter.try_acquire("key-a") > 0
+    assert gw.limiter.try_acquire("key-b") == 0.0
+
+
+def test_zero_rate_disables_limiting():
+    backend = FakeBackend()
+    gw = make_gateway(backend, rate_per_minute=0)
+    assert gw.limiter is None
+    for i in range(20):
+        gw.generate("k", "m", f"prompt {i}")
+    assert len(backend.calls) == 20
+
+
+def test_negative_rate_is_rejected():
+    with pytest.raises(ValueError):
+        LLMGateway(backend=FakeBackend(), rate_per_minute=-1)
@@ -0,0 +1,84 @@
+# tests/test_llm_streaming.py
+# LLMGateway.stream against the offline FakeBackend: incremental output,
+# cancellation through cancel_event and the whole-response timeout.
+import threading
+import time
+
+import pytest
+
+from analytics.llm_gateway import LLMGateway, LLMError, FakeBackend
+
+
+def make_gateway(backend):
+    return LLMGateway(backend=backend, ttl=60, rate_per_minute=0, backoff=0)
+
+
+def test_stream_yields_words_and_caches_the_full_answer():
+    backend = FakeBackend(default="one two three")
+    gw = make_gateway(backend)
+    assert list(gw.stream("k", "m", "hi")) == ["one ", "two ", "three "]
+    # A repeat is answered from the cache in one piece
+    assert list(gw.stream("k", "m", "hi")) == ["one two three "]
+    assert len(backend.calls) == 1
+
+
+def test_cancel_keeps_partial_output_and_skips_the_cache():
+    backend = FakeBackend(default="a b c d e f g h", delay=0.05)
+    gw = make_gateway(backend)
+    cancel = threading.Event()
+    received = []
+    for piece in gw.stream("k", "m", "hi", cancel_event=cancel):
+        received.append(piece)
+        if len(received) == 2:
+            cancel.set()
+    assert received == ["a ", "b "]
+    assert not gw._cache
+
+    # Not cached, so the next request reaches the backend again
+    list(gw.stream("k", "m", "hi"))
+    assert len(backend.calls) == 2
+
+
+def test_cancel_before_the_first_token():
+    gw = make_gateway(FakeBackend(default="late", delay=2.0))
+    cancel = threading.Event()
+    threading.Timer(0.1, cancel.set).start()
+    started = time.monotonic()
+    assert list(gw.stream("k", "m", "hi", cancel_event=cancel, timeout=10)) == []
+    assert time.monotonic() - started < 1.0
+
+
+def test_timeout_raises_after_partial_output():
+    gw = make_gateway(FakeBackend(default="a b c d e f g h", delay=0.1))
+    received = []
+    started = time.monotonic()
+    with pytest.raises(LLMError, match="timed out"):
+        for piece in gw.stream("k", "m", "hi", timeout=0.35):
+            received.append(piece)
+    assert 0 < len(received) < 8
+    assert time.monotonic() - started < 1.0
+    assert not gw._cache
+
+
+def test_timeout_while_waiting_for_the_first_token():
+    gw = make_gateway(FakeBackend(default="late", delay=2.0))
+    started = time.monotonic()
+    with pytest.raises(LLMError, match="timed out after 0.2s"):
+        list(gw.stream("k", "m", "hi", timeout=0.2))
+    assert time.monotonic() - started < 1.0
+
+
+def test_backend_errors_surface_as_llm_error():
+    gw = make_gateway(FakeBackend(fail_times=1))
+    with pytest.raises(LLMError) as info:
+        list(gw.stream("k", "m", "hi"))
+    assert info.value.code == 503
+
+
+def test_closing_the_generator_early_caches_nothing():
+    backend = FakeBackend(default="a b c d e f g h", delay=0.05)
+    gw = make_gateway(backend)
+    stream = gw.stream("k", "m", "hi")
+    assert next(stream) == "a "
+    stream.close()
+    assert not gw._cache
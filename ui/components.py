@@ -1,4 +1,5 @@
 # components.py
+import threading
 import streamlit as st
 import plotly.express as px
 import pandas as pd
@@ -161,3 +162,21 @@ def render_category_pie(expenses):
     fig.update_traces(textposition='inside', textinfo='percent+label')
     fig.update_layout(height=400, margin=dict(t=40, l=10, r=10, b=10))
     st.plotly_chart(fig, use_container_width=True)
+
+def stop_button(key: str, event: threading.Event) -> threading.Event:
+    """
+    Stop control for a streamed AI answer, bound to the cancel event passed
+    to stream_analyze(). Clicking it reruns the page, which interrupts the
+    stream, and sets the event so the LLM gateway drops the request too.
+    """
+    st.session_state[key] = event
+    st.button("⏹️ Stop", key=f"{key}_btn", on_click=event.set)
+    return event
+
+def was_stopped(key: str) -> bool:
+    """True once after stop_button(key) was clicked"""
+    event = st.session_state.get(key)
+    if event is not None and event.is_set():
+        del st.session_state[key]
+        return True
+    return False
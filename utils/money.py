@@ -0,0 +1,122 @@
+# utils/money.py
+# Exact money arithmetic.
+#
+# Amounts are stored as integer minor units (hundredths, `<field>_minor`)
+# next to the record's currency. Every currency uses the same scale, so a
+# sum never mixes exponents. The float field (`amount`, `remaining_amount`,
+# ...) stays on documents for display and older readers; totals are summed
+# from the integers instead: with Decimal in Python, as int64 in pandas and
+# with sum_minor() in aggregation pipelines. Documents written before the
+# integer fields existed are converted on the fly (minor_expr/minor_column).
+import decimal
+
+import numpy as np
+import pandas as pd
+
+SCALE = 100
+CENT = decimal.Decimal("0.01")
+
+
+def to_decimal(amount) -> decimal.Decimal:
+    """Amount rounded half-up to cents; raises ValueError when not a number"""
+    if amount is None or amount == "":
+        return decimal.Decimal("0.00")
+    if hasattr(amount, "to_decimal"):  # bson Decimal128
+        amount = amount.to_decimal()
+    if isinstance(amount, str):
+        amount = amount.strip().replace(",", "")
+    try:
+        value = decimal.Decimal(str(amount))
+    except decimal.InvalidOperation:
+        raise ValueError(f"Not an amount: {amount!r}")
+    if not value.is_finite():
+        raise ValueError(f"Not an amount: {amount!r}")
+    return value.quantize(CENT, rounding=decimal.ROUND_HALF_UP)
+
+
+def to_minor(amount) -> int:
+    return int(to_decimal(amount) * SCALE)
+
+
+def from_minor(minor) -> decimal.Decimal:
+    return (decimal.Decimal(int(minor or 0)) / SCALE).quantize(CENT)
+
+
+def to_float(minor) -> float:
+    """Display value of an exact integer amount"""
+    return float(from_minor(minor))
+
+
+def with_minor(doc: dict, *fields) -> dict:
+    """Round `fields` to cents in place and add their `<field>_minor` twins"""
+    for field in fields:
+        minor = to_minor(doc.get(field))
+        doc[field] = to_float(minor)
+        doc[f"{field}_minor"] = minor
+    return doc
+
+
+def minor_of(doc: dict, field: str="amount") -> int:
+    """
+    A stored document's exact amount, falling back to its float field;
+    0 for a NaN/inf float, matching minor_expr()
+    """
+    minor = doc.get(f"{field}_minor")
+    if minor is not None:
+        return int(minor)
+    try:
+        return to_minor(doc.get(field))
+    except ValueError:
+        return 0
+
+
+# -----------------------------
+# Vectorized (pandas / numpy)
+# -----------------------------
+def minor_column(df: pd.DataFrame, field: str="amount") -> pd.Series:
+    """
+    int64 minor units for a frame of records. Uses `<field>_minor` where
+    present; float values are scaled and rounded, which is exact for
+    amounts entered with at most two decimals.
+    """
+    if df.empty or field not in df:
+        return pd.Series(np.zeros(len(df), dtype=np.int64), index=df.index)
+    scaled = np.rint(pd.to_numeric(df[field], errors="coerce").to_numpy(dtype=float) * SCALE)
+    scaled[~np.isfinite(scaled)] = 0
+    minor = pd.Series(scaled.astype(np.int64), index=df.index)
+    column = f"{field}_minor"
+    if column in df:
+        stored = pd.to_numeric(df[column], errors="coerce")
+        minor = stored.fillna(minor).astype(np.int64)
+    return minor
+
+
+def sum_minor_values(values) -> int:
+    return int(np.asarray(values, dtype=np.int64).sum())
+
+
+def frame_total(df: pd.DataFrame, field: str="amount") -> float:
+    """Exact integer sum of a frame's amounts, as a display float"""
+    return to_float(sum_minor_values(minor_column(df, field)))
+
+
+# -----------------------------
+# Aggregation pipelines
+# -----------------------------
+def minor_expr(field: str="amount") -> dict:
+    """
+    `<field>_minor`, or the float field scaled to a long for older
+    documents; NaN/inf (which $toLong rejects) count as 0
+    """
+    scaled = {"$round": [{"$multiply": [{"$ifNull": [f"${field}", 0]}, SCALE]}, 0]}
+    return {"$ifNull": [f"${field}_minor", {"$convert": {"input": scaled, "to": "long", "onError": 0, "onNull": 0}}]}
+
+
+def sum_minor(field: str="amount") -> dict:
+    """$group accumulator: exact integer total of `field`"""
+    return {"$sum": minor_expr(field)}
+
+
+def minor_to_amount(minor_field: str) -> dict:
+    """Expression turning an integer total back into a display amount"""
+    return {"$divide": [f"${minor_field}", SCALE]}
@@ -0,0 +1,73 @@
+# utils/rate_limit.py
+import time
+import threading
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` burst, refilled at `rate` tokens/second."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens if available. Returns 0.0 on success, else seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            if self.rate <= 0:
+                return float("inf")
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0, timeout: float = None) -> bool:
+        """Block until tokens are available or `timeout` seconds pass."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class KeyedRateLimiter:
+    """One TokenBucket per key (API key, email, IP...), bounded with LRU eviction."""
+
+    def __init__(self, capacity: float, rate: float, max_keys: int = 10000):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bucket(self, key) -> TokenBucket:
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                b = TokenBucket(self.capacity, self.rate)
+                self._buckets[key] = b
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return b
+
+    def try_acquire(self, key, tokens: float = 1.0) -> float:
+        return self.bucket(key).try_acquire(tokens)
+
+    def acquire(self, key, tokens: float = 1.0, timeout: float = None) -> bool:
+        return self.bucket(key).acquire(tokens, timeout)